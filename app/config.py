@@ -50,15 +50,26 @@ class Settings(BaseSettings):
     rayshift_api_key: SecretStr = SecretStr("")
     rayshift_api_url: HttpUrl = parse_obj_as(HttpUrl, "https://rayshift.io/api/v1/")
     quest_cache_length: int = 3600
+    rayshift_miss_cache_length: int = 300
+    quest_prefetch_interval: int = 0
+    quest_prefetch_limit: int = 200
+    quest_prefetch_cpu_budget: float = 0.2
+    reverse_fan_out_limit: int = 1000
+    reverse_basic_fan_out_limit: int = 10000
     db_pool_size: int = 3
     db_max_overflow: int = 10
     write_postgres_data: bool = True
     write_redis_data: bool = True
+    load_data_on_startup: bool = True
     asset_url: HttpUrl = parse_obj_as(
         HttpUrl, "https://assets.atlasacademy.io/GameData/"
     )
     openapi_url: Optional[HttpUrl] = None
     export_all_nice: bool = False
+    export_workers: Optional[int] = None
+    export_chunk_size: int = 50
+    compress_response_min_size: int = 1024
+    cache_stream_max_size: int = 20_000_000
     documentation_all_nice: bool = False
     github_webhook_secret: SecretStr = SecretStr("")
     github_webhook_git_pull: bool = False
@@ -71,6 +82,12 @@ class Settings(BaseSettings):
         else:
             return value
 
+    @validator("quest_prefetch_cpu_budget")
+    def check_cpu_budget(cls, value: float) -> float:
+        if not 0 < value <= 1:
+            raise ValueError("must be greater than 0 and at most 1")
+        return value
+
     class Config:
         env_file = ".env"
         secrets_dir = "secrets"
@@ -1,5 +1,6 @@
 from collections import defaultdict
-from typing import Any, Generator, Iterable, Optional
+from dataclasses import dataclass, field
+from typing import Any, Generator, Iterable, Optional, Sequence
 
 from fastapi import HTTPException
 from redis.asyncio import Redis  # type: ignore
@@ -8,7 +9,6 @@ from sqlalchemy.ext.asyncio import AsyncConnection
 from ..config import Settings
 from ..db.helpers import fetch, quest
 from ..redis.helpers import pydantic_object
-from ..redis.helpers.reverse import RedisReverse, get_reverse_ids
 from ..schemas.basic import (
     BasicBuffReverse,
     BasicCommandCode,
@@ -68,6 +68,7 @@ from ..schemas.raw import (
     MstTreasureDevice,
     MstWar,
 )
+from .reverse import ReverseTree, get_reverse_tree
 from .utils import (
     fmt_url,
     get_flags,
@@ -150,18 +151,12 @@ async def get_basic_buff_from_raw(
         ckOpIndv=get_traits_list(mstBuff.ckOpIndv),
     )
     if reverse and reverseDepth >= ReverseDepth.function:
-        func_ids = await get_reverse_ids(
-            redis, region, RedisReverse.BUFF_TO_FUNC, mstBuff.id
+        reverse_entities = await get_basic_reverse_entities(
+            redis, region, lang, reverseDepth, buff_ids=[mstBuff.id]
         )
-        buff_reverse = BasicReversedBuff(
-            function=[
-                await get_basic_function(
-                    redis, region, func_id, lang, reverse, reverseDepth
-                )
-                for func_id in func_ids
-            ]
+        basic_buff.reverse = BasicReversedBuffType(
+            basic=reverse_entities.get_buff_reverse(mstBuff.id)
         )
-        basic_buff.reverse = BasicReversedBuffType(basic=buff_reverse)
     return basic_buff
 
 
@@ -213,25 +208,12 @@ async def get_basic_function_from_raw(
     )
 
     if reverse and reverseDepth >= ReverseDepth.skillNp:
-        skill_ids = await get_reverse_ids(
-            redis, region, RedisReverse.FUNC_TO_SKILL, mstFunc.id
-        )
-        td_ids = await get_reverse_ids(
-            redis, region, RedisReverse.FUNC_TO_TD, mstFunc.id
+        reverse_entities = await get_basic_reverse_entities(
+            redis, region, lang, reverseDepth, func_ids=[mstFunc.id]
         )
-        func_reverse = BasicReversedFunction(
-            skill=[
-                await get_basic_skill(
-                    redis, region, skill_id, lang, reverse, reverseDepth
-                )
-                for skill_id in skill_ids
-            ],
-            NP=[
-                await get_basic_td(redis, region, td_id, lang, reverse, reverseDepth)
-                for td_id in td_ids
-            ],
+        basic_func.reverse = BasicReversedFunctionType(
+            basic=reverse_entities.get_func_reverse(mstFunc.id)
         )
-        basic_func.reverse = BasicReversedFunctionType(basic=func_reverse)
 
     return basic_func
 
@@ -278,32 +260,12 @@ async def get_basic_skill(
     )
 
     if reverse and reverseDepth >= ReverseDepth.servant:
-        activeSkills = set(
-            await get_reverse_ids(
-                redis, region, RedisReverse.ACTIVE_SKILL_TO_SVT, skill_id
-            )
-        )
-        passiveSkills = set(
-            await get_reverse_ids(
-                redis, region, RedisReverse.PASSIVE_SKILL_TO_SVT, skill_id
-            )
+        reverse_entities = await get_basic_reverse_entities(
+            redis, region, lang, reverseDepth, skill_ids=[mstSkill.id]
         )
-        mc_ids = await get_reverse_ids(
-            redis, region, RedisReverse.SKILL_TO_MC, skill_id
+        basic_skill.reverse = BasicReversedSkillTdType(
+            basic=reverse_entities.get_skill_reverse(mstSkill.id)
         )
-        cc_ids = await get_reverse_ids(
-            redis, region, RedisReverse.SKILL_TO_CC, skill_id
-        )
-
-        skill_reverse = BasicReversedSkillTd(
-            servant=[
-                await get_basic_servant(redis, region, svt_id, lang=lang)
-                for svt_id in sorted(activeSkills | passiveSkills)
-            ],
-            MC=[await get_basic_mc(redis, region, mc_id, lang) for mc_id in mc_ids],
-            CC=[await get_basic_cc(redis, region, cc_id, lang) for cc_id in cc_ids],
-        )
-        basic_skill.reverse = BasicReversedSkillTdType(basic=skill_reverse)
     return basic_skill
 
 
@@ -329,14 +291,12 @@ async def get_basic_td(
     )
 
     if reverse and reverseDepth >= ReverseDepth.servant:
-        svt_ids = await get_reverse_ids(redis, region, RedisReverse.TD_TO_SVT, td_id)
-        td_reverse = BasicReversedSkillTd(
-            servant=[
-                await get_basic_servant(redis, region, svt_id, lang=lang)
-                for svt_id in svt_ids
-            ]
+        reverse_entities = await get_basic_reverse_entities(
+            redis, region, lang, reverseDepth, td_ids=[mstTreasureDevice.id]
+        )
+        basic_td.reverse = BasicReversedSkillTdType(
+            basic=reverse_entities.get_td_reverse(mstTreasureDevice.id)
         )
-        basic_td.reverse = BasicReversedSkillTdType(basic=td_reverse)
     return basic_td
 
 
@@ -554,6 +514,153 @@ async def get_basic_cc(
     return get_basic_cc_from_raw(region, mstCommandCode, lang)
 
 
+@dataclass
+class BasicReverseEntities:
+    """Entities of a reverse lookup. Each entity is only built once."""
+
+    tree: ReverseTree
+    svts: dict[int, BasicServant] = field(default_factory=dict)
+    mcs: dict[int, BasicMysticCode] = field(default_factory=dict)
+    ccs: dict[int, BasicCommandCode] = field(default_factory=dict)
+    skills: dict[int, BasicSkillReverse] = field(default_factory=dict)
+    tds: dict[int, BasicTdReverse] = field(default_factory=dict)
+    funcs: dict[int, BasicFunctionReverse] = field(default_factory=dict)
+
+    def get_skill_reverse(self, skill_id: int) -> BasicReversedSkillTd:
+        return BasicReversedSkillTd(
+            servant=[
+                self.svts[svt_id]
+                for svt_id in self.tree.skill_svts[skill_id]
+                if svt_id in self.svts
+            ],
+            MC=[
+                self.mcs[mc_id]
+                for mc_id in self.tree.skill_mcs[skill_id]
+                if mc_id in self.mcs
+            ],
+            CC=[
+                self.ccs[cc_id]
+                for cc_id in self.tree.skill_ccs[skill_id]
+                if cc_id in self.ccs
+            ],
+        )
+
+    def get_td_reverse(self, td_id: int) -> BasicReversedSkillTd:
+        return BasicReversedSkillTd(
+            servant=[
+                self.svts[svt_id]
+                for svt_id in self.tree.td_svts[td_id]
+                if svt_id in self.svts
+            ]
+        )
+
+    def get_func_reverse(self, func_id: int) -> BasicReversedFunction:
+        return BasicReversedFunction(
+            skill=[
+                self.skills[skill_id]
+                for skill_id in self.tree.func_skills[func_id]
+                if skill_id in self.skills
+            ],
+            NP=[
+                self.tds[td_id]
+                for td_id in self.tree.func_tds[func_id]
+                if td_id in self.tds
+            ],
+        )
+
+    def get_buff_reverse(self, buff_id: int) -> BasicReversedBuff:
+        return BasicReversedBuff(
+            function=[
+                self.funcs[func_id]
+                for func_id in self.tree.buff_funcs[buff_id]
+                if func_id in self.funcs
+            ]
+        )
+
+
+async def get_basic_reverse_entities(
+    redis: Redis,
+    region: Region,
+    lang: Language,
+    reverseDepth: ReverseDepth,
+    buff_ids: Sequence[int] = (),
+    func_ids: Sequence[int] = (),
+    skill_ids: Sequence[int] = (),
+    td_ids: Sequence[int] = (),
+) -> BasicReverseEntities:
+    """
+    Build the reverse lookup bottom-up so children are built before their parents.
+    The raw data of each depth level is fetched with one HMGET.
+    """
+    tree = await get_reverse_tree(
+        redis,
+        region,
+        reverseDepth,
+        buff_ids,
+        func_ids,
+        skill_ids,
+        td_ids,
+        settings.reverse_basic_fan_out_limit,
+    )
+    mstSvts = await pydantic_object.fetch_ids(redis, region, MstSvt, tree.svt_ids)
+    mstEquips = await pydantic_object.fetch_ids(redis, region, MstEquip, tree.mc_ids)
+    mstCommandCodes = await pydantic_object.fetch_ids(
+        redis, region, MstCommandCode, tree.cc_ids
+    )
+    reverse_entities = BasicReverseEntities(
+        tree,
+        svts={
+            svt_id: await get_basic_servant(
+                redis, region, svt_id, lang=lang, mstSvt=mstSvt
+            )
+            for svt_id, mstSvt in mstSvts.items()
+        },
+        mcs={
+            mc_id: get_basic_mc_from_raw(region, mstEquip, lang)
+            for mc_id, mstEquip in mstEquips.items()
+        },
+        ccs={
+            cc_id: get_basic_cc_from_raw(region, mstCommandCode, lang)
+            for cc_id, mstCommandCode in mstCommandCodes.items()
+        },
+    )
+
+    mstSkills = await pydantic_object.fetch_ids(redis, region, MstSkill, tree.skill_ids)
+    for skill_id, mstSkill in mstSkills.items():
+        basic_skill = await get_basic_skill(
+            redis, region, skill_id, lang, mstSkill=mstSkill
+        )
+        if reverseDepth >= ReverseDepth.servant:
+            basic_skill.reverse = BasicReversedSkillTdType(
+                basic=reverse_entities.get_skill_reverse(skill_id)
+            )
+        reverse_entities.skills[skill_id] = basic_skill
+
+    mstTreasureDevices = await pydantic_object.fetch_ids(
+        redis, region, MstTreasureDevice, tree.td_ids
+    )
+    for td_id, mstTreasureDevice in mstTreasureDevices.items():
+        basic_td = await get_basic_td(
+            redis, region, td_id, lang, mstTreasureDevice=mstTreasureDevice
+        )
+        if reverseDepth >= ReverseDepth.servant:
+            basic_td.reverse = BasicReversedSkillTdType(
+                basic=reverse_entities.get_td_reverse(td_id)
+            )
+        reverse_entities.tds[td_id] = basic_td
+
+    mstFuncs = await pydantic_object.fetch_ids(redis, region, MstFunc, tree.func_ids)
+    for func_id, mstFunc in mstFuncs.items():
+        basic_func = await get_basic_function_from_raw(redis, region, mstFunc, lang)
+        if reverseDepth >= ReverseDepth.skillNp:
+            basic_func.reverse = BasicReversedFunctionType(
+                basic=reverse_entities.get_func_reverse(func_id)
+            )
+        reverse_entities.funcs[func_id] = basic_func
+
+    return reverse_entities
+
+
 def get_all_basic_ccs(
     region: Region,
     lang: Language,
@@ -0,0 +1,207 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from fuzzywuzzy import fuzz, utils
+from Levenshtein import ratio as levenshtein_ratio  # type: ignore
+from redis.asyncio import Redis  # type: ignore
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from ..db.helpers.svt import get_all_svt_names
+from ..redis.helpers.repo_version import get_repo_version
+from ..schemas.common import Language, Region
+from .utils import get_translation
+
+
+accent_from = "àáâäèéëíðñóöùúāēīŋōšαβḗḫ"
+accent_to__ = "aaaaeeeidnoouuaeinosabeh"
+translation_table = {ord(k): v for k, v in zip(accent_from, accent_to__)}
+
+
+SPECIAL_REPLACE = {"artoria": "altria"}
+
+
+NAME_MATCH_THRESHOLD = 80
+# Smallest ratio that fuzz.ratio rounds to more than NAME_MATCH_THRESHOLD
+MIN_LEVENSHTEIN_RATIO = (NAME_MATCH_THRESHOLD + 0.5) / 100
+
+
+def process_name(name: str) -> str:
+    processed = utils.full_process(name).translate(translation_table)
+    for k, v in SPECIAL_REPLACE.items():
+        processed = processed.replace(k, v)
+    return processed
+
+
+def get_token_string(tokens: Iterable[str]) -> str:
+    return " ".join(sorted(tokens))
+
+
+def match_processed_name(p1: str, p2: str) -> bool:
+    """Modified from fuzzywuzzy.token_set_ratio"""
+    if not utils.validate_string(p1):
+        return False
+    if not utils.validate_string(p2):
+        return False
+
+    # Doesn't seem to be needed now but might be useful in the future
+    # ALTERNATIVE_DIVIDER = ["-", "="]
+    # for divider in ALTERNATIVE_DIVIDER:
+    #     p1 = p1.replace(divider, " ")
+    #     p2 = p2.replace(divider, " ")
+
+    if p1 in p2:
+        return True
+
+    # pull tokens
+    tokens1 = set(p1.split())
+    tokens2 = set(p2.split())
+
+    intersection = tokens1.intersection(tokens2)
+    diff1to2 = tokens1.difference(tokens2)
+    diff2to1 = tokens2.difference(tokens1)
+
+    sorted_sect = get_token_string(intersection)
+    sorted_1to2 = get_token_string(diff1to2)
+    sorted_2to1 = get_token_string(diff2to1)
+
+    combined_1to2 = sorted_sect + " " + sorted_1to2
+    combined_2to1 = sorted_sect + " " + sorted_2to1
+
+    # strip
+    sorted_sect = sorted_sect.strip()
+    combined_1to2 = combined_1to2.strip()
+    combined_2to1 = combined_2to1.strip()
+
+    # Use sorted_sect first so "Okita Souji (Alter)" works as expected
+    # This way "a b c" search_param will match to "a b c d e" but not vice versa
+    if sorted_sect:
+        return fuzz.ratio(sorted_sect, combined_1to2) > NAME_MATCH_THRESHOLD
+    else:
+        return fuzz.ratio(combined_2to1, combined_1to2) > NAME_MATCH_THRESHOLD
+
+
+def get_trigrams(processed: str) -> set[str]:
+    return {processed[i : i + 3] for i in range(len(processed) - 2)}
+
+
+def can_match_length(length1: int, length2: int) -> bool:
+    """fuzz.ratio of two strings is at most 2 * min(length) / sum(length)"""
+    return 2 * min(length1, length2) >= MIN_LEVENSHTEIN_RATIO * (length1 + length2)
+
+
+@dataclass
+class IndexedName:
+    entity_id: int
+    name: str
+    token_string: str
+
+
+class NameIndex:
+    """
+    Find the entities whose name match_name the search name without running
+    match_name on every entity. match_name is true only if:
+    - the search name is a substring of the name: every trigram of the search name
+    is in the name.
+    - the names share a token.
+    - the sorted tokens of the two names are similar: their lengths are close and
+    their Levenshtein ratio is high enough.
+    match_name then only runs on these candidates instead of every name.
+    """
+
+    def __init__(self, names: Iterable[tuple[int, str]]) -> None:
+        self.names: list[IndexedName] = []
+        self.tokens: defaultdict[str, set[int]] = defaultdict(set)
+        self.trigrams: defaultdict[str, set[int]] = defaultdict(set)
+        self.lengths: defaultdict[int, list[int]] = defaultdict(list)
+
+        seen: set[tuple[int, str]] = set()
+        for entity_id, name in names:
+            processed = process_name(name)
+            if not utils.validate_string(processed) or (entity_id, processed) in seen:
+                continue
+            seen.add((entity_id, processed))
+
+            position = len(self.names)
+            tokens = set(processed.split())
+            token_string = get_token_string(tokens)
+            self.names.append(IndexedName(entity_id, processed, token_string))
+            for token in tokens:
+                self.tokens[token].add(position)
+            for trigram in get_trigrams(processed):
+                self.trigrams[trigram].add(position)
+            self.lengths[len(token_string)].append(position)
+
+    def get_substring_candidates(self, processed: str) -> set[int]:
+        if len(processed) < 3:
+            return {
+                position
+                for position, indexed_name in enumerate(self.names)
+                if processed in indexed_name.name
+            }
+        candidates: Optional[set[int]] = None
+        for trigram in get_trigrams(processed):
+            if trigram not in self.trigrams:
+                return set()
+            if candidates is None:
+                candidates = set(self.trigrams[trigram])
+            else:
+                candidates &= self.trigrams[trigram]
+        return candidates or set()
+
+    def get_candidates(self, processed: str) -> set[int]:
+        tokens = set(processed.split())
+        candidates = self.get_substring_candidates(processed)
+        for token in tokens:
+            candidates |= self.tokens.get(token, set())
+
+        # Names without a common token are matched with the fuzz.ratio of their
+        # sorted tokens. fuzz.ratio is the rounded Levenshtein ratio.
+        token_string = get_token_string(tokens)
+        for length, positions in self.lengths.items():
+            if can_match_length(len(token_string), length):
+                candidates.update(
+                    position
+                    for position in positions
+                    if levenshtein_ratio(
+                        self.names[position].token_string, token_string
+                    )
+                    >= MIN_LEVENSHTEIN_RATIO
+                )
+        return candidates
+
+    def search(self, search_name: str) -> set[int]:
+        """Return the IDs of the entities with a name that match_name search_name"""
+        processed = process_name(search_name)
+        if not utils.validate_string(processed):
+            return set()
+        return {
+            self.names[position].entity_id
+            for position in self.get_candidates(processed)
+            if match_processed_name(processed, self.names[position].name)
+        }
+
+
+# Region -> (gamedata repo version, index)
+svt_name_indexes: dict[Region, tuple[Optional[str], NameIndex]] = {}
+
+
+async def get_svt_name_index(
+    conn: AsyncConnection, redis: Redis, region: Region
+) -> NameIndex:
+    """
+    Index of the JP, ruby and English names of all svts.
+    The index is rebuilt when the gamedata repo version changes.
+    """
+    repo_version = await get_repo_version(redis, region)
+    version = repo_version.hash if repo_version else None
+    if region in svt_name_indexes and svt_name_indexes[region][0] == version:
+        return svt_name_indexes[region][1]
+
+    name_index = NameIndex(
+        (svt_id, name)
+        for svt_id, svt_name, svt_ruby in await get_all_svt_names(conn)
+        for name in (svt_name, svt_ruby, get_translation(Language.en, svt_name))
+    )
+    svt_name_indexes[region] = (version, name_index)
+    return name_index
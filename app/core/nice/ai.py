@@ -1,3 +1,6 @@
+from typing import Iterable
+
+from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncConnection
 
 from ...config import Settings
@@ -10,21 +13,18 @@ from ...schemas.gameenums import (
     AI_COND_NAME,
     NiceAiActNum,
 )
-from ...schemas.nice import NiceAi, NiceAiAct, NiceAiCollection
+from ...schemas.nice import NiceAi, NiceAiAct, NiceAiCollection, NiceSkillReverse
 from ...schemas.raw import AiEntity, MstAiAct
-from ..raw import get_ai_collection
+from ..raw import get_ai_collection, get_skill_entity_no_reverse_many
 from ..utils import get_traits_list
-from .skill import get_nice_skill_from_id
+from .skill import get_nice_skill_from_raw
 
 
 settings = Settings()
 
 
-async def get_nice_ai_act(
-    conn: AsyncConnection,
-    region: Region,
-    mstAiAct: MstAiAct,
-    lang: Language = Language.jp,
+def get_nice_ai_act(
+    mstAiAct: MstAiAct, nice_skills: dict[int, NiceSkillReverse]
 ) -> NiceAiAct:
     nice_ai_act = NiceAiAct(
         id=mstAiAct.id,
@@ -35,18 +35,11 @@ async def get_nice_ai_act(
     if len(mstAiAct.skillVals) >= 2:
         nice_ai_act.skillId = mstAiAct.skillVals[0]
         nice_ai_act.skillLv = mstAiAct.skillVals[1]
-        nice_ai_act.skill = await get_nice_skill_from_id(
-            conn, region, mstAiAct.skillVals[0], lang
-        )
+        nice_ai_act.skill = nice_skills[mstAiAct.skillVals[0]]
     return nice_ai_act
 
 
-async def get_nice_ai(
-    conn: AsyncConnection,
-    region: Region,
-    one_ai: AiEntity,
-    lang: Language = Language.jp,
-) -> NiceAi:
+def get_nice_ai(one_ai: AiEntity, nice_skills: dict[int, NiceSkillReverse]) -> NiceAi:
     nice_ai = NiceAi(
         id=one_ai.mstAi.id,
         idx=one_ai.mstAi.idx,
@@ -59,7 +52,7 @@ async def get_nice_ai(
         ],
         condNegative=one_ai.mstAi.cond < 0,
         vals=one_ai.mstAi.vals,
-        aiAct=await get_nice_ai_act(conn, region, one_ai.mstAiAct, lang),
+        aiAct=get_nice_ai_act(one_ai.mstAiAct, nice_skills),
         avals=one_ai.mstAi.avals,
         parentAis=one_ai.parentAis,
         infoText=one_ai.mstAi.infoText,
@@ -72,6 +65,28 @@ async def get_nice_ai(
     return nice_ai
 
 
+async def get_nice_ai_skills(
+    conn: AsyncConnection,
+    region: Region,
+    ais: Iterable[AiEntity],
+    lang: Language = Language.jp,
+) -> dict[int, NiceSkillReverse]:
+    """Fetch the skills of all AI acts at once and build each skill once"""
+    skill_ids = {
+        ai.mstAiAct.skillVals[0] for ai in ais if len(ai.mstAiAct.skillVals) >= 2
+    }
+    raw_skills = await get_skill_entity_no_reverse_many(conn, skill_ids, expand=True)
+    nice_skills = {
+        raw_skill.mstSkill.id: await get_nice_skill_from_raw(
+            conn, region, raw_skill, lang
+        )
+        for raw_skill in raw_skills
+    }
+    if skill_ids - nice_skills.keys():
+        raise HTTPException(status_code=404, detail="Skill not found")
+    return nice_skills
+
+
 async def get_nice_ai_collection(
     conn: AsyncConnection,
     region: Region,
@@ -80,10 +95,11 @@ async def get_nice_ai_collection(
     lang: Language = Language.jp,
 ) -> NiceAiCollection:
     full_ai = await get_ai_collection(conn, ai_id, field)
+    nice_skills = await get_nice_ai_skills(
+        conn, region, [*full_ai.mainAis, *full_ai.relatedAis], lang
+    )
     return NiceAiCollection(
-        mainAis=[await get_nice_ai(conn, region, ai, lang) for ai in full_ai.mainAis],
-        relatedAis=[
-            await get_nice_ai(conn, region, ai, lang) for ai in full_ai.relatedAis
-        ],
+        mainAis=[get_nice_ai(ai, nice_skills) for ai in full_ai.mainAis],
+        relatedAis=[get_nice_ai(ai, nice_skills) for ai in full_ai.relatedAis],
         relatedQuests=full_ai.relatedQuests,
     )
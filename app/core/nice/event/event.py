@@ -1,17 +1,18 @@
 from collections import defaultdict
+from typing import Any, Optional
 
 from sqlalchemy.ext.asyncio import AsyncConnection
 
 from ....config import Settings
-from ....schemas.common import Language, Region
+from ....schemas.common import FieldProjection, Language, Region
 from ....schemas.gameenums import EVENT_TYPE_NAME, NiceSvtVoiceType, NiceVoiceCondType
 from ....schemas.nice import AssetURL, NiceEvent, NiceVoiceGroup
-from ....schemas.raw import MstGift
+from ....schemas.raw import EventEntity, MstGift
 from ... import raw
 from ...utils import fmt_url, get_translation
 from ..bgm import get_nice_bgm_entity_from_raw
 from ..item import get_nice_item_from_raw
-from ..svt.voice import get_nice_voice_group
+from ..svt.voice import get_nice_voice_group, get_play_cond_index, get_svt_group_index
 from .lottery import get_nice_lottery
 from .mission import get_nice_missions
 from .point import get_nice_pointBuff, get_nice_pointGroup
@@ -27,9 +28,15 @@ settings = Settings()
 
 
 async def get_nice_event(
-    conn: AsyncConnection, region: Region, event_id: int, lang: Language
+    conn: AsyncConnection,
+    region: Region,
+    event_id: int,
+    lang: Language,
+    projection: FieldProjection = FieldProjection(),
+    raw_event: Optional[EventEntity] = None,
 ) -> NiceEvent:
-    raw_event = await raw.get_event_entity(conn, event_id)
+    if not raw_event:
+        raw_event = await raw.get_event_entity(conn, event_id, projection)
 
     base_settings = {"base_url": settings.asset_url, "region": region}
 
@@ -60,33 +67,33 @@ async def get_nice_event(
         for bgm in raw_event.mstBgm
     }
 
+    # Index the voice data once instead of scanning it for every svt voice.
+    # The subtitle and play cond lookups are keyed by svt ID.
     mstVoices = {voice.id: voice for voice in raw_event.mstVoice}
-    voice_groups: list[NiceVoiceGroup] = []
-    for svt_voice in raw_event.mstSvtVoice:
-        subtitle_ids = {
-            subtitle.id: subtitle.serif
-            for subtitle in raw_event.mstSubtitle
-            if subtitle.get_svtId() == svt_voice.id
-        }
-        costume_ids = {
-            costumeMap.id: costumeMap.battleCharaId
-            for mstSvtExtra in raw_event.mstSvtExtra
-            for limitCount, costumeMap in mstSvtExtra.costumeLimitSvtIdMap.items()
-            if mstSvtExtra.svtId == svt_voice.id and limitCount > 10
-        }
-
-        voice_groups.append(
-            get_nice_voice_group(
-                region=region,
-                voice=svt_voice,
-                costume_ids=costume_ids,
-                subtitle_ids=subtitle_ids,
-                play_conds=raw_event.mstVoicePlayCond,
-                mstVoices=mstVoices,
-                mstSvtGroups=raw_event.mstSvtGroup,
-                lang=lang,
-            )
+    subtitle_ids = {subtitle.id: subtitle.serif for subtitle in raw_event.mstSubtitle}
+    play_conds = get_play_cond_index(raw_event.mstVoicePlayCond)
+    svt_groups = get_svt_group_index(raw_event.mstSvtGroup)
+    svt_costume_ids: dict[int, dict[int, int]] = defaultdict(dict)
+    for mstSvtExtra in raw_event.mstSvtExtra:
+        for limitCount, costumeMap in mstSvtExtra.costumeLimitSvtIdMap.items():
+            if limitCount > 10:
+                svt_costume_ids[mstSvtExtra.svtId][
+                    costumeMap.id
+                ] = costumeMap.battleCharaId
+
+    voice_groups = [
+        get_nice_voice_group(
+            region=region,
+            voice=svt_voice,
+            costume_ids=svt_costume_ids.get(svt_voice.id, {}),
+            subtitle_ids=subtitle_ids,
+            play_conds=play_conds,
+            mstVoices=mstVoices,
+            svt_groups=svt_groups,
+            lang=lang,
         )
+        for svt_voice in raw_event.mstSvtVoice
+    ]
 
     known_voice_ids: dict[int, set[str]] = defaultdict(set)
     for gacha_talk in raw_event.mstBoxGachaTalk:
@@ -125,7 +132,7 @@ async def get_nice_event(
                 )
             )
 
-    nice_event = NiceEvent(
+    nice_event: dict[str, Any] = dict(
         id=raw_event.mstEvent.id,
         type=EVENT_TYPE_NAME[raw_event.mstEvent.type],
         name=get_translation(lang, raw_event.mstEvent.name),
@@ -220,4 +227,4 @@ async def get_nice_event(
         voices=event_voices,
     )
 
-    return nice_event
+    return projection.parse_obj(NiceEvent, nice_event)
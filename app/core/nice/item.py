@@ -85,6 +85,23 @@ async def get_nice_item_amount_db(
     return get_nice_item_amount(nice_items, amount_list)
 
 
+async def get_nice_item_map(
+    conn: AsyncConnection, region: Region, item_ids: Iterable[int], lang: Language
+) -> dict[int, NiceItem]:
+    return {
+        mstItem.id: get_nice_item_from_raw(region, mstItem, lang)
+        for mstItem in await get_multiple_items(conn, set(item_ids))
+    }
+
+
+def get_nice_item_amount_map(
+    item_list: list[int], amount_list: list[int], item_map: dict[int, NiceItem]
+) -> list[NiceItemAmount]:
+    """Same as get_nice_item_amount_db with the items already fetched"""
+    items = [item_map[item_id] for item_id in item_list if item_id in item_map]
+    return get_nice_item_amount(items, amount_list)
+
+
 def get_nice_item_amount_qp(
     item_list: list[int],
     amount_list: list[int],
@@ -1,20 +1,23 @@
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Optional, Sequence, Union
 
 from redis.asyncio import Redis  # type: ignore
 from sqlalchemy.ext.asyncio import AsyncConnection
 
 from ...config import Settings
-from ...redis.helpers.reverse import RedisReverse, get_reverse_ids
-from ...schemas.basic import (
-    BasicReversedBuff,
-    BasicReversedFunction,
-    BasicReversedSkillTd,
+from ...schemas.common import (
+    FieldProjection,
+    Language,
+    Region,
+    ReverseData,
+    ReverseDepth,
 )
-from ...schemas.common import Language, Region, ReverseData, ReverseDepth
 from ...schemas.nice import (
     NiceBaseFunctionReverse,
     NiceBuffReverse,
+    NiceCommandCode,
     NiceEquip,
+    NiceMysticCode,
     NiceReversedBuff,
     NiceReversedBuffType,
     NiceReversedFunction,
@@ -25,16 +28,10 @@ from ...schemas.nice import (
     NiceSkillReverse,
     NiceTdReverse,
 )
-from ...schemas.raw import MstBuff, MstFunc, MstSvt, ServantEntity
+from ...schemas.raw import MstBuff, MstFunc, MstSvt, ServantEntity, TdEntityNoReverse
 from .. import raw
-from ..basic import (
-    get_basic_cc,
-    get_basic_function,
-    get_basic_mc,
-    get_basic_servant,
-    get_basic_skill,
-    get_basic_td,
-)
+from ..basic import BasicReverseEntities, get_basic_reverse_entities
+from ..reverse import ReverseTree, get_reverse_tree
 from .buff import get_nice_buff
 from .cc import get_nice_command_code
 from .func import get_nice_function
@@ -55,9 +52,13 @@ async def get_nice_servant_model(
     lore: bool = False,
     mstSvt: Optional[MstSvt] = None,
     raw_svt: Optional[ServantEntity] = None,
+    projection: FieldProjection = FieldProjection(),
 ) -> NiceServant:
-    return NiceServant.parse_obj(
-        await get_nice_servant(conn, region, item_id, lang, lore, mstSvt, raw_svt)
+    return projection.parse_obj(
+        NiceServant,
+        await get_nice_servant(
+            conn, region, item_id, lang, lore, mstSvt, raw_svt, projection
+        ),
     )
 
 
@@ -69,9 +70,170 @@ async def get_nice_equip_model(
     lore: bool = False,
     mstSvt: Optional[MstSvt] = None,
     raw_svt: Optional[ServantEntity] = None,
+    projection: FieldProjection = FieldProjection(),
 ) -> NiceEquip:
-    return NiceEquip.parse_obj(
-        await get_nice_servant(conn, region, item_id, lang, lore, mstSvt, raw_svt)
+    return projection.parse_obj(
+        NiceEquip,
+        await get_nice_servant(
+            conn, region, item_id, lang, lore, mstSvt, raw_svt, projection
+        ),
+    )
+
+
+@dataclass
+class NiceReverseEntities:
+    """Entities of a reverse lookup. Each entity is only built once."""
+
+    tree: ReverseTree
+    svts: dict[int, NiceServant] = field(default_factory=dict)
+    mcs: dict[int, NiceMysticCode] = field(default_factory=dict)
+    ccs: dict[int, NiceCommandCode] = field(default_factory=dict)
+    skills: dict[int, NiceSkillReverse] = field(default_factory=dict)
+    tds: dict[int, NiceTdReverse] = field(default_factory=dict)
+    funcs: dict[int, NiceBaseFunctionReverse] = field(default_factory=dict)
+
+    def get_skill_reverse(self, skill_id: int) -> NiceReversedSkillTd:
+        return NiceReversedSkillTd(
+            servant=[self.svts[svt_id] for svt_id in self.tree.skill_svts[skill_id]],
+            MC=[self.mcs[mc_id] for mc_id in self.tree.skill_mcs[skill_id]],
+            CC=[self.ccs[cc_id] for cc_id in self.tree.skill_ccs[skill_id]],
+        )
+
+    def get_td_reverse(self, td_id: int) -> NiceReversedSkillTd:
+        return NiceReversedSkillTd(
+            servant=[self.svts[svt_id] for svt_id in self.tree.td_svts[td_id]]
+        )
+
+    def get_func_reverse(self, func_id: int) -> NiceReversedFunction:
+        return NiceReversedFunction(
+            skill=[
+                self.skills[skill_id]
+                for skill_id in self.tree.func_skills[func_id]
+                if skill_id in self.skills
+            ],
+            NP=[
+                self.tds[td_id]
+                for td_id in self.tree.func_tds[func_id]
+                if td_id in self.tds
+            ],
+        )
+
+    def get_buff_reverse(self, buff_id: int) -> NiceReversedBuff:
+        return NiceReversedBuff(
+            function=[
+                self.funcs[func_id]
+                for func_id in self.tree.buff_funcs[buff_id]
+                if func_id in self.funcs
+            ]
+        )
+
+
+async def get_nice_td_reverse(
+    conn: AsyncConnection, region: Region, raw_td: TdEntityNoReverse, lang: Language
+) -> NiceTdReverse:
+    svt_id = next(
+        (svt_id.svtId for svt_id in raw_td.mstSvtTreasureDevice),
+        raw_td.mstTreasureDevice.id,
+    )
+    return NiceTdReverse.parse_obj(
+        (await get_nice_td(conn, raw_td, svt_id, region, lang))[0]
+    )
+
+
+async def get_nice_reverse_entities(
+    conn: AsyncConnection,
+    redis: Redis,
+    region: Region,
+    lang: Language,
+    reverseDepth: ReverseDepth,
+    buff_ids: Sequence[int] = (),
+    func_ids: Sequence[int] = (),
+    skill_ids: Sequence[int] = (),
+    td_ids: Sequence[int] = (),
+) -> NiceReverseEntities:
+    """
+    Build the reverse lookup bottom-up so children are built before their parents.
+    The raw data of the skills, NPs and functions of a depth level is fetched in bulk.
+    """
+    tree = await get_reverse_tree(
+        redis, region, reverseDepth, buff_ids, func_ids, skill_ids, td_ids
+    )
+    reverse_entities = NiceReverseEntities(
+        tree,
+        svts={
+            svt_id: await get_nice_servant_model(conn, region, svt_id, lang=lang)
+            for svt_id in tree.svt_ids
+        },
+        mcs={
+            mc_id: await get_nice_mystic_code(conn, region, mc_id, lang)
+            for mc_id in tree.mc_ids
+        },
+        ccs={
+            cc_id: await get_nice_command_code(conn, region, cc_id, lang)
+            for cc_id in tree.cc_ids
+        },
+    )
+
+    for raw_skill in await raw.get_skill_entity_no_reverse_many(
+        conn, tree.skill_ids, expand=True
+    ):
+        nice_skill = await get_nice_skill_from_raw(conn, region, raw_skill, lang)
+        if reverseDepth >= ReverseDepth.servant:
+            nice_skill.reverse = NiceReversedSkillTdType(
+                nice=reverse_entities.get_skill_reverse(nice_skill.id)
+            )
+        reverse_entities.skills[nice_skill.id] = nice_skill
+
+    for raw_td in await raw.get_td_entity_no_reverse_many(
+        conn, tree.td_ids, expand=True
+    ):
+        nice_td = await get_nice_td_reverse(conn, region, raw_td, lang)
+        if reverseDepth >= ReverseDepth.servant:
+            nice_td.reverse = NiceReversedSkillTdType(
+                nice=reverse_entities.get_td_reverse(nice_td.id)
+            )
+        reverse_entities.tds[nice_td.id] = nice_td
+
+    for raw_func in await raw.get_func_entity_no_reverse_many(
+        conn, tree.func_ids, expand=True
+    ):
+        nice_func = NiceBaseFunctionReverse.parse_obj(
+            await get_nice_function(conn, region, raw_func)
+        )
+        if reverseDepth >= ReverseDepth.skillNp:
+            nice_func.reverse = NiceReversedFunctionType(
+                nice=reverse_entities.get_func_reverse(nice_func.funcId)
+            )
+        reverse_entities.funcs[nice_func.funcId] = nice_func
+
+    return reverse_entities
+
+
+ReverseEntities = Union[NiceReverseEntities, BasicReverseEntities]
+
+
+async def get_reverse_entities(
+    conn: AsyncConnection,
+    redis: Redis,
+    region: Region,
+    lang: Language,
+    reverseDepth: ReverseDepth,
+    reverseData: ReverseData,
+    buff_ids: Sequence[int] = (),
+    func_ids: Sequence[int] = (),
+    skill_ids: Sequence[int] = (),
+    td_ids: Sequence[int] = (),
+) -> ReverseEntities:
+    """
+    One reverse lookup for all the given roots in the `reverseData` format.
+    Search endpoints build it once for all their results.
+    """
+    if reverseData == ReverseData.basic:
+        return await get_basic_reverse_entities(
+            redis, region, lang, reverseDepth, buff_ids, func_ids, skill_ids, td_ids
+        )
+    return await get_nice_reverse_entities(
+        conn, redis, region, lang, reverseDepth, buff_ids, func_ids, skill_ids, td_ids
     )
 
 
@@ -85,33 +247,23 @@ async def get_nice_buff_with_reverse(
     reverseDepth: ReverseDepth = ReverseDepth.function,
     reverseData: ReverseData = ReverseData.nice,
     mstBuff: Optional[MstBuff] = None,
+    reverse_entities: Optional[ReverseEntities] = None,
 ) -> NiceBuffReverse:
     raw_buff = await raw.get_buff_entity_no_reverse(conn, buff_id, mstBuff)
     nice_buff = NiceBuffReverse.parse_obj(get_nice_buff(raw_buff, region))
     if reverse and reverseDepth >= ReverseDepth.function:
-        func_ids = await get_reverse_ids(
-            redis, region, RedisReverse.BUFF_TO_FUNC, buff_id
-        )
-        if reverseData == ReverseData.basic:
-            basic_buff_reverse = BasicReversedBuff(
-                function=[
-                    await get_basic_function(
-                        redis, region, func_id, lang, reverse, reverseDepth
-                    )
-                    for func_id in func_ids
-                ]
+        if reverse_entities is None:
+            reverse_entities = await get_reverse_entities(
+                conn, redis, region, lang, reverseDepth, reverseData, buff_ids=[buff_id]
+            )
+        if isinstance(reverse_entities, BasicReverseEntities):
+            nice_buff.reverse = NiceReversedBuffType(
+                basic=reverse_entities.get_buff_reverse(buff_id)
             )
-            nice_buff.reverse = NiceReversedBuffType(basic=basic_buff_reverse)
         else:
-            buff_reverse = NiceReversedBuff(
-                function=[
-                    await get_nice_func_with_reverse(
-                        conn, redis, region, func_id, lang, reverse, reverseDepth
-                    )
-                    for func_id in func_ids
-                ]
+            nice_buff.reverse = NiceReversedBuffType(
+                nice=reverse_entities.get_buff_reverse(buff_id)
             )
-            nice_buff.reverse = NiceReversedBuffType(nice=buff_reverse)
     return nice_buff
 
 
@@ -125,6 +277,7 @@ async def get_nice_func_with_reverse(
     reverseDepth: ReverseDepth = ReverseDepth.skillNp,
     reverseData: ReverseData = ReverseData.nice,
     mstFunc: Optional[MstFunc] = None,
+    reverse_entities: Optional[ReverseEntities] = None,
 ) -> NiceBaseFunctionReverse:
     raw_func = await raw.get_func_entity_no_reverse(conn, func_id, True, mstFunc)
     nice_func = NiceBaseFunctionReverse.parse_obj(
@@ -132,42 +285,18 @@ async def get_nice_func_with_reverse(
     )
 
     if reverse and reverseDepth >= ReverseDepth.skillNp:
-        skill_ids = await get_reverse_ids(
-            redis, region, RedisReverse.FUNC_TO_SKILL, func_id
-        )
-        td_ids = await get_reverse_ids(redis, region, RedisReverse.FUNC_TO_TD, func_id)
-        if reverseData == ReverseData.basic:
-            basic_func_reverse = BasicReversedFunction(
-                skill=[
-                    await get_basic_skill(
-                        redis, region, skill_id, lang, reverse, reverseDepth
-                    )
-                    for skill_id in skill_ids
-                ],
-                NP=[
-                    await get_basic_td(
-                        redis, region, td_id, lang, reverse, reverseDepth
-                    )
-                    for td_id in td_ids
-                ],
+        if reverse_entities is None:
+            reverse_entities = await get_reverse_entities(
+                conn, redis, region, lang, reverseDepth, reverseData, func_ids=[func_id]
+            )
+        if isinstance(reverse_entities, BasicReverseEntities):
+            nice_func.reverse = NiceReversedFunctionType(
+                basic=reverse_entities.get_func_reverse(func_id)
             )
-            nice_func.reverse = NiceReversedFunctionType(basic=basic_func_reverse)
         else:
-            func_reverse = NiceReversedFunction(
-                skill=[
-                    await get_nice_skill_with_reverse(
-                        conn, redis, region, skill_id, lang, reverse, reverseDepth
-                    )
-                    for skill_id in skill_ids
-                ],
-                NP=[
-                    await get_nice_td_with_reverse(
-                        conn, redis, region, td_id, lang, reverse, reverseDepth
-                    )
-                    for td_id in td_ids
-                ],
+            nice_func.reverse = NiceReversedFunctionType(
+                nice=reverse_entities.get_func_reverse(func_id)
             )
-            nice_func.reverse = NiceReversedFunctionType(nice=func_reverse)
     return nice_func
 
 
@@ -180,51 +309,30 @@ async def get_nice_skill_with_reverse(
     reverse: bool = False,
     reverseDepth: ReverseDepth = ReverseDepth.servant,
     reverseData: ReverseData = ReverseData.nice,
+    reverse_entities: Optional[ReverseEntities] = None,
 ) -> NiceSkillReverse:
     raw_skill = await raw.get_skill_entity_no_reverse(conn, skill_id, expand=True)
     nice_skill = await get_nice_skill_from_raw(conn, region, raw_skill, lang)
 
     if reverse and reverseDepth >= ReverseDepth.servant:
-        activeSkills = {svt_skill.svtId for svt_skill in raw_skill.mstSvtSkill}
-
-        passiveSkills = set(
-            await get_reverse_ids(
-                redis, region, RedisReverse.PASSIVE_SKILL_TO_SVT, skill_id
+        if reverse_entities is None:
+            reverse_entities = await get_reverse_entities(
+                conn,
+                redis,
+                region,
+                lang,
+                reverseDepth,
+                reverseData,
+                skill_ids=[skill_id],
             )
-        )
-        mc_ids = await get_reverse_ids(
-            redis, region, RedisReverse.SKILL_TO_MC, skill_id
-        )
-        cc_ids = await get_reverse_ids(
-            redis, region, RedisReverse.SKILL_TO_CC, skill_id
-        )
-
-        if reverseData == ReverseData.basic:
-            basic_skill_reverse = BasicReversedSkillTd(
-                servant=[
-                    await get_basic_servant(redis, region, svt_id, lang=lang)
-                    for svt_id in sorted(activeSkills | passiveSkills)
-                ],
-                MC=[await get_basic_mc(redis, region, mc_id, lang) for mc_id in mc_ids],
-                CC=[await get_basic_cc(redis, region, cc_id, lang) for cc_id in cc_ids],
+        if isinstance(reverse_entities, BasicReverseEntities):
+            nice_skill.reverse = NiceReversedSkillTdType(
+                basic=reverse_entities.get_skill_reverse(skill_id)
             )
-            nice_skill.reverse = NiceReversedSkillTdType(basic=basic_skill_reverse)
         else:
-            skill_reverse = NiceReversedSkillTd(
-                servant=[
-                    await get_nice_servant_model(conn, region, svt_id, lang=lang)
-                    for svt_id in sorted(activeSkills | passiveSkills)
-                ],
-                MC=[
-                    await get_nice_mystic_code(conn, region, mc_id, lang)
-                    for mc_id in mc_ids
-                ],
-                CC=[
-                    await get_nice_command_code(conn, region, cc_id, lang)
-                    for cc_id in cc_ids
-                ],
+            nice_skill.reverse = NiceReversedSkillTdType(
+                nice=reverse_entities.get_skill_reverse(skill_id)
             )
-            nice_skill.reverse = NiceReversedSkillTdType(nice=skill_reverse)
     return nice_skill
 
 
@@ -237,29 +345,22 @@ async def get_nice_td_with_reverse(
     reverse: bool = False,
     reverseDepth: ReverseDepth = ReverseDepth.servant,
     reverseData: ReverseData = ReverseData.nice,
+    reverse_entities: Optional[ReverseEntities] = None,
 ) -> NiceTdReverse:
     raw_td = await raw.get_td_entity_no_reverse(conn, td_id, expand=True)
-
-    svt_id = next((svt_id.svtId for svt_id in raw_td.mstSvtTreasureDevice), td_id)
-    nice_td = NiceTdReverse.parse_obj(
-        (await get_nice_td(conn, raw_td, svt_id, region, lang))[0]
-    )
+    nice_td = await get_nice_td_reverse(conn, region, raw_td, lang)
 
     if reverse and reverseDepth >= ReverseDepth.servant:
-        if reverseData == ReverseData.basic:
-            basic_td_reverse = BasicReversedSkillTd(
-                servant=[
-                    await get_basic_servant(redis, region, svt_id.svtId, lang=lang)
-                    for svt_id in raw_td.mstSvtTreasureDevice
-                ]
+        if reverse_entities is None:
+            reverse_entities = await get_reverse_entities(
+                conn, redis, region, lang, reverseDepth, reverseData, td_ids=[td_id]
+            )
+        if isinstance(reverse_entities, BasicReverseEntities):
+            nice_td.reverse = NiceReversedSkillTdType(
+                basic=reverse_entities.get_td_reverse(td_id)
             )
-            nice_td.reverse = NiceReversedSkillTdType(basic=basic_td_reverse)
         else:
-            td_reverse = NiceReversedSkillTd(
-                servant=[
-                    await get_nice_servant_model(conn, region, svt_id.svtId, lang=lang)
-                    for svt_id in raw_td.mstSvtTreasureDevice
-                ]
+            nice_td.reverse = NiceReversedSkillTdType(
+                nice=reverse_entities.get_td_reverse(td_id)
             )
-            nice_td.reverse = NiceReversedSkillTdType(nice=td_reverse)
     return nice_td
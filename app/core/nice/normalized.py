@@ -0,0 +1,154 @@
+import hashlib
+from typing import Any
+
+import orjson
+from pydantic.json import pydantic_encoder
+
+from ...schemas.nice import NiceQuestPhase, NiceServant
+
+
+def get_normalized_key(entity_id: int, data: dict[str, Any]) -> str:
+    """Entity ID and a short hash of the entity values"""
+    values = orjson.dumps(
+        data,
+        default=pydantic_encoder,
+        option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+    )
+    return f"{entity_id}-{hashlib.sha1(values).hexdigest()[:12]}"
+
+
+class NiceNormalizer:
+    """
+    Move the functions and buffs of nice servants and quest phases to top level
+    tables and replace them with their keys.
+    Works on the dicts of the models so the result can be serialized
+    without validating the models again.
+    """
+
+    def __init__(self) -> None:
+        self.functions: dict[str, dict[str, Any]] = {}
+        self.buffs: dict[str, dict[str, Any]] = {}
+
+    def normalize_buff(self, buff: dict[str, Any]) -> str:
+        buff_key = get_normalized_key(buff["id"], buff)
+        self.buffs.setdefault(buff_key, buff)
+        return buff_key
+
+    def normalize_function(self, function: dict[str, Any]) -> str:
+        normalized_function = function | {
+            "buffs": [self.normalize_buff(buff) for buff in function["buffs"]]
+        }
+        function_key = get_normalized_key(function["funcId"], normalized_function)
+        self.functions.setdefault(function_key, normalized_function)
+        return function_key
+
+    def normalize_skill(self, skill: dict[str, Any]) -> dict[str, Any]:
+        """Also works for NPs"""
+        return skill | {
+            "functions": [
+                self.normalize_function(function) for function in skill["functions"]
+            ]
+        }
+
+    def normalize_servant(self, servant: NiceServant) -> dict[str, Any]:
+        nice_servant = servant.dict(exclude_unset=True, exclude_none=True)
+        for skill_field in ("skills", "classPassive", "extraPassive", "noblePhantasms"):
+            if skill_field in nice_servant:
+                nice_servant[skill_field] = [
+                    self.normalize_skill(skill) for skill in nice_servant[skill_field]
+                ]
+        if "appendPassive" in nice_servant:
+            nice_servant["appendPassive"] = [
+                append_passive
+                | {"skill": self.normalize_skill(append_passive["skill"])}
+                for append_passive in nice_servant["appendPassive"]
+            ]
+        return nice_servant
+
+    def normalize_enemy_skills(self, skills: dict[str, Any]) -> dict[str, Any]:
+        """Also works for the skills of support servants"""
+        return skills | {
+            skill_field: self.normalize_skill(skills[skill_field])
+            for skill_field in ("skill1", "skill2", "skill3")
+            if skill_field in skills
+        }
+
+    def normalize_enemy_td(self, enemy_td: dict[str, Any]) -> dict[str, Any]:
+        """Also works for the NPs of support servants"""
+        if "noblePhantasm" not in enemy_td:
+            return enemy_td
+        return enemy_td | {
+            "noblePhantasm": self.normalize_skill(enemy_td["noblePhantasm"])
+        }
+
+    def normalize_enemy(self, enemy: dict[str, Any]) -> dict[str, Any]:
+        class_passive = enemy["classPassive"]
+        return enemy | {
+            "skills": self.normalize_enemy_skills(enemy["skills"]),
+            "classPassive": {
+                passive_field: [
+                    self.normalize_skill(skill)
+                    for skill in class_passive[passive_field]
+                ]
+                for passive_field in ("classPassive", "addPassive")
+            },
+            "noblePhantasm": self.normalize_enemy_td(enemy["noblePhantasm"]),
+        }
+
+    def normalize_quest_phase(self, quest_phase: NiceQuestPhase) -> dict[str, Any]:
+        nice_quest_phase = quest_phase.dict(exclude_unset=True, exclude_none=True)
+        nice_quest_phase["stages"] = [
+            stage
+            | {
+                "enemies": [
+                    self.normalize_enemy(enemy) for enemy in stage.get("enemies", [])
+                ]
+            }
+            for stage in nice_quest_phase["stages"]
+        ]
+        nice_quest_phase["supportServants"] = [
+            support_servant
+            | {
+                "skills": self.normalize_enemy_skills(support_servant["skills"]),
+                "noblePhantasm": self.normalize_enemy_td(
+                    support_servant["noblePhantasm"]
+                ),
+            }
+            for support_servant in nice_quest_phase["supportServants"]
+        ]
+        return nice_quest_phase
+
+
+def get_normalized_servant(servant: NiceServant) -> dict[str, Any]:
+    """Dict of NiceNormalizedServantResponse"""
+    normalizer = NiceNormalizer()
+    normalized_servant = normalizer.normalize_servant(servant)
+    return {
+        "servant": normalized_servant,
+        "functions": normalizer.functions,
+        "buffs": normalizer.buffs,
+    }
+
+
+def get_normalized_servant_list(servants: list[NiceServant]) -> dict[str, Any]:
+    """Dict of NiceNormalizedServantListResponse"""
+    normalizer = NiceNormalizer()
+    normalized_servants = [
+        normalizer.normalize_servant(servant) for servant in servants
+    ]
+    return {
+        "servants": normalized_servants,
+        "functions": normalizer.functions,
+        "buffs": normalizer.buffs,
+    }
+
+
+def get_normalized_quest_phase(quest_phase: NiceQuestPhase) -> dict[str, Any]:
+    """Dict of NiceNormalizedQuestPhaseResponse"""
+    normalizer = NiceNormalizer()
+    normalized_quest_phase = normalizer.normalize_quest_phase(quest_phase)
+    return {
+        "questPhase": normalized_quest_phase,
+        "functions": normalizer.functions,
+        "buffs": normalizer.buffs,
+    }
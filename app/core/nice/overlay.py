@@ -0,0 +1,187 @@
+from typing import Any, Callable, Optional, TypeVar
+
+from pydantic import BaseModel
+
+from ...data.custom_mappings import Translation
+from ...schemas.basic import BasicServant
+from ...schemas.common import BasicCostume, Language, NiceCostume, Region
+from ...schemas.nice import (
+    AscensionAdd,
+    NiceBgmEntity,
+    NiceBuff,
+    NiceEquip,
+    NiceEvent,
+    NiceFunction,
+    NiceItem,
+    NiceLore,
+    NiceQuest,
+    NiceServant,
+    NiceSkill,
+    NiceSkillAdd,
+    NiceSpot,
+    NiceTd,
+    NiceTrait,
+    NiceVoiceLine,
+    NiceWar,
+    QuestEnemy,
+)
+from ..utils import get_np_name, get_translation, get_voice_name
+
+
+TModel = TypeVar("TModel", bound=BaseModel)
+
+
+def overlay_svt(svt: Any, lang: Language, _: Region) -> None:
+    svt.name = get_translation(lang, svt.originalName)
+
+
+def overlay_lore(lore: NiceLore, lang: Language, _: Region) -> None:
+    lore.cv = get_translation(lang, lore.cv)
+    lore.illustrator = get_translation(lang, lore.illustrator)
+
+
+def overlay_costume(costume: NiceCostume, lang: Language, _: Region) -> None:
+    costume.shortName = get_translation(lang, costume.shortName)
+
+
+def overlay_basic_svt(svt: BasicServant, lang: Language, region: Region) -> None:
+    if region == Region.JP:
+        svt.name = get_translation(lang, svt.name)
+
+
+def overlay_basic_costume(
+    costume: BasicCostume, lang: Language, region: Region
+) -> None:
+    if region == Region.JP:
+        costume.shortName = get_translation(lang, costume.shortName)
+
+
+def overlay_skill(skill: NiceSkill, lang: Language, _: Region) -> None:
+    skill.name = get_translation(lang, skill.originalName)
+
+
+def overlay_skill_add(skill_add: NiceSkillAdd, lang: Language, _: Region) -> None:
+    skill_add.name = get_translation(lang, skill_add.name)
+
+
+def overlay_td(td: NiceTd, lang: Language, _: Region) -> None:
+    td.name = get_np_name(td.originalName, td.ruby, lang)
+
+
+def overlay_original_name(model: Any, lang: Language, _: Region) -> None:
+    """For models whose name is only the translated originalName"""
+    model.name = get_translation(lang, model.originalName)
+
+
+def overlay_voice_line(voice_line: NiceVoiceLine, lang: Language, _: Region) -> None:
+    voice_line.overwriteName = get_voice_name(
+        voice_line.overwriteName, lang, Translation.OVERWRITE_VOICE
+    )
+    if voice_line.name is not None:
+        voice_line.name = get_voice_name(voice_line.name, lang, Translation.VOICE)
+
+
+def overlay_ascension_add(
+    ascension_add: AscensionAdd, lang: Language, region: Region
+) -> None:
+    if region != Region.JP:
+        return
+    for category in ("ascension", "costume"):
+        for field, original_field in (
+            ("overWriteServantName", "originalOverWriteServantName"),
+            ("overWriteServantBattleName", "originalOverWriteServantBattleName"),
+        ):
+            translated: dict[int, str] = getattr(
+                getattr(ascension_add, field), category
+            )
+            original = getattr(getattr(ascension_add, original_field), category)
+            for limit, name in original.items():
+                translated[limit] = get_translation(lang, name)
+
+        td_names: dict[int, str] = getattr(ascension_add.overWriteTDName, category)
+        td_rubies = getattr(ascension_add.overWriteTDRuby, category)
+        for limit, name in getattr(
+            ascension_add.originalOverWriteTDName, category
+        ).items():
+            td_names[limit] = get_np_name(name, td_rubies.get(limit, name), lang)
+
+
+def overlay_war(war: NiceWar, lang: Language, _: Region) -> None:
+    war.name = get_translation(lang, war.originalName)
+    war.longName = get_translation(lang, war.originalLongName)
+    war.eventName = get_translation(lang, war.eventName)
+
+
+def overlay_quest(quest: NiceQuest, lang: Language, _: Region) -> None:
+    quest.name = get_translation(lang, quest.name)
+    quest.spotName = get_translation(lang, quest.spotName)
+    quest.warLongName = get_translation(lang, quest.warLongName)
+
+
+def overlay_quest_enemy(enemy: QuestEnemy, lang: Language, _: Region) -> None:
+    enemy.name = get_translation(lang, enemy.name, Translation.ENEMY)
+
+
+MODEL_OVERLAYS: dict[type, Callable[[Any, Language, Region], None]] = {
+    NiceServant: overlay_svt,
+    NiceEquip: overlay_svt,
+    NiceLore: overlay_lore,
+    NiceCostume: overlay_costume,
+    BasicServant: overlay_basic_svt,
+    BasicCostume: overlay_basic_costume,
+    NiceSkill: overlay_skill,
+    NiceSkillAdd: overlay_skill_add,
+    NiceTd: overlay_td,
+    NiceItem: overlay_original_name,
+    NiceBgmEntity: overlay_original_name,
+    NiceVoiceLine: overlay_voice_line,
+    AscensionAdd: overlay_ascension_add,
+    NiceEvent: overlay_original_name,
+    NiceWar: overlay_war,
+    NiceSpot: overlay_original_name,
+    NiceQuest: overlay_quest,
+    QuestEnemy: overlay_quest_enemy,
+}
+
+
+# Models without any translated field. The overlay doesn't walk through them.
+NO_OVERLAY_MODELS = (NiceFunction, NiceBuff, NiceTrait)
+
+
+def get_model_overlay(
+    model_type: type,
+) -> Optional[Callable[[Any, Language, Region], None]]:
+    for base_type in model_type.__mro__:
+        if base_type in MODEL_OVERLAYS:
+            return MODEL_OVERLAYS[base_type]
+    return None
+
+
+def walk_overlay(data: Any, lang: Language, region: Region, seen: set[int]) -> None:
+    if isinstance(data, BaseModel):
+        if isinstance(data, NO_OVERLAY_MODELS) or id(data) in seen:
+            return
+        # The builders reuse some models such as NiceItem in several places
+        seen.add(id(data))
+        if overlay := get_model_overlay(type(data)):
+            overlay(data, lang, region)
+        for field_name in data.__fields__:
+            walk_overlay(getattr(data, field_name), lang, region, seen)
+    elif isinstance(data, list):
+        for item in data:
+            walk_overlay(item, lang, region, seen)
+    elif isinstance(data, dict):
+        for item in data.values():
+            walk_overlay(item, lang, region, seen)
+
+
+def apply_translation_overlay(model: TModel, lang: Language, region: Region) -> TModel:
+    """
+    Translate a nice model built with Language.jp in place.
+    The Language.jp model keeps the original strings in the translatable fields
+    so this gives the same result as building the model again with `lang`
+    at a fraction of the cost.
+    """
+    if lang != Language.jp:
+        walk_overlay(model, lang, region, set())
+    return model
@@ -25,6 +25,7 @@ from ...schemas.gameenums import (
 from ...schemas.nice import (
     DeckType,
     EnemyDrop,
+    NiceItem,
     NiceQuest,
     NiceQuestMessage,
     NiceQuestPhase,
@@ -53,7 +54,8 @@ from .bgm import get_nice_bgm
 from .enemy import get_nice_drop, get_quest_enemies
 from .follower import get_nice_support_servants
 from .gift import get_nice_gift
-from .item import get_nice_item_amount_db
+from .item import get_nice_item_amount_db, get_nice_item_amount_map
+from .overlay import apply_translation_overlay
 
 
 settings = Settings()
@@ -124,7 +126,12 @@ async def get_nice_quest(
     lang: Language,
     mstWar: Optional[MstWar] = None,
     mstSpot: Optional[MstSpot] = None,
+    item_map: Optional[dict[int, NiceItem]] = None,
 ) -> dict[str, Any]:
+    """
+    `item_map` has the consume items of the quest so the war builder can fetch the
+    items of all its quests at once.
+    """
     if not mstWar:
         mstWar = await war.get_war_from_spot(conn, raw_quest.mstQuest.spotId)
     if not mstSpot:
@@ -140,8 +147,14 @@ async def get_nice_quest(
         "consumeItem": [
             nice_item_amount
             for consumeItem in raw_quest.mstQuestConsumeItem
-            for nice_item_amount in await get_nice_item_amount_db(
-                conn, region, consumeItem.itemIds, consumeItem.nums, lang
+            for nice_item_amount in (
+                get_nice_item_amount_map(
+                    consumeItem.itemIds, consumeItem.nums, item_map
+                )
+                if item_map is not None
+                else await get_nice_item_amount_db(
+                    conn, region, consumeItem.itemIds, consumeItem.nums, lang
+                )
             )
         ],
         "consume": raw_quest.mstQuest.actConsume,
@@ -264,7 +277,12 @@ async def get_nice_quest_phase(
     quest_id: int,
     phase: int,
     lang: Language = Language.jp,
+    rayshift_live_lookup: bool = True,
 ) -> NiceQuestPhase:
+    """
+    Without `rayshift_live_lookup`, the stages are built from the Rayshift data
+    already in the db and aren't cached if there's none.
+    """
     db_data: DBQuestPhase = await get_nice_quest_phase_no_rayshift(
         conn, redis, region, quest_id, phase, lang
     )
@@ -276,12 +294,12 @@ async def get_nice_quest_phase(
     else:
         questSelect = None
 
-    rayshift_data = await get_stages_cache(
-        redis, region, quest_id, phase, questSelect, lang
-    )
+    rayshift_data = await get_stages_cache(redis, region, quest_id, phase, questSelect)
 
     if rayshift_data:
-        db_data.nice.stages = rayshift_data.stages
+        db_data.nice.stages = apply_translation_overlay(
+            rayshift_data, lang, region
+        ).stages
         db_data.nice.drops = rayshift_data.quest_drops
         return db_data.nice
 
@@ -298,7 +316,13 @@ async def get_nice_quest_phase(
                 rayshift_quest_id = quest_select_owner.questId
                 questSelect = quest_select_owner.script["questSelect"].index(quest_id)
         rayshift_quest_detail = await get_quest_detail(
-            conn, region, rayshift_quest_id, phase, questSelect
+            conn,
+            redis,
+            region,
+            rayshift_quest_id,
+            phase,
+            questSelect,
+            rayshift_live_lookup,
         )
         rayshift_quest_drops = await get_rayshift_drops(
             conn, rayshift_quest_id, phase, questSelect
@@ -311,7 +335,7 @@ async def get_nice_quest_phase(
                 stages,
                 rayshift_quest_detail,
                 rayshift_quest_drops,
-                lang,
+                Language.jp,
             )
             nice_quest_drops = [
                 get_nice_drop(drop)
@@ -327,15 +351,14 @@ async def get_nice_quest_phase(
         get_nice_stage(region, stage, enemies, db_data.raw.mstBgm)
         for stage, enemies in zip(stages, quest_enemies)
     ]
-    db_data.nice.stages = new_nice_stages
-    db_data.nice.drops = nice_quest_drops
+    # The stages are built and cached in Language.jp once for all languages
+    cache_data = RayshiftRedisData(quest_drops=nice_quest_drops, stages=new_nice_stages)
     if save_stages_cache:
-        cache_data = RayshiftRedisData(
-            quest_drops=nice_quest_drops, stages=new_nice_stages
-        )
         long_ttl = time.time() > db_data.nice.closedAt
         await set_stages_cache(
-            redis, cache_data, region, quest_id, phase, questSelect, lang, long_ttl
+            redis, cache_data, region, quest_id, phase, questSelect, long_ttl
         )
+    db_data.nice.stages = apply_translation_overlay(cache_data, lang, region).stages
+    db_data.nice.drops = nice_quest_drops
 
     return db_data.nice
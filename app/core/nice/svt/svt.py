@@ -4,7 +4,7 @@ import orjson
 from sqlalchemy.ext.asyncio import AsyncConnection
 
 from ....config import Settings
-from ....schemas.common import Language, NiceCostume, Region
+from ....schemas.common import FieldProjection, Language, NiceCostume, Region
 from ....schemas.enums import (
     ATTRIBUTE_NAME,
     CLASS_NAME,
@@ -137,11 +137,19 @@ async def get_nice_servant(
     lore: bool = False,
     mstSvt: Optional[MstSvt] = None,
     raw_svt: Optional[ServantEntity] = None,
+    projection: FieldProjection = FieldProjection(),
 ) -> dict[str, Any]:
+    """Sections not in `projection` are left out of the returned dict"""
+    lore = lore and "profile" in projection
     # Get expanded servant entity to get function and buff details
     if not raw_svt:
         raw_svt = await raw.get_servant_entity(
-            conn, svt_id, expand=True, lore=lore, mstSvt=mstSvt
+            conn,
+            svt_id,
+            expand=True,
+            lore=lore,
+            mstSvt=mstSvt,
+            projection=projection,
         )
     last_svt_limit = raw_svt.mstSvtLimit[-1]
 
@@ -197,7 +205,10 @@ async def get_nice_servant(
         nice_data["valentineEquipOwner"] = None
         costume_ids = {}
 
-    nice_data["extraAssets"] = get_svt_extraAssets(region, svt_id, raw_svt, costume_ids)
+    if "extraAssets" in projection:
+        nice_data["extraAssets"] = get_svt_extraAssets(
+            region, svt_id, raw_svt, costume_ids
+        )
 
     lvMax = max(svt_limit.lvMax for svt_limit in raw_svt.mstSvtLimit)
     atkMax = last_svt_limit.atkMax
@@ -244,9 +255,10 @@ async def get_nice_servant(
         for svt_card in raw_svt.mstSvtCard
     }
 
-    nice_data["ascensionAdd"] = get_nice_ascensionAdd(
-        region, raw_svt, costume_ids, lang
-    )
+    if "ascensionAdd" in projection:
+        nice_data["ascensionAdd"] = get_nice_ascensionAdd(
+            region, raw_svt, costume_ids, lang
+        )
 
     nice_data["svtChange"] = [
         get_nice_servant_change(change) for change in raw_svt.mstSvtChange
@@ -260,13 +272,14 @@ async def get_nice_servant(
         item.id: get_nice_item_from_raw(region, item, lang) for item in raw_svt.mstItem
     }
 
-    nice_data["ascensionMaterials"] = {
-        combine.svtLimit: get_nice_item_amount_qp(
-            combine.itemIds, combine.itemNums, combine.qp, item_map
-        )
-        for combine in raw_svt.mstCombineLimit
-        if combine.svtLimit != BAD_COMBINE_SVT_LIMIT
-    }
+    if "ascensionMaterials" in projection:
+        nice_data["ascensionMaterials"] = {
+            combine.svtLimit: get_nice_item_amount_qp(
+                combine.itemIds, combine.itemNums, combine.qp, item_map
+            )
+            for combine in raw_svt.mstCombineLimit
+            if combine.svtLimit != BAD_COMBINE_SVT_LIMIT
+        }
 
     nice_data["skillMaterials"] = {
         combine.skillLv: get_nice_item_amount_qp(
@@ -282,12 +295,13 @@ async def get_nice_servant(
         for combine in raw_svt.mstCombineAppendPassiveSkill
     }
 
-    nice_data["costumeMaterials"] = {
-        costume_ids[combine.costumeId]: get_nice_item_amount_qp(
-            combine.itemIds, combine.itemNums, combine.qp, item_map
-        )
-        for combine in raw_svt.mstCombineCostume
-    }
+    if "costumeMaterials" in projection:
+        nice_data["costumeMaterials"] = {
+            costume_ids[combine.costumeId]: get_nice_item_amount_qp(
+                combine.itemIds, combine.itemNums, combine.qp, item_map
+            )
+            for combine in raw_svt.mstCombineCostume
+        }
 
     if raw_svt.mstSvtCoin:
         nice_data["coin"] = {
@@ -295,44 +309,49 @@ async def get_nice_servant(
             "item": item_map[raw_svt.mstSvtCoin.itemId],
         }
 
-    nice_data["script"] = {}
-    if "SkillRankUp" in raw_svt.mstSvt.script:
-        nice_data["script"]["SkillRankUp"] = {
-            rank_up_script[0]: rank_up_script[1:]
-            for rank_up_script in orjson.loads(raw_svt.mstSvt.script["SkillRankUp"])
-        }
-    if "svtBuffTurnExtend" in raw_svt.mstSvt.script:
-        nice_data["script"]["svtBuffTurnExtend"] = (
-            raw_svt.mstSvt.script["svtBuffTurnExtend"] == 1
-        )
+    if "script" in projection:
+        nice_data["script"] = {}
+        if "SkillRankUp" in raw_svt.mstSvt.script:
+            nice_data["script"]["SkillRankUp"] = {
+                rank_up_script[0]: rank_up_script[1:]
+                for rank_up_script in orjson.loads(raw_svt.mstSvt.script["SkillRankUp"])
+            }
+        if "svtBuffTurnExtend" in raw_svt.mstSvt.script:
+            nice_data["script"]["svtBuffTurnExtend"] = (
+                raw_svt.mstSvt.script["svtBuffTurnExtend"] == 1
+            )
 
-    nice_data["skills"] = [
-        skill
-        for skillEntity in raw_svt.mstSkill
-        for skill in await get_nice_skill_with_svt(
-            conn, skillEntity, svt_id, region, lang
-        )
-    ]
+    if "skills" in projection:
+        nice_data["skills"] = [
+            skill
+            for skillEntity in raw_svt.mstSkill
+            for skill in await get_nice_skill_with_svt(
+                conn, skillEntity, svt_id, region, lang
+            )
+        ]
 
-    nice_data["classPassive"] = [
-        skill
-        for skillEntity in raw_svt.mstSvt.expandedClassPassive
-        for skill in await get_nice_skill_with_svt(
-            conn, skillEntity, svt_id, region, lang
-        )
-    ]
+    if "classPassive" in projection:
+        nice_data["classPassive"] = [
+            skill
+            for skillEntity in raw_svt.mstSvt.expandedClassPassive
+            for skill in await get_nice_skill_with_svt(
+                conn, skillEntity, svt_id, region, lang
+            )
+        ]
 
-    nice_data["extraPassive"] = [
-        skill
-        for skillEntity in raw_svt.expandedExtraPassive
-        for skill in await get_nice_skill_with_svt(
-            conn, skillEntity, svt_id, region, lang, raw_svt.mstSvtPassiveSkill
-        )
-    ]
+    if "extraPassive" in projection:
+        nice_data["extraPassive"] = [
+            skill
+            for skillEntity in raw_svt.expandedExtraPassive
+            for skill in await get_nice_skill_with_svt(
+                conn, skillEntity, svt_id, region, lang, raw_svt.mstSvtPassiveSkill
+            )
+        ]
 
-    nice_data["appendPassive"] = await get_nice_svt_append_passives(
-        conn, region, raw_svt, item_map, lang
-    )
+    if "appendPassive" in projection:
+        nice_data["appendPassive"] = await get_nice_svt_append_passives(
+            conn, region, raw_svt, item_map, lang
+        )
 
     # Filter out dummy TDs that are used by enemy servants
     if raw_svt.mstSvt.isServant():
@@ -356,11 +375,12 @@ async def get_nice_servant(
     else:
         playable_tds = raw_svt.mstTreasureDevice
 
-    nice_data["noblePhantasms"] = [
-        td
-        for tdEntity in sorted(playable_tds, key=lambda x: x.mstTreasureDevice.id)
-        for td in await get_nice_td(conn, tdEntity, svt_id, region, lang)
-    ]
+    if "noblePhantasms" in projection:
+        nice_data["noblePhantasms"] = [
+            td
+            for tdEntity in sorted(playable_tds, key=lambda x: x.mstTreasureDevice.id)
+            for td in await get_nice_td(conn, tdEntity, svt_id, region, lang)
+        ]
 
     if lore:
         nice_data["profile"] = {
@@ -1,4 +1,5 @@
-from typing import Protocol
+from collections import defaultdict
+from typing import Iterable, Protocol
 
 from ....config import Settings
 from ....data.custom_mappings import Translation
@@ -59,8 +60,27 @@ def get_nice_play_cond(playCond: MstVoicePlayCond) -> NiceVoicePlayCond:
     )
 
 
+# (svt ID, voice ID) -> play conditions of the voice line
+PlayCondIndex = dict[tuple[int, str], list[MstVoicePlayCond]]
+
+
+def get_play_cond_index(play_conds: Iterable[MstVoicePlayCond]) -> PlayCondIndex:
+    play_cond_index: PlayCondIndex = defaultdict(list)
+    for play_cond in play_conds:
+        play_cond_index[(play_cond.svtId, play_cond.voiceId)].append(play_cond)
+    return play_cond_index
+
+
+def get_svt_group_index(mstSvtGroups: Iterable[MstSvtGroup]) -> dict[int, list[int]]:
+    """svt group ID -> svt IDs in the group"""
+    svt_group_index: dict[int, list[int]] = defaultdict(list)
+    for group in mstSvtGroups:
+        svt_group_index[group.id].append(group.svtId)
+    return svt_group_index
+
+
 def get_nice_voice_cond(
-    cond: ScriptJsonCond, costume_ids: dict[int, int], mstSvtGroups: list[MstSvtGroup]
+    cond: ScriptJsonCond, costume_ids: dict[int, int], svt_groups: dict[int, list[int]]
 ) -> NiceVoiceCond:
     cond_value = (
         costume_ids[cond.value]
@@ -69,7 +89,7 @@ def get_nice_voice_cond(
     )
 
     cond_value_list = (
-        [group.svtId for group in mstSvtGroups if group.id == cond.value]
+        list(svt_groups.get(cond.value, []))
         if cond.condType == VoiceCondType.SVT_GROUP
         else []
     )
@@ -92,9 +112,9 @@ def get_nice_voice_line(
     voice_type: int,
     costume_ids: dict[int, int],
     subtitle_ids: dict[str, str],
-    play_conds: list[MstVoicePlayCond],
+    play_conds: PlayCondIndex,
     mstVoices: dict[str, MstVoice],
-    mstSvtGroups: list[MstSvtGroup],
+    svt_groups: dict[int, list[int]],
     lang: Language,
 ) -> NiceVoiceLine:
     first_voice = script.infos[0]
@@ -113,15 +133,12 @@ def get_nice_voice_line(
         form=[info.form for info in script.infos],
         text=[nullable_to_string(info.text) for info in script.infos],
         conds=[
-            get_nice_voice_cond(info, costume_ids, mstSvtGroups)
-            for info in script.conds
+            get_nice_voice_cond(info, costume_ids, svt_groups) for info in script.conds
         ],
         playConds=[
             get_nice_play_cond(play_cond)
-            for play_cond in play_conds
-            if play_cond.svtId == svt_id
-            and play_cond.voiceId == voice_id
-            and play_cond.voicePrefix in (-1, voice_prefix)
+            for play_cond in play_conds.get((svt_id, voice_id), [])
+            if play_cond.voicePrefix in (-1, voice_prefix)
         ],
         subtitle=subtitle_ids.get(str(svt_id) + "_" + first_voice.id, ""),
     )
@@ -145,9 +162,9 @@ def get_nice_voice_group(
     voice: MstSvtVoice,
     costume_ids: dict[int, int],
     subtitle_ids: dict[str, str],
-    play_conds: list[MstVoicePlayCond],
+    play_conds: PlayCondIndex,
     mstVoices: dict[str, MstVoice],
-    mstSvtGroups: list[MstSvtGroup],
+    svt_groups: dict[int, list[int]],
     lang: Language,
 ) -> NiceVoiceGroup:
     return NiceVoiceGroup(
@@ -165,7 +182,7 @@ def get_nice_voice_group(
                 subtitle_ids,
                 play_conds,
                 mstVoices,
-                mstSvtGroups,
+                svt_groups,
                 lang,
             )
             for script in voice.scriptJson
@@ -190,6 +207,8 @@ def get_nice_voice(
 ) -> list[NiceVoiceGroup]:
     subtitle_ids = {subtitle.id: subtitle.serif for subtitle in voice_data.mstSubtitle}
     mstVoices = {voice.id: voice for voice in voice_data.mstVoice}
+    play_conds = get_play_cond_index(voice_data.mstVoicePlayCond)
+    svt_groups = get_svt_group_index(voice_data.mstSvtGroup)
 
     return [
         get_nice_voice_group(
@@ -197,9 +216,9 @@ def get_nice_voice(
             voice,
             costume_ids,
             subtitle_ids,
-            voice_data.mstVoicePlayCond,
+            play_conds,
             mstVoices,
-            voice_data.mstSvtGroup,
+            svt_groups,
             lang,
         )
         for voice in voice_data.mstSvtVoice
@@ -1,8 +1,10 @@
+from typing import Any, Optional
+
 from sqlalchemy.ext.asyncio import AsyncConnection
 
 from ...config import Settings
 from ...db.helpers import fetch
-from ...schemas.common import Language, Region
+from ...schemas.common import FieldProjection, Language, Region
 from ...schemas.gameenums import (
     COND_TYPE_NAME,
     WAR_FLAG_NAME,
@@ -13,6 +15,7 @@ from ...schemas.gameenums import (
 )
 from ...schemas.nice import (
     AssetURL,
+    NiceItem,
     NiceMap,
     NiceMapGimmick,
     NiceQuest,
@@ -31,11 +34,13 @@ from ...schemas.raw import (
     MstWar,
     MstWarAdd,
     QuestEntity,
+    WarEntity,
 )
 from .. import raw
 from ..utils import fmt_url, get_flags, get_translation
 from .base_script import get_script_url
 from .bgm import get_nice_bgm
+from .item import get_nice_item_map
 from .quest import get_nice_quest
 
 
@@ -165,6 +170,7 @@ async def get_nice_spot(
     war_asset_id: int,
     quests: list[QuestEntity],
     lang: Language,
+    item_map: Optional[dict[int, NiceItem]] = None,
 ) -> NiceSpot:
     return NiceSpot(
         id=raw_spot.id,
@@ -194,7 +200,9 @@ async def get_nice_spot(
         closedMessage=raw_spot.closedMessage,
         quests=[
             NiceQuest.parse_obj(
-                await get_nice_quest(conn, region, quest, lang, mstWar, raw_spot)
+                await get_nice_quest(
+                    conn, region, quest, lang, mstWar, raw_spot, item_map
+                )
             )
             for quest in quests
             if quest.mstQuest.spotId == raw_spot.id
@@ -203,9 +211,15 @@ async def get_nice_spot(
 
 
 async def get_nice_war(
-    conn: AsyncConnection, region: Region, war_id: int, lang: Language
+    conn: AsyncConnection,
+    region: Region,
+    war_id: int,
+    lang: Language,
+    projection: FieldProjection = FieldProjection(),
+    raw_war: Optional[WarEntity] = None,
 ) -> NiceWar:
-    raw_war = await raw.get_war_entity(conn, war_id)
+    if not raw_war:
+        raw_war = await raw.get_war_entity(conn, war_id, projection)
 
     base_settings = {"base_url": settings.asset_url, "region": region}
     war_asset_id = (
@@ -227,7 +241,7 @@ async def get_nice_war(
         region, next(bgm for bgm in raw_war.mstBgm if bgm.id == raw_war.mstWar.bgmId)
     )
 
-    return NiceWar(
+    nice_war: dict[str, Any] = dict(
         id=raw_war.mstWar.id,
         coordinates=raw_war.mstWar.coordinates,
         age=raw_war.mstWar.age,
@@ -273,7 +287,26 @@ async def get_nice_war(
             )
             for raw_map in raw_war.mstMap
         ],
-        spots=[
+        spotRoads=[
+            get_nice_spot_road(region, spot_road, war_asset_id)
+            for spot_road in raw_war.mstSpotRoad
+        ],
+    )
+
+    if "spots" in projection:
+        # Fetch the consume items of all quests at once instead of once per quest
+        item_map = await get_nice_item_map(
+            conn,
+            region,
+            (
+                item_id
+                for quest in raw_war.mstQuest
+                for consume_item in quest.mstQuestConsumeItem
+                for item_id in consume_item.itemIds
+            ),
+            lang,
+        )
+        nice_war["spots"] = [
             await get_nice_spot(
                 conn,
                 region,
@@ -282,11 +315,9 @@ async def get_nice_war(
                 war_asset_id,
                 raw_war.mstQuest,
                 lang,
+                item_map,
             )
             for raw_spot in raw_war.mstSpot
-        ],
-        spotRoads=[
-            get_nice_spot_road(region, spot_road, war_asset_id)
-            for spot_road in raw_war.mstSpotRoad
-        ],
-    )
+        ]
+
+    return projection.parse_obj(NiceWar, nice_war)
@@ -1,4 +1,6 @@
-from typing import Iterable, Optional
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Iterable, Optional, Sequence
 
 import orjson
 from fastapi import HTTPException
@@ -8,8 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncConnection
 from ..data.custom_mappings import EXTRA_CHARAFIGURES
 from ..data.shop import get_shop_cost_item_id
 from ..db.helpers import ai, event, fetch, item, quest, script, skill, svt, td
-from ..redis.helpers.reverse import RedisReverse, get_reverse_ids
-from ..schemas.common import Region, ReverseDepth
+from ..schemas.common import FieldProjection, Region, ReverseDepth
 from ..schemas.enums import FUNC_VALS_NOT_BUFF, DetailMissionCondType
 from ..schemas.gameenums import BgmFlag, CondType, PurchaseType, VoiceCondType
 from ..schemas.raw import (
@@ -115,6 +116,7 @@ from ..schemas.raw import (
     TdEntityNoReverse,
     WarEntity,
 )
+from .reverse import ReverseTree, get_reverse_tree
 
 
 async def get_buff_entity_no_reverse(
@@ -140,18 +142,12 @@ async def get_buff_entity(
         await get_buff_entity_no_reverse(conn, buff_id, mstBuff)
     )
     if reverse and reverseDepth >= ReverseDepth.function:
-        func_ids = await get_reverse_ids(
-            redis, region, RedisReverse.BUFF_TO_FUNC, buff_id
+        reverse_entities = await get_reverse_entities(
+            conn, redis, region, reverseDepth, buff_ids=[buff_id]
         )
-        buff_reverse = ReversedBuff(
-            function=[
-                await get_func_entity(
-                    conn, redis, region, func_id, reverse, reverseDepth
-                )
-                for func_id in func_ids
-            ]
+        buff_entity.reverse = ReversedBuffType(
+            raw=reverse_entities.get_buff_reverse(buff_id)
         )
-        buff_entity.reverse = ReversedBuffType(raw=buff_reverse)
     return buff_entity
 
 
@@ -180,6 +176,47 @@ async def get_func_entity_no_reverse(
     return func_entity
 
 
+async def get_func_entity_no_reverse_many(
+    conn: AsyncConnection, func_ids: Sequence[int], expand: bool = False
+) -> list[FunctionEntityNoReverse]:
+    if not func_ids:
+        return []
+    mstFuncs = await fetch.get_all_multiple(conn, MstFunc, func_ids)
+    if not mstFuncs:
+        raise HTTPException(status_code=404, detail="Function not found")
+
+    mstFuncGroups: dict[int, list[MstFuncGroup]] = defaultdict(list)
+    for mstFuncGroup in await fetch.get_all_multiple(conn, MstFuncGroup, func_ids):
+        mstFuncGroups[mstFuncGroup.funcId].append(mstFuncGroup)
+
+    mstBuffs: dict[int, MstBuff] = {}
+    if expand:
+        buff_ids = {
+            buff_id
+            for mstFunc in mstFuncs
+            if mstFunc.funcType not in FUNC_VALS_NOT_BUFF
+            for buff_id in mstFunc.vals
+        }
+        mstBuffs = {
+            mstBuff.id: mstBuff
+            for mstBuff in await fetch.get_all_multiple(conn, MstBuff, buff_ids)
+        }
+
+    func_entities: dict[int, FunctionEntityNoReverse] = {}
+    for mstFunc in mstFuncs:
+        if expand and mstFunc.funcType not in FUNC_VALS_NOT_BUFF:
+            mstFunc.expandedVals = [
+                BuffEntityNoReverse(mstBuff=mstBuffs[buff_id])
+                for buff_id in mstFunc.vals
+                if buff_id in mstBuffs
+            ]
+        func_entities[mstFunc.id] = FunctionEntityNoReverse(
+            mstFunc=mstFunc, mstFuncGroup=mstFuncGroups[mstFunc.id]
+        )
+
+    return [func_entities[func_id] for func_id in func_ids if func_id in func_entities]
+
+
 async def get_func_entity(
     conn: AsyncConnection,
     redis: Redis,
@@ -194,23 +231,12 @@ async def get_func_entity(
         await get_func_entity_no_reverse(conn, func_id, expand, mstFunc)
     )
     if reverse and reverseDepth >= ReverseDepth.skillNp:
-        skill_ids = await get_reverse_ids(
-            redis, region, RedisReverse.FUNC_TO_SKILL, func_id
+        reverse_entities = await get_reverse_entities(
+            conn, redis, region, reverseDepth, func_ids=[func_id]
         )
-        td_ids = await get_reverse_ids(redis, region, RedisReverse.FUNC_TO_TD, func_id)
-        func_reverse = ReversedFunction(
-            skill=[
-                await get_skill_entity(
-                    conn, redis, region, skill_id, reverse, reverseDepth
-                )
-                for skill_id in skill_ids
-            ],
-            NP=[
-                await get_td_entity(conn, td_id, reverse, reverseDepth)
-                for td_id in td_ids
-            ],
+        func_entity.reverse = ReversedFunctionType(
+            raw=reverse_entities.get_func_reverse(func_id)
         )
-        func_entity.reverse = ReversedFunctionType(raw=func_reverse)
     return func_entity
 
 
@@ -250,29 +276,12 @@ async def get_skill_entity(
     )
 
     if reverse and reverseDepth >= ReverseDepth.servant:
-        activeSkills = {svt_skill.svtId for svt_skill in skill_entity.mstSvtSkill}
-
-        passiveSkills = set(
-            await get_reverse_ids(
-                redis, region, RedisReverse.PASSIVE_SKILL_TO_SVT, skill_id
-            )
+        reverse_entities = await get_reverse_entities(
+            conn, redis, region, reverseDepth, skill_ids=[skill_id]
         )
-        mc_ids = await get_reverse_ids(
-            redis, region, RedisReverse.SKILL_TO_MC, skill_id
+        skill_entity.reverse = ReversedSkillTdType(
+            raw=reverse_entities.get_skill_reverse(skill_id)
         )
-        cc_ids = await get_reverse_ids(
-            redis, region, RedisReverse.SKILL_TO_CC, skill_id
-        )
-
-        skill_reverse = ReversedSkillTd(
-            servant=[
-                await get_servant_entity(conn, svt_id)
-                for svt_id in sorted(activeSkills | passiveSkills)
-            ],
-            MC=[await get_mystic_code_entity(conn, mc_id) for mc_id in mc_ids],
-            CC=[await get_command_code_entity(conn, cc_id) for cc_id in cc_ids],
-        )
-        skill_entity.reverse = ReversedSkillTdType(raw=skill_reverse)
     return skill_entity
 
 
@@ -318,6 +327,112 @@ async def get_td_entity(
     return td_entity
 
 
+@dataclass
+class RawReverseEntities:
+    """Entities of a reverse lookup. Each entity is only built once."""
+
+    tree: ReverseTree
+    svts: dict[int, ServantEntity] = field(default_factory=dict)
+    mcs: dict[int, MysticCodeEntity] = field(default_factory=dict)
+    ccs: dict[int, CommandCodeEntity] = field(default_factory=dict)
+    skills: dict[int, SkillEntity] = field(default_factory=dict)
+    tds: dict[int, TdEntity] = field(default_factory=dict)
+    funcs: dict[int, FunctionEntity] = field(default_factory=dict)
+
+    def get_skill_reverse(self, skill_id: int) -> ReversedSkillTd:
+        return ReversedSkillTd(
+            servant=[self.svts[svt_id] for svt_id in self.tree.skill_svts[skill_id]],
+            MC=[self.mcs[mc_id] for mc_id in self.tree.skill_mcs[skill_id]],
+            CC=[self.ccs[cc_id] for cc_id in self.tree.skill_ccs[skill_id]],
+        )
+
+    def get_td_reverse(self, td_id: int) -> ReversedSkillTd:
+        return ReversedSkillTd(
+            servant=[self.svts[svt_id] for svt_id in self.tree.td_svts[td_id]]
+        )
+
+    def get_func_reverse(self, func_id: int) -> ReversedFunction:
+        return ReversedFunction(
+            skill=[
+                self.skills[skill_id]
+                for skill_id in self.tree.func_skills[func_id]
+                if skill_id in self.skills
+            ],
+            NP=[
+                self.tds[td_id]
+                for td_id in self.tree.func_tds[func_id]
+                if td_id in self.tds
+            ],
+        )
+
+    def get_buff_reverse(self, buff_id: int) -> ReversedBuff:
+        return ReversedBuff(
+            function=[
+                self.funcs[func_id]
+                for func_id in self.tree.buff_funcs[buff_id]
+                if func_id in self.funcs
+            ]
+        )
+
+
+async def get_reverse_entities(
+    conn: AsyncConnection,
+    redis: Redis,
+    region: Region,
+    reverseDepth: ReverseDepth,
+    buff_ids: Sequence[int] = (),
+    func_ids: Sequence[int] = (),
+    skill_ids: Sequence[int] = (),
+) -> RawReverseEntities:
+    """Build the reverse lookup bottom-up so children are built before their parents"""
+    tree = await get_reverse_tree(
+        redis, region, reverseDepth, buff_ids, func_ids, skill_ids
+    )
+    reverse_entities = RawReverseEntities(
+        tree,
+        svts={
+            svt_id: await get_servant_entity(conn, svt_id) for svt_id in tree.svt_ids
+        },
+        mcs={mc_id: await get_mystic_code_entity(conn, mc_id) for mc_id in tree.mc_ids},
+        ccs={
+            cc_id: await get_command_code_entity(conn, cc_id) for cc_id in tree.cc_ids
+        },
+    )
+
+    for skill_entity_no_reverse in await get_skill_entity_no_reverse_many(
+        conn, tree.skill_ids
+    ):
+        skill_entity = SkillEntity.parse_obj(skill_entity_no_reverse)
+        skill_id = skill_entity.mstSkill.id
+        if reverseDepth >= ReverseDepth.servant:
+            skill_entity.reverse = ReversedSkillTdType(
+                raw=reverse_entities.get_skill_reverse(skill_id)
+            )
+        reverse_entities.skills[skill_id] = skill_entity
+
+    for td_entity_no_reverse in await get_td_entity_no_reverse_many(conn, tree.td_ids):
+        td_entity = TdEntity.parse_obj(td_entity_no_reverse)
+        td_id = td_entity.mstTreasureDevice.id
+        if reverseDepth >= ReverseDepth.servant:
+            td_entity.reverse = ReversedSkillTdType(
+                raw=reverse_entities.get_td_reverse(td_id)
+            )
+        reverse_entities.tds[td_id] = td_entity
+
+    for func_entity_no_reverse in await get_func_entity_no_reverse_many(
+        conn, tree.func_ids
+    ):
+        func_entity = FunctionEntity.parse_obj(func_entity_no_reverse)
+        func_id = func_entity.mstFunc.id
+        if reverseDepth >= ReverseDepth.skillNp:
+            func_entity.reverse = ReversedFunctionType(
+                raw=reverse_entities.get_func_reverse(func_id)
+            )
+        reverse_entities.funcs[func_id] = func_entity
+
+    return reverse_entities
+
+
 async def get_svt_scripts(
     conn: AsyncConnection, ids: Iterable[int]
 ) -> list[MstSvtScript]:
@@ -358,7 +473,12 @@ async def get_servant_entity(
     expand: bool = False,
     lore: bool = False,
     mstSvt: Optional[MstSvt] = None,
+    projection: FieldProjection = FieldProjection(),
 ) -> ServantEntity:
+    """
+    `projection` takes nice servant field names.
+    Tables only used by the nice fields not in `projection` are not fetched.
+    """
     svt_db = mstSvt if mstSvt else await fetch.get_one(conn, MstSvt, servant_id)
     if not svt_db:
         raise HTTPException(status_code=404, detail="Svt not found")
@@ -366,49 +486,92 @@ async def get_servant_entity(
     mstSvtIndividuality = await fetch.get_all(conn, MstSvtIndividuality, servant_id)
     mstSvtCard = await fetch.get_all(conn, MstSvtCard, servant_id)
     mstSvtLimit = await fetch.get_all(conn, MstSvtLimit, servant_id)
-    mstCombineSkill = await fetch.get_all(conn, MstCombineSkill, svt_db.combineSkillId)
-    mstCombineLimit = await fetch.get_all(conn, MstCombineLimit, svt_db.combineLimitId)
-    mstCombineCostume = await fetch.get_all(conn, MstCombineCostume, servant_id)
+    mstCombineSkill = (
+        await fetch.get_all(conn, MstCombineSkill, svt_db.combineSkillId)
+        if "skillMaterials" in projection
+        else []
+    )
+    mstCombineLimit = (
+        await fetch.get_all(conn, MstCombineLimit, svt_db.combineLimitId)
+        if "ascensionMaterials" in projection
+        else []
+    )
+    mstCombineCostume = (
+        await fetch.get_all(conn, MstCombineCostume, servant_id)
+        if "costumeMaterials" in projection
+        else []
+    )
     mstSvtLimitAdd = await fetch.get_all(conn, MstSvtLimitAdd, servant_id)
     mstSvtLimitImage = await fetch.get_all(conn, MstSvtLimitImage, servant_id)
     mstSvtChange = await fetch.get_all(conn, MstSvtChange, servant_id)
     mstSvtCostume = await fetch.get_all(conn, MstSvtCostume, servant_id)
-    mstSvtExp = await fetch.get_all(conn, MstSvtExp, svt_db.expType)
-    mstFriendship = await fetch.get_all(conn, MstFriendship, svt_db.friendshipId)
-    mstCombineMaterial = await fetch.get_all(
-        conn, MstCombineMaterial, svt_db.combineMaterialId
+    mstSvtExp = (
+        await fetch.get_all(conn, MstSvtExp, svt_db.expType)
+        if any(field in projection for field in ("atkGrowth", "hpGrowth", "expGrowth"))
+        else []
     )
-    mstSvtPassiveSkill = await fetch.get_all(conn, MstSvtPassiveSkill, servant_id)
-    mstSvtExtra = await fetch.get_one(conn, MstSvtExtra, servant_id)
-    mstSvtAppendPassiveSkill = await fetch.get_all(
-        conn, MstSvtAppendPassiveSkill, servant_id
+    mstFriendship = (
+        await fetch.get_all(conn, MstFriendship, svt_db.friendshipId)
+        if "bondGrowth" in projection
+        else []
     )
-    mstSvtAppendPassiveSkillUnlock = await fetch.get_all(
-        conn, MstSvtAppendPassiveSkillUnlock, servant_id
+    mstCombineMaterial = (
+        await fetch.get_all(conn, MstCombineMaterial, svt_db.combineMaterialId)
+        if "expFeed" in projection
+        else []
     )
-    mstCombineAppendPassiveSkill = await fetch.get_all(
-        conn, MstCombineAppendPassiveSkill, servant_id
+    mstSvtPassiveSkill = await fetch.get_all(conn, MstSvtPassiveSkill, servant_id)
+    mstSvtExtra = await fetch.get_one(conn, MstSvtExtra, servant_id)
+    if "appendPassive" in projection or "appendSkillMaterials" in projection:
+        mstSvtAppendPassiveSkill = await fetch.get_all(
+            conn, MstSvtAppendPassiveSkill, servant_id
+        )
+        mstSvtAppendPassiveSkillUnlock = await fetch.get_all(
+            conn, MstSvtAppendPassiveSkillUnlock, servant_id
+        )
+        mstCombineAppendPassiveSkill = await fetch.get_all(
+            conn, MstCombineAppendPassiveSkill, servant_id
+        )
+    else:
+        mstSvtAppendPassiveSkill = []
+        mstSvtAppendPassiveSkillUnlock = []
+        mstCombineAppendPassiveSkill = []
+    mstSvtCoin = (
+        await fetch.get_one(conn, MstSvtCoin, servant_id)
+        if "coin" in projection
+        else None
     )
-    mstSvtCoin = await fetch.get_one(conn, MstSvtCoin, servant_id)
     mstSvtAdd = await fetch.get_one(conn, MstSvtAdd, servant_id)
-    mstSvtMultiPortrait = await fetch.get_all(conn, MstSvtMultiPortrait, servant_id)
 
-    costume_chara_ids = [limit.battleCharaId for limit in mstSvtLimitAdd]
-    mstSvtScript = await svt.get_svt_script(
-        conn, [servant_id] + costume_chara_ids + EXTRA_CHARAFIGURES.get(servant_id, [])
-    )
+    if "extraAssets" in projection:
+        mstSvtMultiPortrait = await fetch.get_all(conn, MstSvtMultiPortrait, servant_id)
+        costume_chara_ids = [limit.battleCharaId for limit in mstSvtLimitAdd]
+        mstSvtScript = await svt.get_svt_script(
+            conn,
+            [servant_id] + costume_chara_ids + EXTRA_CHARAFIGURES.get(servant_id, []),
+        )
+    else:
+        mstSvtMultiPortrait = []
+        mstSvtScript = []
 
-    skill_ids = [
-        skill.skillId for skill in await skill.get_mstSvtSkill(conn, svt_id=servant_id)
-    ]
-    mstSkill = await get_skill_entity_no_reverse_many(conn, skill_ids, expand)
+    if "skills" in projection:
+        skill_ids = [
+            skill.skillId
+            for skill in await skill.get_mstSvtSkill(conn, svt_id=servant_id)
+        ]
+        mstSkill = await get_skill_entity_no_reverse_many(conn, skill_ids, expand)
+    else:
+        mstSkill = []
 
-    td_ids = [
-        td.treasureDeviceId
-        for td in await td.get_mstSvtTreasureDevice(conn, svt_id=servant_id)
-        if td.treasureDeviceId != EXTRA_ATTACK_TD_ID
-    ]
-    mstTreasureDevice = await get_td_entity_no_reverse_many(conn, td_ids, expand)
+    if "noblePhantasms" in projection:
+        td_ids = [
+            td.treasureDeviceId
+            for td in await td.get_mstSvtTreasureDevice(conn, svt_id=servant_id)
+            if td.treasureDeviceId != EXTRA_ATTACK_TD_ID
+        ]
+        mstTreasureDevice = await get_td_entity_no_reverse_many(conn, td_ids, expand)
+    else:
+        mstTreasureDevice = []
 
     item_ids: set[int] = set()
     for combine in mstCombineLimit + mstCombineSkill + mstCombineAppendPassiveSkill + mstCombineCostume + mstSvtAppendPassiveSkillUnlock:  # type: ignore
@@ -431,8 +594,10 @@ async def get_servant_entity(
         except orjson.JSONDecodeError:  # pragma: no cover
             pass
 
-    mstCommonRelease = await fetch.get_all_multiple(
-        conn, MstCommonRelease, common_release_ids
+    mstCommonRelease = (
+        await fetch.get_all_multiple(conn, MstCommonRelease, common_release_ids)
+        if "ascensionAdd" in projection
+        else []
     )
 
     svt_entity = ServantEntity(
@@ -468,11 +633,18 @@ async def get_servant_entity(
     )
 
     if expand:
-        extra_passive_ids = {skill.skillId for skill in mstSvtPassiveSkill}
-        append_passive_ids = {skill.skillId for skill in mstSvtAppendPassiveSkill}
-        expand_skill_ids = (
-            set(svt_entity.mstSvt.classPassive) | extra_passive_ids | append_passive_ids
+        class_passive_ids = (
+            set(svt_entity.mstSvt.classPassive)
+            if "classPassive" in projection
+            else set()
+        )
+        extra_passive_ids = (
+            {skill.skillId for skill in mstSvtPassiveSkill}
+            if "extraPassive" in projection
+            else set()
         )
+        append_passive_ids = {skill.skillId for skill in mstSvtAppendPassiveSkill}
+        expand_skill_ids = class_passive_ids | extra_passive_ids | append_passive_ids
         expand_skills = {
             skill.mstSkill.id: skill
             for skill in await get_skill_entity_no_reverse_many(
@@ -480,10 +652,14 @@ async def get_servant_entity(
             )
         }
         svt_entity.mstSvt.expandedClassPassive = [
-            expand_skills[skill_id] for skill_id in svt_entity.mstSvt.classPassive
+            expand_skills[skill_id]
+            for skill_id in svt_entity.mstSvt.classPassive
+            if skill_id in class_passive_ids
         ]
         svt_entity.expandedExtraPassive = [
-            expand_skills[skill.skillId] for skill in mstSvtPassiveSkill
+            expand_skills[skill.skillId]
+            for skill in mstSvtPassiveSkill
+            if skill.skillId in extra_passive_ids
         ]
         svt_entity.expandedAppendPassive = [
             expand_skills[skill.skillId] for skill in mstSvtAppendPassiveSkill
@@ -625,7 +801,11 @@ async def get_item_entity(conn: AsyncConnection, item_id: int) -> ItemEntity:
     return ItemEntity(mstItem=mstItem)
 
 
-async def get_war_entity(conn: AsyncConnection, war_id: int) -> WarEntity:
+async def get_war_entity(
+    conn: AsyncConnection,
+    war_id: int,
+    projection: FieldProjection = FieldProjection(),
+) -> WarEntity:
     war_db = await fetch.get_one(conn, MstWar, war_id)
     if not war_db:
         raise HTTPException(status_code=404, detail="War not found")
@@ -636,7 +816,9 @@ async def get_war_entity(conn: AsyncConnection, war_id: int) -> WarEntity:
     spots = await fetch.get_all_multiple(conn, MstSpot, map_ids)
     spot_ids = [spot.id for spot in spots]
 
-    quests = await quest.get_quest_by_spot(conn, spot_ids)
+    quests = (
+        await quest.get_quest_by_spot(conn, spot_ids) if "spots" in projection else []
+    )
 
     bgm_ids = [war_map.bgmId for war_map in maps] + [war_db.bgmId]
     bgms = await fetch.get_all_multiple(conn, MstBgm, bgm_ids)
@@ -713,12 +895,24 @@ async def get_master_mission_entity(
     )
 
 
-async def get_event_entity(conn: AsyncConnection, event_id: int) -> EventEntity:
+async def get_event_entity(
+    conn: AsyncConnection,
+    event_id: int,
+    projection: FieldProjection = FieldProjection(),
+) -> EventEntity:
+    """
+    `projection` takes nice event field names.
+    Missions, shops and voices are not fetched if their nice fields are not needed.
+    """
     mstEvent = await fetch.get_one(conn, MstEvent, event_id)
     if not mstEvent:
         raise HTTPException(status_code=404, detail="Event not found")
 
-    missions = await fetch.get_all(conn, MstEventMission, event_id)
+    missions = (
+        await fetch.get_all(conn, MstEventMission, event_id)
+        if "missions" in projection
+        else []
+    )
     mission_ids = [mission.id for mission in missions]
 
     conds = await fetch.get_all_multiple(conn, MstEventMissionCondition, mission_ids)
@@ -750,11 +944,14 @@ async def get_event_entity(conn: AsyncConnection, event_id: int) -> EventEntity:
 
     reward_scenes = await fetch.get_all(conn, MstEventRewardScene, event_id)
 
-    voice_ids = (
-        {voice_play.guideImageId for voice_play in voice_plays}
-        | {gacha_talk.guideImageId for gacha_talk in gacha_talks}
-        | {guide_id for scene in reward_scenes for guide_id in scene.guideImageIds}
-    )
+    if any(field in projection for field in ("voices", "voicePlays", "lotteries")):
+        voice_ids = (
+            {voice_play.guideImageId for voice_play in voice_plays}
+            | {gacha_talk.guideImageId for gacha_talk in gacha_talks}
+            | {guide_id for scene in reward_scenes for guide_id in scene.guideImageIds}
+        )
+    else:
+        voice_ids = set()
 
     mstSvtVoice = await svt.get_mstSvtVoice(conn, voice_ids)
     mstVoice = await get_voice_from_svtVoice(conn, mstSvtVoice)
@@ -763,7 +960,7 @@ async def get_event_entity(conn: AsyncConnection, event_id: int) -> EventEntity:
     mstVoicePlayCond = await svt.get_mstVoicePlayCond(conn, voice_ids)
     mstSvtExtra = await fetch.get_all_multiple(conn, MstSvtExtra, voice_ids)
 
-    shops = await fetch.get_all(conn, MstShop, event_id)
+    shops = await fetch.get_all(conn, MstShop, event_id) if "shop" in projection else []
     set_item_ids = [
         set_id
         for shop in shops
@@ -0,0 +1,151 @@
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Iterable, Optional, Sequence
+
+from fastapi import HTTPException
+from redis.asyncio import Redis  # type: ignore
+
+from ..config import Settings
+from ..redis.helpers.reverse import RedisReverse, get_reverse_ids_many
+from ..schemas.common import Region, ReverseDepth
+
+
+settings = Settings()
+
+
+TOO_MANY_REVERSE_ENTITIES = (
+    "More than {} entities found in the reverse lookup. "
+    "Please use a lower reverseDepth{}."
+)
+USE_BASIC_REVERSE_DATA = " or the basic reverseData"
+
+
+def get_unique_ids(id_lists: Iterable[Iterable[int]]) -> list[int]:
+    return list(dict.fromkeys(chain.from_iterable(id_lists)))
+
+
+@dataclass
+class ReverseTree:
+    """
+    IDs of the entities in the reverse lookup of the root buffs, functions, skills or NPs.
+    The `*_ids` lists are the unique entities below the roots that need to be built.
+    The other fields map the ID of a parent entity to the IDs of its children.
+    """
+
+    buff_funcs: dict[int, list[int]] = field(default_factory=dict)
+    func_skills: dict[int, list[int]] = field(default_factory=dict)
+    func_tds: dict[int, list[int]] = field(default_factory=dict)
+    skill_svts: dict[int, list[int]] = field(default_factory=dict)
+    skill_mcs: dict[int, list[int]] = field(default_factory=dict)
+    skill_ccs: dict[int, list[int]] = field(default_factory=dict)
+    td_svts: dict[int, list[int]] = field(default_factory=dict)
+    func_ids: list[int] = field(default_factory=list)
+    skill_ids: list[int] = field(default_factory=list)
+    td_ids: list[int] = field(default_factory=list)
+    svt_ids: list[int] = field(default_factory=list)
+    mc_ids: list[int] = field(default_factory=list)
+    cc_ids: list[int] = field(default_factory=list)
+
+    @property
+    def entity_count(self) -> int:
+        return sum(
+            len(entity_ids)
+            for entity_ids in (
+                self.func_ids,
+                self.skill_ids,
+                self.td_ids,
+                self.svt_ids,
+                self.mc_ids,
+                self.cc_ids,
+            )
+        )
+
+    def check_fan_out(self, fan_out_limit: int) -> None:
+        if self.entity_count > fan_out_limit:
+            raise HTTPException(
+                status_code=403,
+                detail=TOO_MANY_REVERSE_ENTITIES.format(
+                    fan_out_limit,
+                    USE_BASIC_REVERSE_DATA
+                    if fan_out_limit < settings.reverse_basic_fan_out_limit
+                    else "",
+                ),
+            )
+
+
+async def get_reverse_tree(
+    redis: Redis,
+    region: Region,
+    reverseDepth: ReverseDepth,
+    buff_ids: Sequence[int] = (),
+    func_ids: Sequence[int] = (),
+    skill_ids: Sequence[int] = (),
+    td_ids: Sequence[int] = (),
+    fan_out_limit: Optional[int] = None,
+) -> ReverseTree:
+    """
+    Resolve the reverse lookup breadth-first: the reverse IDs of all entities of a
+    depth level are looked up with one redis pipeline. Entities shared by several
+    parents are only counted and built once.
+    Raise 403 before anything is built if the lookup has more entities than
+    `fan_out_limit`.
+    """
+    if fan_out_limit is None:
+        fan_out_limit = settings.reverse_fan_out_limit
+    tree = ReverseTree()
+
+    if buff_ids and reverseDepth >= ReverseDepth.function:
+        (tree.buff_funcs,) = await get_reverse_ids_many(
+            redis, region, [(RedisReverse.BUFF_TO_FUNC, buff_ids)]
+        )
+        tree.func_ids = get_unique_ids(tree.buff_funcs.values())
+        tree.check_fan_out(fan_out_limit)
+
+    parent_func_ids = [*func_ids, *tree.func_ids]
+    if parent_func_ids and reverseDepth >= ReverseDepth.skillNp:
+        tree.func_skills, tree.func_tds = await get_reverse_ids_many(
+            redis,
+            region,
+            [
+                (RedisReverse.FUNC_TO_SKILL, parent_func_ids),
+                (RedisReverse.FUNC_TO_TD, parent_func_ids),
+            ],
+        )
+        tree.skill_ids = get_unique_ids(tree.func_skills.values())
+        tree.td_ids = get_unique_ids(tree.func_tds.values())
+        tree.check_fan_out(fan_out_limit)
+
+    parent_skill_ids = [*skill_ids, *tree.skill_ids]
+    parent_td_ids = [*td_ids, *tree.td_ids]
+    if (parent_skill_ids or parent_td_ids) and reverseDepth >= ReverseDepth.servant:
+        (
+            active_skill_svts,
+            passive_skill_svts,
+            tree.skill_mcs,
+            tree.skill_ccs,
+            tree.td_svts,
+        ) = await get_reverse_ids_many(
+            redis,
+            region,
+            [
+                (RedisReverse.ACTIVE_SKILL_TO_SVT, parent_skill_ids),
+                (RedisReverse.PASSIVE_SKILL_TO_SVT, parent_skill_ids),
+                (RedisReverse.SKILL_TO_MC, parent_skill_ids),
+                (RedisReverse.SKILL_TO_CC, parent_skill_ids),
+                (RedisReverse.TD_TO_SVT, parent_td_ids),
+            ],
+        )
+        tree.skill_svts = {
+            skill_id: sorted(
+                {*active_skill_svts[skill_id], *passive_skill_svts[skill_id]}
+            )
+            for skill_id in parent_skill_ids
+        }
+        tree.svt_ids = get_unique_ids(
+            chain(tree.skill_svts.values(), tree.td_svts.values())
+        )
+        tree.mc_ids = get_unique_ids(tree.skill_mcs.values())
+        tree.cc_ids = get_unique_ids(tree.skill_ccs.values())
+        tree.check_fan_out(fan_out_limit)
+
+    return tree
@@ -1,7 +1,7 @@
 from typing import Iterable, Optional, Union
 
 from fastapi import HTTPException
-from fuzzywuzzy import fuzz, utils
+from redis.asyncio import Redis  # type: ignore
 from sqlalchemy.ext.asyncio import AsyncConnection
 
 from ..data.custom_mappings import CV_EN_TO_JP, ILLUSTRATOR_EN_TO_JP
@@ -55,6 +55,8 @@ from ..schemas.search import (
     SvtSearchQueryParams,
     TdSearchParams,
 )
+from .name_index import get_svt_name_index, match_processed_name, process_name
+from .svt_filter import get_svt_filter_index
 from .utils import get_np_name, get_translation
 
 
@@ -75,69 +77,13 @@ def reverse_traits(traits: Iterable[Union[Trait, int]]) -> set[int]:
     return out_ints
 
 
-accent_from = "àáâäèéëíðñóöùúāēīŋōšαβḗḫ"
-accent_to__ = "aaaaeeeidnoouuaeinosabeh"
-translation_table = {ord(k): v for k, v in zip(accent_from, accent_to__)}
-
-
-SPECIAL_REPLACE = {"artoria": "altria"}
-
-
 def match_name(search_param: str, name: str) -> bool:
-    """Modified from fuzzywuzzy.token_set_ratio"""
-    p1 = utils.full_process(search_param).translate(translation_table)
-    p2 = utils.full_process(name).translate(translation_table)
-
-    for k, v in SPECIAL_REPLACE.items():
-        p1 = p1.replace(k, v)
-        p2 = p2.replace(k, v)
-
-    if not utils.validate_string(p1):
-        return False
-    if not utils.validate_string(p2):
-        return False
-
-    # Doesn't seem to be needed now but might be useful in the future
-    # ALTERNATIVE_DIVIDER = ["-", "="]
-    # for divider in ALTERNATIVE_DIVIDER:
-    #     p1 = p1.replace(divider, " ")
-    #     p2 = p2.replace(divider, " ")
-
-    if p1 in p2:
-        return True
-
-    # pull tokens
-    tokens1 = set(p1.split())
-    tokens2 = set(p2.split())
-
-    intersection = tokens1.intersection(tokens2)
-    diff1to2 = tokens1.difference(tokens2)
-    diff2to1 = tokens2.difference(tokens1)
-
-    sorted_sect = " ".join(sorted(intersection))
-    sorted_1to2 = " ".join(sorted(diff1to2))
-    sorted_2to1 = " ".join(sorted(diff2to1))
-
-    combined_1to2 = sorted_sect + " " + sorted_1to2
-    combined_2to1 = sorted_sect + " " + sorted_2to1
-
-    # strip
-    sorted_sect = sorted_sect.strip()
-    combined_1to2 = combined_1to2.strip()
-    combined_2to1 = combined_2to1.strip()
-
-    NAME_MATCH_THRESHOLD = 80
-
-    # Use sorted_sect first so "Okita Souji (Alter)" works as expected
-    # This way "a b c" search_param will match to "a b c d e" but not vice versa
-    if sorted_sect:
-        return fuzz.ratio(sorted_sect, combined_1to2) > NAME_MATCH_THRESHOLD
-    else:
-        return fuzz.ratio(combined_2to1, combined_1to2) > NAME_MATCH_THRESHOLD
+    return match_processed_name(process_name(search_param), process_name(name))
 
 
 async def search_servant(
     conn: AsyncConnection,
+    redis: Redis,
     search_param: Union[ServantSearchQueryParams, SvtSearchQueryParams],
     limit: int = 100,
 ) -> list[MstSvt]:
@@ -177,8 +123,8 @@ async def search_servant(
     else:
         cv = search_param.cv
 
-    matches = await get_svt_search(
-        conn,
+    svt_filter_index = await get_svt_filter_index(conn, redis, search_param.region)
+    svt_ids = svt_filter_index.search(
         svt_type_ints=svt_type_ints,
         svt_flag_ints=svt_flag_ints,
         excludeCollectionNo=search_param.excludeCollectionNo,
@@ -188,20 +134,25 @@ async def search_servant(
         trait_ints=trait_ints,
         not_trait_ints=not_trait_ints,
         rarity_ints=rarity_ints,
-        cond_svt_value=cond_svt_value,
-        cond_group_value=voice_cond_group,
         illustrator=illustrator,
         cv=cv,
     )
 
-    if search_param.name:
-        matches = [
-            svt
-            for svt in matches
-            if match_name(search_param.name, svt.name)
-            or match_name(search_param.name, svt.ruby)
-            or match_name(search_param.name, get_translation(Language.en, svt.name))
-        ]
+    if search_param.name and svt_ids:
+        name_index = await get_svt_name_index(conn, redis, search_param.region)
+        svt_ids &= name_index.search(search_param.name)
+
+    if not svt_ids:
+        return []
+    if not cond_svt_value and len(svt_ids) > limit:
+        raise HTTPException(status_code=403, detail=TOO_MANY_RESULTS.format(limit))
+
+    matches = await get_svt_search(
+        conn,
+        svt_ids,
+        cond_svt_value=cond_svt_value,
+        cond_group_value=voice_cond_group,
+    )
 
     if len(matches) > limit:
         raise HTTPException(status_code=403, detail=TOO_MANY_RESULTS.format(limit))
@@ -210,7 +161,10 @@ async def search_servant(
 
 
 async def search_equip(
-    conn: AsyncConnection, search_param: EquipSearchQueryParams, limit: int = 100
+    conn: AsyncConnection,
+    redis: Redis,
+    search_param: EquipSearchQueryParams,
+    limit: int = 100,
 ) -> list[MstSvt]:
     if not search_param.hasSearchParams():
         raise HTTPException(status_code=400, detail=INSUFFICIENT_QUERY)
@@ -219,8 +173,8 @@ async def search_equip(
     svt_flag_ints = {SVT_FLAG_NAME_REVERSE[svt_flag] for svt_flag in search_param.flag}
     rarity = set(search_param.rarity)
 
-    matches = await get_svt_search(
-        conn,
+    svt_filter_index = await get_svt_filter_index(conn, redis, search_param.region)
+    svt_ids = svt_filter_index.search(
         svt_type_ints=svt_type,
         svt_flag_ints=svt_flag_ints,
         excludeCollectionNo=search_param.excludeCollectionNo,
@@ -228,14 +182,16 @@ async def search_equip(
         illustrator=search_param.illustrator,
     )
 
-    if search_param.name:
-        matches = [
-            svt
-            for svt in matches
-            if match_name(search_param.name, svt.name)
-            or match_name(search_param.name, svt.ruby)
-            or match_name(search_param.name, get_translation(Language.en, svt.name))
-        ]
+    if search_param.name and svt_ids:
+        name_index = await get_svt_name_index(conn, redis, search_param.region)
+        svt_ids &= name_index.search(search_param.name)
+
+    if not svt_ids:
+        return []
+    if len(svt_ids) > limit:
+        raise HTTPException(status_code=403, detail=TOO_MANY_RESULTS.format(limit))
+
+    matches = await get_svt_search(conn, svt_ids)
 
     if len(matches) > limit:
         raise HTTPException(status_code=403, detail=TOO_MANY_RESULTS.format(limit))
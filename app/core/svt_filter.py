@@ -0,0 +1,198 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from itertools import product
+from typing import Hashable, Iterable, Optional
+
+from redis.asyncio import Redis  # type: ignore
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from ..db.helpers.svt import (
+    get_all_svt_extra_individualities,
+    get_all_svt_rarities,
+    get_svt_filter_rows,
+)
+from ..redis.helpers.repo_version import get_repo_version
+from ..schemas.common import Region
+
+
+@dataclass
+class SvtFilterData:
+    id: int
+    type: int
+    flag: int
+    classId: int
+    genderType: int
+    attri: int
+    collectionNo: int
+    illustrator: Optional[str] = None
+    cv: Optional[str] = None
+    rarities: set[int] = field(default_factory=set)
+    # Traits of each mstSvtLimitAdd x mstSvtIndividuality row combination
+    trait_variants: list[set[int]] = field(default_factory=list)
+
+
+def get_trait_variants(
+    individuality: list[int],
+    limit_add_individualities: list[list[int]],
+    svt_individualities: list[list[int]],
+) -> list[set[int]]:
+    """
+    The search used to outer join mstSvtLimitAdd and mstSvtIndividuality to mstSvt
+    and filter the traits of each joined row.
+    Keep the traits of each row so the trait and notTrait filters match the same rows.
+    """
+    return [
+        {*individuality, *limit_add, *svt_individuality}
+        for limit_add, svt_individuality in product(
+            limit_add_individualities or [[]], svt_individualities or [[]]
+        )
+    ]
+
+
+def get_bitset(bitsets: dict[Hashable, int], values: Iterable[Hashable]) -> int:
+    bitset = 0
+    for value in values:
+        bitset |= bitsets.get(value, 0)
+    return bitset
+
+
+def get_bit_positions(bitset: int) -> list[int]:
+    return [position for position, bit in enumerate(bin(bitset)[:1:-1]) if bit == "1"]
+
+
+class SvtFilterIndex:
+    """
+    Bitsets of the svts for each value of the search filters.
+    Bit i of a bitset is set if the i-th svt has the value. Traits are indexed
+    per trait variant instead of per svt.
+    """
+
+    def __init__(self, svts: Iterable[SvtFilterData]) -> None:
+        self.svt_ids: list[int] = []
+        self.all_svts = 0
+        self.types: defaultdict[Hashable, int] = defaultdict(int)
+        self.flags: defaultdict[Hashable, int] = defaultdict(int)
+        self.classes: defaultdict[Hashable, int] = defaultdict(int)
+        self.genders: defaultdict[Hashable, int] = defaultdict(int)
+        self.attributes: defaultdict[Hashable, int] = defaultdict(int)
+        self.collection_nos: defaultdict[Hashable, int] = defaultdict(int)
+        self.illustrators: defaultdict[Hashable, int] = defaultdict(int)
+        self.cvs: defaultdict[Hashable, int] = defaultdict(int)
+        self.rarities: defaultdict[Hashable, int] = defaultdict(int)
+        # Trait variant position -> svt position
+        self.variant_svts: list[int] = []
+        self.all_variants = 0
+        self.traits: defaultdict[Hashable, int] = defaultdict(int)
+
+        for position, svt in enumerate(svts):
+            bit = 1 << position
+            self.svt_ids.append(svt.id)
+            self.all_svts |= bit
+            self.types[svt.type] |= bit
+            self.flags[svt.flag] |= bit
+            self.classes[svt.classId] |= bit
+            self.genders[svt.genderType] |= bit
+            self.attributes[svt.attri] |= bit
+            self.collection_nos[svt.collectionNo] |= bit
+            self.illustrators[svt.illustrator] |= bit
+            self.cvs[svt.cv] |= bit
+            for rarity in svt.rarities:
+                self.rarities[rarity] |= bit
+            for variant in svt.trait_variants:
+                variant_bit = 1 << len(self.variant_svts)
+                self.variant_svts.append(position)
+                self.all_variants |= variant_bit
+                for trait in variant:
+                    self.traits[trait] |= variant_bit
+
+    def get_trait_svts(
+        self, trait_ints: Iterable[int], not_trait_ints: Iterable[int]
+    ) -> int:
+        variants = self.all_variants
+        for trait in trait_ints:
+            variants &= self.traits.get(trait, 0)
+        variants &= ~get_bitset(self.traits, not_trait_ints)
+
+        svts = 0
+        for variant_position in get_bit_positions(variants):
+            svts |= 1 << self.variant_svts[variant_position]
+        return svts
+
+    def search(
+        self,
+        svt_type_ints: Optional[Iterable[int]] = None,
+        svt_flag_ints: Optional[Iterable[int]] = None,
+        excludeCollectionNo: Optional[Iterable[int]] = None,
+        class_ints: Optional[Iterable[int]] = None,
+        gender_ints: Optional[Iterable[int]] = None,
+        attribute_ints: Optional[Iterable[int]] = None,
+        trait_ints: Optional[Iterable[int]] = None,
+        not_trait_ints: Optional[Iterable[int]] = None,
+        rarity_ints: Optional[Iterable[int]] = None,
+        illustrator: Optional[str] = None,
+        cv: Optional[str] = None,
+    ) -> set[int]:
+        """Return the IDs of the svts that match all the given filters"""
+        svts = self.all_svts
+        for bitsets, values in (
+            (self.types, svt_type_ints),
+            (self.flags, svt_flag_ints),
+            (self.classes, class_ints),
+            (self.genders, gender_ints),
+            (self.attributes, attribute_ints),
+            (self.rarities, rarity_ints),
+        ):
+            if values:
+                svts &= get_bitset(bitsets, values)
+        if excludeCollectionNo:
+            svts &= ~get_bitset(self.collection_nos, excludeCollectionNo)
+        if illustrator:
+            svts &= self.illustrators.get(illustrator, 0)
+        if cv:
+            svts &= self.cvs.get(cv, 0)
+        if svts and (trait_ints or not_trait_ints):
+            svts &= self.get_trait_svts(trait_ints or [], not_trait_ints or [])
+
+        return {self.svt_ids[position] for position in get_bit_positions(svts)}
+
+
+# Region -> (gamedata repo version, index)
+svt_filter_indexes: dict[Region, tuple[Optional[str], SvtFilterIndex]] = {}
+
+
+async def get_svt_filter_index(
+    conn: AsyncConnection, redis: Redis, region: Region
+) -> SvtFilterIndex:
+    """
+    Index of all svts of the region.
+    The index is rebuilt when the gamedata repo version changes.
+    """
+    repo_version = await get_repo_version(redis, region)
+    version = repo_version.hash if repo_version else None
+    if region in svt_filter_indexes and svt_filter_indexes[region][0] == version:
+        return svt_filter_indexes[region][1]
+
+    rarities = await get_all_svt_rarities(conn)
+    limit_adds, individualities = await get_all_svt_extra_individualities(conn)
+    svt_filter_index = SvtFilterIndex(
+        SvtFilterData(
+            id=svt.id,
+            type=svt.type,
+            flag=svt.flag,
+            classId=svt.classId,
+            genderType=svt.genderType,
+            attri=svt.attri,
+            collectionNo=svt.collectionNo,
+            illustrator=svt.illustrator,
+            cv=svt.cv,
+            rarities=rarities.get(svt.id, set()),
+            trait_variants=get_trait_variants(
+                svt.individuality or [],
+                limit_adds.get(svt.id, []),
+                individualities.get(svt.id, []),
+            ),
+        )
+        for svt in await get_svt_filter_rows(conn)
+    )
+    svt_filter_indexes[region] = (version, svt_filter_index)
+    return svt_filter_index
@@ -0,0 +1,166 @@
+import mmap
+import os
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Iterable, Mapping, Optional, Union
+
+import orjson
+
+from ..config import Settings, project_root
+from ..export.writer import atomic_write_bytes
+from ..schemas.common import Region
+
+
+settings = Settings()
+
+
+REVERSE_INDEX_FOLDER = project_root / "reverse_index"
+
+# Array of int32 or an int32 view of the mmaped index file
+IntArray = Union[array, memoryview]
+
+
+def get_reverse_index_path(region: Region) -> Path:
+    """Keyed by the redis prefix like the redis reverse data it mirrors"""
+    return REVERSE_INDEX_FOLDER / settings.redis_prefix / f"{region.value}.bin"
+
+
+class ReverseMap:
+    """
+    Compressed sparse row adjacency list.
+    The reverse IDs of `sources[i]` are `targets[offsets[i] : offsets[i + 1]]`.
+    `sources` is sorted so a lookup is a binary search and a slice.
+    """
+
+    def __init__(self, sources: IntArray, offsets: IntArray, targets: IntArray):
+        self.sources = sources
+        self.offsets = offsets
+        self.targets = targets
+
+    @classmethod
+    def from_dict(cls, reverse_data: Mapping[int, Iterable[int]]) -> "ReverseMap":
+        sources = array("i", sorted(reverse_data))
+        offsets = array("i", [0])
+        targets = array("i")
+        for source in sources:
+            targets.extend(reverse_data[source])
+            offsets.append(len(targets))
+        return cls(sources, offsets, targets)
+
+    def get(self, item_id: int) -> list[int]:
+        position = bisect_left(self.sources, item_id)
+        if position < len(self.sources) and self.sources[position] == item_id:
+            return self.targets[
+                self.offsets[position] : self.offsets[position + 1]
+            ].tolist()
+        return []
+
+
+class ReverseIndex:
+    """
+    In-process reverse maps of a region, keyed by the RedisReverse name.
+    `version` is the gamedata repo hash the maps were built from.
+    """
+
+    def __init__(self, reverse_maps: dict[str, ReverseMap], version: Optional[str]):
+        self.reverse_maps = reverse_maps
+        self.version = version
+
+    def get(self, reverse_name: str, item_id: int) -> list[int]:
+        if reverse_name not in self.reverse_maps:
+            return []
+        return self.reverse_maps[reverse_name].get(item_id)
+
+
+def serialize_reverse_index(
+    reverse_data: Mapping[str, Mapping[int, list[int]]], version: Optional[str]
+) -> bytes:
+    """
+    The file is a JSON header with the gamedata repo hash and the array lengths,
+    padded to 4 bytes, followed by the int32 sources, offsets and targets arrays
+    of each reverse map.
+    """
+    reverse_maps = {
+        name: ReverseMap.from_dict(data) for name, data in reverse_data.items()
+    }
+    header = orjson.dumps(
+        {
+            "version": version,
+            "lengths": {
+                name: [len(reverse_map.sources), len(reverse_map.targets)]
+                for name, reverse_map in reverse_maps.items()
+            },
+        }
+    )
+    header += b" " * (-len(header) % 4)
+    return b"".join(
+        [
+            array("i", [len(header)]).tobytes(),
+            header,
+            *(
+                int_array.tobytes()
+                for reverse_map in reverse_maps.values()
+                for int_array in (
+                    reverse_map.sources,
+                    reverse_map.offsets,
+                    reverse_map.targets,
+                )
+            ),
+        ]
+    )
+
+
+def write_reverse_index(
+    region: Region,
+    reverse_data: Mapping[str, Mapping[int, list[int]]],
+    version: Optional[str],
+) -> None:
+    index_path = get_reverse_index_path(region)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write_bytes(index_path, serialize_reverse_index(reverse_data, version))
+
+
+def read_reverse_index(buffer: memoryview) -> ReverseIndex:
+    """The arrays are views of the buffer and are not copied"""
+    int_size = array("i").itemsize
+    header_length = buffer[:int_size].cast("i")[0]
+    header: dict[str, Any] = orjson.loads(
+        bytes(buffer[int_size : int_size + header_length])
+    )
+
+    position = int_size + header_length
+    reverse_maps: dict[str, ReverseMap] = {}
+    for name, (sources_length, targets_length) in header["lengths"].items():
+        int_arrays: list[IntArray] = []
+        for length in (sources_length, sources_length + 1, targets_length):
+            end = position + length * int_size
+            int_arrays.append(buffer[position:end].cast("i"))
+            position = end
+        reverse_maps[name] = ReverseMap(*int_arrays)
+    return ReverseIndex(reverse_maps, header["version"])
+
+
+# Region -> ((file mtime, file size), index)
+reverse_indexes: dict[Region, tuple[tuple[int, int], ReverseIndex]] = {}
+
+
+def get_reverse_index(region: Region) -> Optional[ReverseIndex]:
+    """
+    The index file is mmaped so all workers on the machine share the same pages.
+    It's reopened when the loader writes a new file.
+    Return None if there's no index file for the region.
+    """
+    try:
+        stat = os.stat(get_reverse_index_path(region))
+    except FileNotFoundError:
+        return None
+    version = (stat.st_mtime_ns, stat.st_size)
+    if region in reverse_indexes and reverse_indexes[region][0] == version:
+        return reverse_indexes[region][1]
+
+    with open(get_reverse_index_path(region), "rb") as fp:
+        index_mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    reverse_index = read_reverse_index(memoryview(index_mmap))
+    reverse_indexes[region] = (version, reverse_index)
+    return reverse_index
@@ -1,9 +1,11 @@
-from typing import Type, TypeVar
+from typing import Optional, Type, TypeVar
 
 import orjson
+from git import Repo  # type: ignore
 from pydantic import DirectoryPath
 
 from ..schemas.base import BaseModelORJson
+from ..schemas.common import RepoInfo
 from ..schemas.raw import (
     MstAi,
     MstAiAct,
@@ -94,3 +96,14 @@ def load_master_data(
     with open(gamedata_path / "master" / f"{file_name}.json", "rb") as fp:
         data = orjson.loads(fp.read())
     return [model.parse_obj(item) for item in data]
+
+
+def get_repo_info(gamedata_path: DirectoryPath) -> Optional[RepoInfo]:
+    """Latest commit of the gamedata repo, None if the folder isn't a git repo"""
+    if not (gamedata_path / ".git").exists():
+        return None
+    latest_commit = Repo(gamedata_path).commit()
+    return RepoInfo(
+        hash=latest_commit.hexsha[:6],
+        timestamp=latest_commit.committed_date,  # pyright: reportGeneralTypeIssues=false
+    )
@@ -345,6 +345,9 @@ schema_table_fetch_all_multiple: dict[  # type:ignore
     Type[BaseModelORJson], tuple[Table, ColumnElement, ColumnElement]
 ] = {
     MstSpot: (mstSpot, mstSpot.c.mapId, mstSpot.c.id),
+    MstBuff: (mstBuff, mstBuff.c.id, mstBuff.c.id),
+    MstFunc: (mstFunc, mstFunc.c.id, mstFunc.c.id),
+    MstFuncGroup: (mstFuncGroup, mstFuncGroup.c.funcId, mstFuncGroup.c.eventId),
     MstVoice: (mstVoice, mstVoice.c.id, mstVoice.c.id),
     MstSvtGroup: (mstSvtGroup, mstSvtGroup.c.id, mstSvtGroup.c.svtId),
     MstEventMissionCondition: (
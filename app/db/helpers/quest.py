@@ -1,11 +1,11 @@
 import functools
 from typing import Iterable, Optional, Union
 
-from sqlalchemy import Integer, Table
+from sqlalchemy import Table
 from sqlalchemy.dialects.postgresql import array_agg
 from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncConnection
-from sqlalchemy.sql import Join, and_, case, func, literal_column, or_, select
+from sqlalchemy.sql import Join, and_, case, func, intersect, or_, select
 from sqlalchemy.sql.elements import ClauseElement
 
 from ...models.raw import (
@@ -23,14 +23,13 @@ from ...models.raw import (
     mstSpot,
     mstStage,
     mstStageRemap,
-    mstSvt,
     mstWar,
     npcFollower,
     npcFollowerRelease,
     npcSvtEquip,
     npcSvtFollower,
 )
-from ...models.rayshift import rayshiftQuest
+from ...models.rayshift import rayshiftQuest, rayshiftQuestEnemy
 from ...schemas.common import StageLink
 from ...schemas.gameenums import QuestFlag
 from ...schemas.raw import (
@@ -155,6 +154,25 @@ async def get_latest_quest_with_enemies(
     return [MstQuestWithPhase.from_orm(row) for row in rows]
 
 
+async def get_open_quest_phases(
+    conn: AsyncConnection, now: int, limit_result: int = 200
+) -> list[tuple[int, int]]:
+    """(quest ID, phase) of the open quests, most recently opened first"""
+    stmt = (
+        select(mstQuestPhase.c.questId, mstQuestPhase.c.phase)
+        .select_from(
+            mstQuest.join(mstQuestPhase, mstQuestPhase.c.questId == mstQuest.c.id)
+        )
+        .where(and_(mstQuest.c.openedAt <= now, mstQuest.c.closedAt > now))
+        .order_by(
+            mstQuest.c.openedAt.desc(), mstQuestPhase.c.questId, mstQuestPhase.c.phase
+        )
+        .limit(limit_result)
+    )
+
+    return [(row.questId, row.phase) for row in (await conn.execute(stmt)).fetchall()]
+
+
 async def get_quest_phase_search(
     conn: AsyncConnection,
     name: Optional[str] = None,
@@ -180,14 +198,6 @@ async def get_quest_phase_search(
                 mstQuestPhase.c.phase == mstStage.c.questPhase,
             ),
         )
-    if enemy_svt_id or enemy_svt_ai_id or enemy_trait or enemy_class:
-        from_clause = from_clause.outerjoin(
-            rayshiftQuest,
-            and_(
-                mstQuest.c.id == rayshiftQuest.c.questId,
-                mstQuestPhase.c.phase == rayshiftQuest.c.phase,
-            ),
-        )
 
     where_clause: list[ClauseElement] = []
     if name:
@@ -243,65 +253,35 @@ async def get_quest_phase_search(
         where_clause.append(
             mstStage.c.script.contains({"aiFieldIds": [{"id": field_ai_id}]})
         )
+    # Each enemy condition gives the rayshift runs that have a matching enemy.
+    # The quest phases of the runs that match all the conditions are returned.
+    enemy_conds: list[ClauseElement] = []
     if enemy_svt_ai_id:
-        where_clause.append(
-            rayshiftQuest.c.questDetail.contains(
-                {"userSvt": [{"aiId": enemy_svt_ai_id}]}
-            )
-        )
+        enemy_conds.append(rayshiftQuestEnemy.c.aiId == enemy_svt_ai_id)
     if enemy_trait:
-        where_clause.append(
-            rayshiftQuest.c.questDetail.contains(
-                {"userSvt": [{"individuality": list(enemy_trait)}]}
-            )
-        )
+        enemy_conds.append(rayshiftQuestEnemy.c.individuality.contains(enemy_trait))
     if enemy_svt_id:
-        where_clause.append(
-            rayshiftQuest.c.questDetail.contains({"userSvt": [{"svtId": enemy_svt_id}]})
-        )
+        enemy_conds.append(rayshiftQuestEnemy.c.svtId == enemy_svt_id)
     if enemy_class:
-        rayshift_svt_ids = select(
-            rayshiftQuest.c.questId,
-            rayshiftQuest.c.phase,
-            literal_column(
-                "(jsonb_path_query(\"questDetail\", '$.userSvt[*] ? (@.npcSvtClassId == 0).svtId')->0)::int",
-                type_=Integer,
-            ).label("rayshift_svt_id"),
-        ).cte()
-        deduped_svt_ids = (
-            select(
-                rayshift_svt_ids.c.questId,
-                rayshift_svt_ids.c.phase,
-                rayshift_svt_ids.c.rayshift_svt_id,
-            )
-            .group_by(
-                rayshift_svt_ids.c.questId,
-                rayshift_svt_ids.c.phase,
-                rayshift_svt_ids.c.rayshift_svt_id,
-            )
-            .cte()
-        )
-        merged_class_ids = (
-            select(deduped_svt_ids.c.questId, deduped_svt_ids.c.phase, mstSvt.c.classId)
-            .join(mstSvt, mstSvt.c.id == deduped_svt_ids.c.rayshift_svt_id)
-            .cte()
+        for class_id in enemy_class:
+            enemy_conds.append(rayshiftQuestEnemy.c.classId == class_id)
+    if enemy_conds:
+        enemy_query_ids = intersect(
+            *(select(rayshiftQuestEnemy.c.queryId).where(cond) for cond in enemy_conds)
+        ).subquery()
+        enemy_phases = (
+            select(rayshiftQuestEnemy.c.questId, rayshiftQuestEnemy.c.phase)
+            .where(rayshiftQuestEnemy.c.queryId.in_(select(enemy_query_ids)))
+            .distinct()
+            .subquery()
         )
-        from_clause = from_clause.outerjoin(
-            merged_class_ids,
+        from_clause = from_clause.join(
+            enemy_phases,
             and_(
-                mstQuest.c.id == merged_class_ids.c.questId,
-                mstQuestPhase.c.phase == merged_class_ids.c.phase,
+                mstQuest.c.id == enemy_phases.c.questId,
+                mstQuestPhase.c.phase == enemy_phases.c.phase,
             ),
         )
-        for class_id in enemy_class:
-            where_clause.append(
-                or_(
-                    rayshiftQuest.c.questDetail.contains(
-                        {"userSvt": [{"npcSvtClassId": class_id}]}
-                    ),
-                    merged_class_ids.c.classId == class_id,
-                )
-            )
 
     quest_search_stmt = (
         MSTQUEST_WITH_PHASE_SELECT.distinct()
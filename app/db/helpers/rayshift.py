@@ -1,14 +1,26 @@
 from typing import Any, Optional
 
-from sqlalchemy import BIGINT, Integer
-from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy import BIGINT, Integer, inspect
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, Insert, insert
 from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import AsyncConnection
-from sqlalchemy.sql import and_, case, cast, func, select
+from sqlalchemy.sql import (
+    Delete,
+    Select,
+    and_,
+    case,
+    cast,
+    column,
+    delete,
+    func,
+    select,
+    true,
+)
 from sqlalchemy.sql.elements import literal_column
 from sqlalchemy.sql.expression import text
 
-from ...models.rayshift import rayshiftQuest
+from ...models.raw import mstSvt
+from ...models.rayshift import rayshiftQuest, rayshiftQuestDrop, rayshiftQuestEnemy
 from ...schemas.rayshift import QuestDetail, QuestDrop, QuestList
 
 
@@ -40,53 +52,96 @@ async def get_rayshift_drops(
         rayshiftQuest.c.phase == phase,
         rayshiftQuest.c.questDetail.isnot(None),
     ]
+    drop_conds = [
+        rayshiftQuestDrop.c.questId == quest_id,
+        rayshiftQuestDrop.c.phase == phase,
+    ]
     if questSelect is not None:
         where_conds.append(
             rayshiftQuest.c.questDetail.contains({"questSelect": questSelect})
         )
+        drop_conds.append(rayshiftQuestDrop.c.questSelect == questSelect)
 
-    enemy_deck_svt = (
-        select(
-            rayshiftQuest.c.queryId,
-            literal_column("'enemy'").label("deckType"),
-            func.jsonb_array_elements(literal_column("d.deck->'svts'")).label(
-                "deck_svt"
-            ),
-            literal_column("d.stage").label("stage"),
-        )
-        .select_from(
-            rayshiftQuest,
-            text(
-                'jsonb_array_elements("rayshiftQuest"."questDetail"->\'enemyDeck\') '
-                "with ordinality as d(deck, stage)"
-            ),
-        )
+    runs = (
+        select(func.count(rayshiftQuest.c.queryId))
         .where(and_(*where_conds))
+        .scalar_subquery()
     )
 
-    shift_deck_svt = (
+    drop_key = [
+        rayshiftQuestDrop.c.stage,
+        rayshiftQuestDrop.c.deckType,
+        rayshiftQuestDrop.c.deckId,
+        rayshiftQuestDrop.c.type,
+        rayshiftQuestDrop.c.objectId,
+        rayshiftQuestDrop.c.originalNum,
+    ]
+    stmt = (
         select(
-            rayshiftQuest.c.queryId,
-            literal_column("'shift'").label("deckType"),
-            func.jsonb_array_elements(literal_column("d.deck->'svts'")).label(
-                "deck_svt"
-            ),
-            literal_column("d.stage").label("stage"),
-        )
-        .select_from(
-            rayshiftQuest,
-            text(
-                'jsonb_array_elements("rayshiftQuest"."questDetail"->\'shiftDeck\') '
-                "with ordinality as d(deck, stage)"
+            *drop_key,
+            runs.label("runs"),
+            func.sum(rayshiftQuestDrop.c.dropCount).label("dropCount"),
+            cast(func.sum(rayshiftQuestDrop.c.sumDropCountSquared), BIGINT).label(
+                "sumDropCountSquared"
             ),
         )
-        .where(and_(*where_conds))
+        .where(and_(*drop_conds))
+        .group_by(*drop_key)
+        # The drops of each enemy first then the drops of all enemies
+        .order_by(rayshiftQuestDrop.c.stage == -1, *drop_key)
     )
 
-    deck_svt = enemy_deck_svt.union_all(shift_deck_svt).cte(name="deck_svt")
+    results = await conn.execute(stmt)
+    return [QuestDrop.parse_obj(row) for row in results.fetchall()]
+
+
+def get_upsert_rayshift_drop_stmt(
+    query_ids: Optional[list[int]] = None, sign: int = 1
+) -> Insert:
+    """
+    Add the drop counts of the quest details in rayshiftQuest to rayshiftQuestDrop.
+    With `sign=-1`, remove them instead so the quest details can be replaced.
+    """
+    where_conds = [rayshiftQuest.c.questDetail.isnot(None)]
+    if query_ids is not None:
+        where_conds.append(rayshiftQuest.c.queryId.in_(query_ids))
+
+    def get_deck_svt(deck_type: str, deck_name: str) -> Select:
+        return (
+            select(
+                rayshiftQuest.c.queryId,
+                rayshiftQuest.c.questId,
+                rayshiftQuest.c.phase,
+                func.coalesce(
+                    rayshiftQuest.c.questDetail["questSelect"].as_integer(), -1
+                ).label("questSelect"),
+                literal_column(f"'{deck_type}'").label("deckType"),
+                func.jsonb_array_elements(literal_column("d.deck->'svts'")).label(
+                    "deck_svt"
+                ),
+                literal_column("d.stage").label("stage"),
+            )
+            .select_from(
+                rayshiftQuest,
+                text(
+                    f'jsonb_array_elements("rayshiftQuest"."questDetail"->\'{deck_name}\') '
+                    "with ordinality as d(deck, stage)"
+                ),
+            )
+            .where(and_(*where_conds))
+        )
+
+    deck_svt = (
+        get_deck_svt("enemy", "enemyDeck")
+        .union_all(get_deck_svt("shift", "shiftDeck"))
+        .cte(name="deck_svt")
+    )
 
     drops = select(
         deck_svt.c.queryId,
+        deck_svt.c.questId,
+        deck_svt.c.phase,
+        deck_svt.c.questSelect,
         deck_svt.c.deckType,
         deck_svt.c.stage,
         literal_column("deck_svt.deck_svt->>'id'").label("deckId"),
@@ -97,123 +152,127 @@ async def get_rayshift_drops(
 
     all_drops = select(
         drops.c.queryId,
-        drops.c.stage,
+        drops.c.questId,
+        drops.c.phase,
+        drops.c.questSelect,
+        cast(drops.c.stage, Integer).label("stage"),
         drops.c.deckType,
         cast(drops.c.deckId, Integer).label("deckId"),
-        drops.c.drops["type"].label("type"),
-        drops.c.drops["objectId"].label("objectId"),
-        drops.c.drops["originalNum"].label("originalNum"),
+        drops.c.drops["type"].as_integer().label("type"),
+        drops.c.drops["objectId"].as_integer().label("objectId"),
+        drops.c.drops["originalNum"].as_integer().label("originalNum"),
     ).cte(name="all_drops")
 
+    run_enemy_drop_key = [
+        all_drops.c.questId,
+        all_drops.c.phase,
+        all_drops.c.questSelect,
+        all_drops.c.stage,
+        all_drops.c.deckType,
+        all_drops.c.deckId,
+        all_drops.c.type,
+        all_drops.c.objectId,
+        all_drops.c.originalNum,
+    ]
     run_enemy_drop_items = (
         select(
             all_drops.c.queryId,
-            all_drops.c.stage,
-            all_drops.c.deckType,
-            all_drops.c.deckId,
-            all_drops.c.type,
-            all_drops.c.objectId,
-            all_drops.c.originalNum,
+            *run_enemy_drop_key,
             func.count(all_drops.c.objectId).label("dropCount"),
         )
-        .group_by(
-            all_drops.c.queryId,
-            all_drops.c.stage,
-            all_drops.c.deckType,
-            all_drops.c.deckId,
-            all_drops.c.type,
-            all_drops.c.objectId,
-            all_drops.c.originalNum,
-        )
+        .group_by(all_drops.c.queryId, *run_enemy_drop_key)
         .cte(name="run_enemy_drop_items")
     )
 
+    run_drop_key = [
+        all_drops.c.questId,
+        all_drops.c.phase,
+        all_drops.c.questSelect,
+        all_drops.c.type,
+        all_drops.c.objectId,
+        all_drops.c.originalNum,
+    ]
     run_drop_items = (
         select(
             all_drops.c.queryId,
-            all_drops.c.type,
-            all_drops.c.objectId,
-            all_drops.c.originalNum,
+            *run_drop_key,
             func.count(all_drops.c.objectId).label("dropCount"),
         )
-        .group_by(
-            all_drops.c.queryId,
-            all_drops.c.type,
-            all_drops.c.objectId,
-            all_drops.c.originalNum,
-        )
+        .group_by(all_drops.c.queryId, *run_drop_key)
         .cte(name="run_drop_items")
     )
 
-    runs = (
-        select(func.count(rayshiftQuest.c.queryId))
-        .where(and_(*where_conds))
-        .subquery()
-        .select()
+    individual_enemy_drop_key = [
+        run_enemy_drop_items.c[column.name] for column in run_enemy_drop_key
+    ]
+    individual_enemy_drops = select(
+        *individual_enemy_drop_key,
+        (func.sum(run_enemy_drop_items.c.dropCount) * sign).label("dropCount"),
+        (
+            func.sum(
+                run_enemy_drop_items.c.dropCount * run_enemy_drop_items.c.dropCount
+            )
+            * sign
+        ).label("sumDropCountSquared"),
+    ).group_by(*individual_enemy_drop_key)
+
+    run_drops = select(
+        run_drop_items.c.questId,
+        run_drop_items.c.phase,
+        run_drop_items.c.questSelect,
+        literal_column("-1").label("stage"),
+        literal_column("'enemy'").label("deckType"),
+        literal_column("-1").label("deckId"),
+        run_drop_items.c.type,
+        run_drop_items.c.objectId,
+        run_drop_items.c.originalNum,
+        (func.sum(run_drop_items.c.dropCount) * sign).label("dropCount"),
+        (
+            func.sum(run_drop_items.c.dropCount * run_drop_items.c.dropCount) * sign
+        ).label("sumDropCountSquared"),
+    ).group_by(
+        run_drop_items.c.questId,
+        run_drop_items.c.phase,
+        run_drop_items.c.questSelect,
+        run_drop_items.c.type,
+        run_drop_items.c.objectId,
+        run_drop_items.c.originalNum,
     )
 
-    individual_enemy_drops = (
-        select(
-            run_enemy_drop_items.c.stage,
-            run_enemy_drop_items.c.deckType,
-            run_enemy_drop_items.c.deckId,
-            run_enemy_drop_items.c.type,
-            run_enemy_drop_items.c.objectId,
-            run_enemy_drop_items.c.originalNum,
-            runs.label("runs"),
-            func.sum(run_enemy_drop_items.c.dropCount).label("dropCount"),
-            cast(
-                func.sum(func.power(run_enemy_drop_items.c.dropCount, 2)), BIGINT
-            ).label("sumDropCountSquared"),
-        )
-        .group_by(
-            run_enemy_drop_items.c.stage,
-            run_enemy_drop_items.c.deckType,
-            run_enemy_drop_items.c.deckId,
-            run_enemy_drop_items.c.type,
-            run_enemy_drop_items.c.objectId,
-            run_enemy_drop_items.c.originalNum,
-        )
-        .order_by(
-            run_enemy_drop_items.c.stage,
-            run_enemy_drop_items.c.deckType,
-            run_enemy_drop_items.c.deckId,
-            run_enemy_drop_items.c.type,
-            run_enemy_drop_items.c.objectId,
-            run_enemy_drop_items.c.originalNum,
-        )
+    insert_drop_stmt = insert(rayshiftQuestDrop).from_select(
+        [
+            "questId",
+            "phase",
+            "questSelect",
+            "stage",
+            "deckType",
+            "deckId",
+            "type",
+            "objectId",
+            "originalNum",
+            "dropCount",
+            "sumDropCountSquared",
+        ],
+        individual_enemy_drops.union_all(run_drops),
     )
-
-    run_drops = (
-        select(
-            literal_column("-1").label("stage"),
-            literal_column("'enemy'").label("deckType"),
-            literal_column("-1").label("deckId"),
-            run_drop_items.c.type,
-            run_drop_items.c.objectId,
-            run_drop_items.c.originalNum,
-            runs.label("runs"),
-            func.sum(run_drop_items.c.dropCount).label("dropCount"),
-            cast(func.sum(func.power(run_drop_items.c.dropCount, 2)), BIGINT).label(
-                "sumDropCountSquared"
-            ),
-        )
-        .group_by(
-            run_drop_items.c.type,
-            run_drop_items.c.objectId,
-            run_drop_items.c.originalNum,
-        )
-        .order_by(
-            run_drop_items.c.type,
-            run_drop_items.c.objectId,
-            run_drop_items.c.originalNum,
-        )
+    return insert_drop_stmt.on_conflict_do_update(
+        index_elements=list(rayshiftQuestDrop.primary_key),
+        set_={
+            rayshiftQuestDrop.c.dropCount: rayshiftQuestDrop.c.dropCount
+            + insert_drop_stmt.excluded.dropCount,
+            rayshiftQuestDrop.c.sumDropCountSquared: rayshiftQuestDrop.c.sumDropCountSquared
+            + insert_drop_stmt.excluded.sumDropCountSquared,
+        },
     )
 
-    stmt = individual_enemy_drops.union_all(run_drops)
 
-    results = await conn.execute(stmt)
-    return [QuestDrop.parse_obj(row) for row in results.fetchall()]
+def get_delete_empty_drop_stmt(quest_ids: list[int]) -> Delete:
+    return delete(rayshiftQuestDrop).where(
+        and_(
+            rayshiftQuestDrop.c.questId.in_(quest_ids),
+            rayshiftQuestDrop.c.dropCount <= 0,
+        )
+    )
 
 
 insert_quest_stmt = insert(rayshiftQuest)
@@ -221,6 +280,31 @@ do_update_quest_stmt = insert_quest_stmt.on_conflict_do_update(
     index_elements=[rayshiftQuest.c.queryId],
     set_={rayshiftQuest.c.questDetail: insert_quest_stmt.excluded.questDetail},
 )
+do_nothing_quest_stmt = insert_quest_stmt.on_conflict_do_nothing(
+    index_elements=[rayshiftQuest.c.queryId]
+)
+
+
+def get_quest_row_data(data: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """rayshiftQuest rows without the quest details, sorted by queryId"""
+    return [
+        {"queryId": row["queryId"], "questId": row["questId"], "phase": row["phase"]}
+        for row in sorted(data, key=lambda row: row["queryId"])
+    ]
+
+
+def get_lock_rayshift_quest_stmt(query_ids: list[int]) -> Select:
+    """
+    Lock the rayshiftQuest rows of the quest details being replaced so concurrent
+    inserts of the same query IDs remove and add their drop counts one at a time.
+    The rows are locked in queryId order to avoid deadlocks.
+    """
+    return (
+        select(rayshiftQuest.c.queryId)
+        .where(rayshiftQuest.c.queryId.in_(query_ids))
+        .order_by(rayshiftQuest.c.queryId)
+        .with_for_update()
+    )
 
 
 def get_insert_rayshift_quest_data(
@@ -241,18 +325,112 @@ def get_insert_rayshift_quest_data(
     return data
 
 
+def get_insert_rayshift_enemy_stmt(query_ids: Optional[list[int]] = None) -> Insert:
+    """Copy the userSvt of the quest details in rayshiftQuest to rayshiftQuestEnemy"""
+    user_svt = (
+        func.jsonb_to_recordset(rayshiftQuest.c.questDetail["userSvt"])
+        .table_valued(
+            column("svtId", Integer),
+            column("aiId", Integer),
+            column("npcSvtClassId", Integer),
+            column("individuality", ARRAY(Integer)),
+        )
+        .render_derived(name="user_svt", with_types=True)
+    )
+    where_conds = [rayshiftQuest.c.questDetail.isnot(None)]
+    if query_ids is not None:
+        where_conds.append(rayshiftQuest.c.queryId.in_(query_ids))
+    enemies = (
+        select(
+            rayshiftQuest.c.queryId,
+            rayshiftQuest.c.questId,
+            rayshiftQuest.c.phase,
+            user_svt.c.svtId,
+            user_svt.c.aiId,
+            user_svt.c.npcSvtClassId,
+            case(
+                (user_svt.c.npcSvtClassId == 0, mstSvt.c.classId),
+                else_=user_svt.c.npcSvtClassId,
+            ),
+            user_svt.c.individuality,
+        )
+        .select_from(
+            rayshiftQuest.join(user_svt, true()).outerjoin(
+                mstSvt, mstSvt.c.id == user_svt.c.svtId
+            )
+        )
+        .where(and_(*where_conds))
+    )
+    return insert(rayshiftQuestEnemy).from_select(
+        [
+            "queryId",
+            "questId",
+            "phase",
+            "svtId",
+            "aiId",
+            "npcSvtClassId",
+            "classId",
+            "individuality",
+        ],
+        enemies,
+    )
+
+
 async def insert_rayshift_quest_db(
     conn: AsyncConnection, quest_details: dict[int, QuestDetail]
 ) -> None:
+    query_ids = list(quest_details)
     data = get_insert_rayshift_quest_data(quest_details)
+    # Create the missing rows first so all the quest details can be locked
+    await conn.execute(do_nothing_quest_stmt, get_quest_row_data(data))
+    await conn.execute(get_lock_rayshift_quest_stmt(query_ids))
+    # Remove the drops of the quest details that are replaced
+    await conn.execute(get_upsert_rayshift_drop_stmt(query_ids, -1))
     await conn.execute(do_update_quest_stmt, data)
+    await conn.execute(
+        delete(rayshiftQuestEnemy).where(rayshiftQuestEnemy.c.queryId.in_(query_ids))
+    )
+    await conn.execute(get_insert_rayshift_enemy_stmt(query_ids))
+    await conn.execute(get_upsert_rayshift_drop_stmt(query_ids))
+    await conn.execute(
+        get_delete_empty_drop_stmt(
+            list({quest_detail.questId for quest_detail in quest_details.values()})
+        )
+    )
 
 
 def insert_rayshift_quest_db_sync(
     conn: Connection, quest_details: dict[int, QuestDetail]
 ) -> None:
+    query_ids = list(quest_details)
     data = get_insert_rayshift_quest_data(quest_details)
+    # Create the missing rows first so all the quest details can be locked
+    conn.execute(do_nothing_quest_stmt, get_quest_row_data(data))
+    conn.execute(get_lock_rayshift_quest_stmt(query_ids))
+    # Remove the drops of the quest details that are replaced
+    conn.execute(get_upsert_rayshift_drop_stmt(query_ids, -1))
     conn.execute(do_update_quest_stmt, data)
+    conn.execute(
+        delete(rayshiftQuestEnemy).where(rayshiftQuestEnemy.c.queryId.in_(query_ids))
+    )
+    conn.execute(get_insert_rayshift_enemy_stmt(query_ids))
+    conn.execute(get_upsert_rayshift_drop_stmt(query_ids))
+    conn.execute(
+        get_delete_empty_drop_stmt(
+            list({quest_detail.questId for quest_detail in quest_details.values()})
+        )
+    )
+
+
+def create_rayshift_tables(conn: Connection) -> None:
+    rayshiftQuest.create(conn, checkfirst=True)
+    if not inspect(conn).has_table(rayshiftQuestEnemy.name):
+        rayshiftQuestEnemy.create(conn)
+        # Fill the new table with the existing quest details
+        conn.execute(get_insert_rayshift_enemy_stmt())
+    if not inspect(conn).has_table(rayshiftQuestDrop.name):
+        rayshiftQuestDrop.create(conn)
+        conn.execute(get_upsert_rayshift_drop_stmt())
 
 
 def insert_rayshift_quest_list(conn: Connection, quest_list: list[QuestList]) -> None:
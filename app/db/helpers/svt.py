@@ -1,9 +1,11 @@
+from collections import defaultdict
 from typing import Iterable, Optional, Union
 
 from sqlalchemy import Table
+from sqlalchemy.engine import Row
 from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncConnection
-from sqlalchemy.sql import Join, and_, not_, or_, select, true
+from sqlalchemy.sql import Join, and_, or_, select
 from sqlalchemy.sql.elements import ClauseElement
 
 from ...models.raw import (
@@ -36,6 +38,13 @@ async def get_all_equips(conn: AsyncConnection) -> list[MstSvt]:  # pragma: no c
     return [MstSvt.from_orm(svt) for svt in (await conn.execute(stmt)).fetchall()]
 
 
+async def get_all_svt_names(conn: AsyncConnection) -> list[tuple[int, str, str]]:
+    stmt = select(mstSvt.c.id, mstSvt.c.name, mstSvt.c.ruby)
+    return [
+        (svt.id, svt.name, svt.ruby) for svt in (await conn.execute(stmt)).fetchall()
+    ]
+
+
 async def get_svt_id(conn: AsyncConnection, col_no: int) -> int:
     if col_no == 0:
         return 0
@@ -153,68 +162,66 @@ def voice_cond_pattern(
     return [{"conds": [{"condType": condType, "value": value}]}]
 
 
+async def get_svt_filter_rows(conn: AsyncConnection) -> list[Row]:
+    stmt = select(
+        mstSvt.c.id,
+        mstSvt.c.type,
+        mstSvt.c.flag,
+        mstSvt.c.classId,
+        mstSvt.c.genderType,
+        mstSvt.c.attri,
+        mstSvt.c.collectionNo,
+        mstSvt.c.individuality,
+        mstIllustrator.c.name.label("illustrator"),
+        mstCv.c.name.label("cv"),
+    ).select_from(
+        mstSvt.outerjoin(
+            mstIllustrator, mstIllustrator.c.id == mstSvt.c.illustratorId
+        ).outerjoin(mstCv, mstCv.c.id == mstSvt.c.cvId)
+    )
+    return list((await conn.execute(stmt)).fetchall())
+
+
+async def get_all_svt_rarities(conn: AsyncConnection) -> dict[int, set[int]]:
+    stmt = select(mstSvtLimit.c.svtId, mstSvtLimit.c.rarity).distinct()
+    rarities: dict[int, set[int]] = defaultdict(set)
+    for limit in (await conn.execute(stmt)).fetchall():
+        rarities[limit.svtId].add(limit.rarity)
+    return rarities
+
+
+async def get_table_individualities(
+    conn: AsyncConnection, table: Table
+) -> dict[int, list[list[int]]]:
+    stmt = select(table.c.svtId, table.c.individuality)
+    individualities: dict[int, list[list[int]]] = defaultdict(list)
+    for row in (await conn.execute(stmt)).fetchall():
+        individualities[row.svtId].append(row.individuality or [])
+    return individualities
+
+
+async def get_all_svt_extra_individualities(
+    conn: AsyncConnection,
+) -> tuple[dict[int, list[list[int]]], dict[int, list[list[int]]]]:
+    """svt ID -> individuality of the mstSvtLimitAdd and mstSvtIndividuality rows"""
+    return (
+        await get_table_individualities(conn, mstSvtLimitAdd),
+        await get_table_individualities(conn, mstSvtIndividuality),
+    )
+
+
 async def get_svt_search(
     conn: AsyncConnection,
-    svt_type_ints: Optional[Iterable[int]] = None,
-    svt_flag_ints: Optional[Iterable[int]] = None,
-    excludeCollectionNo: Optional[Iterable[int]] = None,
-    class_ints: Optional[Iterable[int]] = None,
-    gender_ints: Optional[Iterable[int]] = None,
-    attribute_ints: Optional[Iterable[int]] = None,
-    trait_ints: Optional[Iterable[int]] = None,
-    not_trait_ints: Optional[Iterable[int]] = None,
-    rarity_ints: Optional[Iterable[int]] = None,
+    svt_ids: Iterable[int],
     cond_svt_value: Optional[set[int]] = None,
     cond_group_value: Optional[set[int]] = None,
-    illustrator: Optional[str] = None,
-    cv: Optional[str] = None,
 ) -> list[MstSvt]:
+    """
+    Get the svts in svt_ids. The other svt filters are done by SvtFilterIndex.
+    The voice conditions are in JSON columns so they are still filtered here.
+    """
     from_clause: Union[Join, Table] = mstSvt
-    where_clause: list[ClauseElement] = [true()]
-
-    if svt_type_ints:
-        where_clause.append(mstSvt.c.type.in_(svt_type_ints))
-    if svt_flag_ints:
-        where_clause.append(mstSvt.c.flag.in_(svt_flag_ints))
-    if excludeCollectionNo:
-        where_clause.append(mstSvt.c.collectionNo.notin_(excludeCollectionNo))
-    if class_ints:
-        where_clause.append(mstSvt.c.classId.in_(class_ints))
-    if gender_ints:
-        where_clause.append(mstSvt.c.genderType.in_(gender_ints))
-    if attribute_ints:
-        where_clause.append(mstSvt.c.attri.in_(attribute_ints))
-    if trait_ints or not_trait_ints:
-        from_clause = from_clause.outerjoin(
-            mstSvtLimitAdd, mstSvtLimitAdd.c.svtId == mstSvt.c.id
-        ).outerjoin(mstSvtIndividuality, mstSvtIndividuality.c.svtId == mstSvt.c.id)
-    if trait_ints:
-        where_clause.append(
-            mstSvt.c.individuality.op("||")(mstSvtLimitAdd.c.individuality)
-            .op("||")(mstSvtIndividuality.c.individuality)
-            .contains(trait_ints)
-        )
-    if not_trait_ints:
-        where_clause.append(
-            not_(
-                mstSvt.c.individuality.op("||")(mstSvtLimitAdd.c.individuality)
-                .op("||")(mstSvtIndividuality.c.individuality)
-                .overlap(not_trait_ints)
-            )
-        )
-    if rarity_ints:
-        from_clause = from_clause.outerjoin(
-            mstSvtLimit, mstSvtLimit.c.svtId == mstSvt.c.id
-        )
-        where_clause.append(mstSvtLimit.c.rarity.in_(rarity_ints))
-    if illustrator:
-        from_clause = from_clause.outerjoin(
-            mstIllustrator, mstIllustrator.c.id == mstSvt.c.illustratorId
-        )
-        where_clause.append(mstIllustrator.c.name == illustrator)
-    if cv:
-        from_clause = from_clause.outerjoin(mstCv, mstCv.c.id == mstSvt.c.cvId)
-        where_clause.append(mstCv.c.name == cv)
+    where_clause: list[ClauseElement] = [mstSvt.c.id.in_(svt_ids)]
 
     if cond_svt_value or cond_group_value:
         from_clause = from_clause.outerjoin(
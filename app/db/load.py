@@ -28,7 +28,6 @@ from ..models.raw import (
     mstTreasureDeviceLv,
     mstWar,
 )
-from ..models.rayshift import rayshiftQuest
 from ..schemas.base import BaseModelORJson
 from ..schemas.common import Region
 from ..schemas.enums import FUNC_VALS_NOT_BUFF
@@ -36,6 +35,7 @@ from ..schemas.raw import AssetStorageLine, get_subtitle_svtId
 from ..schemas.rayshift import QuestDetail, QuestList
 from .engine import engines
 from .helpers.rayshift import (
+    create_rayshift_tables,
     fetch_all_missing_quest_ids,
     fetch_missing_quest_ids,
     insert_rayshift_quest_db_sync,
@@ -347,7 +347,7 @@ def update_db(region_path: dict[Region, DirectoryPath]) -> None:  # pragma: no c
         load_script_list(engine, region, repo_folder)
 
         with engine.begin() as conn:
-            rayshiftQuest.create(conn, checkfirst=True)
+            create_rayshift_tables(conn)
 
     db_loading_time = time.perf_counter() - start_loading_time
     logger.info(f"Loaded db in {db_loading_time:.2f}s.")
@@ -355,7 +355,7 @@ def update_db(region_path: dict[Region, DirectoryPath]) -> None:  # pragma: no c
 
 def load_rayshift_quest_list(region: Region, quest_list: list[QuestList]) -> None:
     with engines[region].begin() as conn:
-        rayshiftQuest.create(conn, checkfirst=True)
+        create_rayshift_tables(conn)
         insert_rayshift_quest_list(conn, quest_list)
 
 
@@ -0,0 +1,86 @@
+import argparse
+import asyncio
+import time
+from typing import Optional
+
+from redis.asyncio import Redis  # type: ignore
+
+from ..config import Settings, logger
+from ..db.engine import async_engines, engines
+from ..schemas.common import Region
+from ..tasks import generate_exports, load_data, update_master_repo_info
+
+
+settings = Settings()
+
+
+async def main(
+    regions: Optional[list[Region]],
+    skip_load: bool,
+    workers: Optional[int],
+    chunk_size: int,
+) -> None:
+    """
+    Load the gamedata and generate the export files outside of the API workers.
+    Used with `LOAD_DATA_ON_STARTUP=False` so the API only serves the data.
+    """
+    region_path = {
+        region: region_data.gamedata
+        for region, region_data in settings.data.items()
+        if not regions or region in regions
+    }
+
+    start_time = time.perf_counter()
+    redis = await Redis.from_url(settings.redisdsn)
+    try:
+        if skip_load:
+            await update_master_repo_info(redis, region_path)
+        else:
+            await load_data(redis, region_path)
+        await generate_exports(redis, region_path, async_engines, workers, chunk_size)
+    finally:
+        await redis.close()
+        for engine in engines.values():
+            engine.dispose()
+        for async_engine in async_engines.values():
+            await async_engine.dispose()
+
+    logger.info(f"Finished in {time.perf_counter() - start_time:.2f}s.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load the gamedata into the db and generate the export files."
+    )
+    parser.add_argument(
+        "--region",
+        "-r",
+        help="Region to load and export. Defaults to all regions in the settings.",
+        type=Region,
+        action="append",
+        required=False,
+    )
+    parser.add_argument(
+        "--skip-load",
+        "-s",
+        help="Don't load the gamedata, only export the data already in the db",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        help="Number of export processes. Defaults to EXPORT_WORKERS.",
+        type=int,
+        default=settings.export_workers,
+    )
+    parser.add_argument(
+        "--chunk-size",
+        "-c",
+        help="Number of entities per export unit. Defaults to EXPORT_CHUNK_SIZE.",
+        type=int,
+        default=settings.export_chunk_size,
+    )
+
+    args = parser.parse_args()
+
+    asyncio.run(main(args.region, args.skip_load, args.workers, args.chunk_size))
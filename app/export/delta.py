@@ -0,0 +1,106 @@
+from enum import Enum
+from pathlib import Path
+from typing import Optional
+
+import aiofiles
+import orjson
+
+from .shard import ExportShard, ExportShardManifest
+from .writer import ExportFile
+
+
+DELTA_FOLDER = "delta"
+
+
+class ExportChangeType(str, Enum):
+    ADDED = "added"
+    CHANGED = "changed"
+    REMOVED = "removed"
+
+
+def get_shard_changes(
+    old_manifest: ExportShardManifest, new_manifest: ExportShardManifest
+) -> list[tuple[str, ExportShard, ExportChangeType]]:
+    """Compare the shard hashes of two exports. Return (folder, shard, change type)."""
+    changes: list[tuple[str, ExportShard, ExportChangeType]] = []
+    for folder in new_manifest.shards.keys() | old_manifest.shards.keys():
+        old_shards = {
+            shard.path: shard for shard in old_manifest.shards.get(folder, [])
+        }
+        new_paths: set[str] = set()
+        for shard in new_manifest.shards.get(folder, []):
+            new_paths.add(shard.path)
+            if shard.path not in old_shards:
+                changes.append((folder, shard, ExportChangeType.ADDED))
+            elif old_shards[shard.path].hash != shard.hash:
+                changes.append((folder, shard, ExportChangeType.CHANGED))
+        for path, shard in old_shards.items():
+            if path not in new_paths:
+                changes.append((folder, shard, ExportChangeType.REMOVED))
+    return sorted(changes, key=lambda change: (change[0], change[1].path))
+
+
+def get_delta_file_name(
+    old_manifest: ExportShardManifest, new_manifest: ExportShardManifest
+) -> Optional[str]:
+    """None if there's no new data version to compare to"""
+    if (
+        old_manifest.repoVersion is None
+        or new_manifest.repoVersion is None
+        or old_manifest.repoVersion.hash == new_manifest.repoVersion.hash
+    ):
+        return None
+    return f"{old_manifest.repoVersion.hash}_{new_manifest.repoVersion.hash}.json"
+
+
+async def write_delta(
+    export_path: Path,
+    old_manifest: Optional[ExportShardManifest],
+    new_manifest: ExportShardManifest,
+) -> Optional[Path]:
+    """
+    Write the entities that were added, changed or removed since the last data version
+    to export/{region}/delta/{old}_{new}.json.
+    Added and changed entities include their new nice data from the export shards.
+    """
+    if old_manifest is None:
+        return None
+    delta_file_name = get_delta_file_name(old_manifest, new_manifest)
+    if delta_file_name is None:
+        return None
+
+    delta_path = export_path / DELTA_FOLDER / delta_file_name
+    delta_path.parent.mkdir(parents=True, exist_ok=True)
+    header = orjson.dumps(
+        {
+            "region": new_manifest.region,
+            "oldVersion": old_manifest.repoVersion,
+            "newVersion": new_manifest.repoVersion,
+        },
+        default=lambda repo_info: repo_info.dict(),
+    ).decode()
+    delta_file = ExportFile(
+        delta_path, prefix=header[:-1] + ',"changes":[', suffix="]}"
+    )
+    await delta_file.open()
+    try:
+        for folder, shard, change_type in get_shard_changes(old_manifest, new_manifest):
+            change = orjson.dumps(
+                {
+                    "type": folder,
+                    "id": shard.id,
+                    "lang": shard.lang,
+                    "change": change_type,
+                }
+            ).decode()
+            if change_type != ExportChangeType.REMOVED:
+                async with aiofiles.open(
+                    export_path / shard.path, "r", encoding="utf-8"
+                ) as fp:
+                    change = change[:-1] + ',"data":' + await fp.read() + "}"
+            await delta_file.write_item(change)
+    except BaseException:
+        await delta_file.discard()
+        raise
+    await delta_file.close()
+    return delta_path
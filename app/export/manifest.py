@@ -0,0 +1,88 @@
+import hashlib
+from pathlib import Path
+from typing import Any, Optional
+
+import orjson
+from pydantic.json import pydantic_encoder
+
+from ..config import Settings, project_root
+from ..schemas.base import BaseModelORJson
+from ..schemas.common import Region
+
+
+settings = Settings()
+
+
+EXPORT_CACHE_FOLDER = project_root / "export_cache"
+MANIFEST_FILE_NAME = "manifest.json"
+
+
+class ExportManifest(BaseModelORJson):
+    version: str = ""
+    # Export unit key (file name and language) -> entity ID -> entity hash
+    hashes: dict[str, dict[int, str]] = {}
+
+    def get_hashes(self, unit_key: str) -> dict[int, str]:
+        return self.hashes.get(unit_key, {})
+
+
+def get_export_cache_path(region: Region) -> Path:
+    return EXPORT_CACHE_FOLDER / region.value
+
+
+def get_export_code_version() -> str:
+    """
+    Hash of the API source, the translation data and the settings used in the nice data.
+    Cached fragments built by a different version of the API are not reused.
+    """
+    code_hash = hashlib.sha1(str(settings.asset_url).encode("utf-8"))
+    app_path = project_root / "app"
+    for file_path in sorted(app_path.rglob("*")):
+        if file_path.suffix in (".py", ".json"):
+            code_hash.update(file_path.relative_to(app_path).as_posix().encode("utf-8"))
+            code_hash.update(file_path.read_bytes())
+    return code_hash.hexdigest()
+
+
+def get_entity_hash(raw_entity: BaseModelORJson, dependencies: Any = None) -> str:
+    """
+    `dependencies` are the rows read by the builder that aren't in the raw entity.
+    An entity keeps its hash across gamedata updates unless one of them changed.
+    """
+    entity_hash = hashlib.sha1(raw_entity.json().encode("utf-8"))
+    if dependencies is not None:
+        entity_hash.update(orjson.dumps(dependencies, default=pydantic_encoder))
+    return entity_hash.hexdigest()
+
+
+def read_manifest(cache_path: Path) -> ExportManifest:
+    manifest_path = cache_path / MANIFEST_FILE_NAME
+    if not manifest_path.exists():
+        return ExportManifest()
+    return ExportManifest.parse_raw(manifest_path.read_bytes())
+
+
+def write_manifest(cache_path: Path, manifest: ExportManifest) -> None:
+    cache_path.mkdir(parents=True, exist_ok=True)
+    (cache_path / MANIFEST_FILE_NAME).write_text(manifest.json(), encoding="utf-8")
+
+
+def read_cached_fragments(
+    cache_path: Path, file_names: list[str], entity_id: int
+) -> Optional[dict[str, str]]:
+    fragments: dict[str, str] = {}
+    for file_name in file_names:
+        fragment_path = cache_path / file_name / f"{entity_id}.json"
+        if not fragment_path.exists():
+            return None
+        fragments[file_name] = fragment_path.read_text(encoding="utf-8")
+    return fragments
+
+
+def write_cached_fragments(
+    cache_path: Path, entity_id: int, fragments: dict[str, str]
+) -> None:
+    for file_name, fragment in fragments.items():
+        fragment_folder = cache_path / file_name
+        fragment_folder.mkdir(parents=True, exist_ok=True)
+        (fragment_folder / f"{entity_id}.json").write_text(fragment, encoding="utf-8")
@@ -0,0 +1,414 @@
+import asyncio
+import multiprocessing
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from itertools import islice
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional, Sequence, Union
+
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from ..config import logger
+from ..core.nice.event.event import get_nice_event
+from ..core.nice.nice import get_nice_equip_model, get_nice_servant_model
+from ..core.nice.overlay import apply_translation_overlay
+from ..core.nice.war import get_nice_war
+from ..core.raw import get_event_entity, get_servant_entity, get_war_entity
+from ..db.engine import async_engines
+from ..db.helpers import fetch
+from ..schemas.base import BaseModelORJson
+from ..schemas.common import Language, Region, RepoInfo
+from ..schemas.gameenums import SvtType, WarEntityFlag
+from ..schemas.nice import NiceEquip, NiceServant
+from ..schemas.raw import (
+    EventEntity,
+    MstConstant,
+    MstFunc,
+    MstItem,
+    ServantEntity,
+    WarEntity,
+)
+from .manifest import (
+    ExportManifest,
+    get_entity_hash,
+    get_export_cache_path,
+    read_cached_fragments,
+    write_cached_fragments,
+)
+from .shard import (
+    ExportShard,
+    ExportShardManifest,
+    get_export_path,
+    get_shard_folder,
+    write_shard,
+)
+from .writer import ExportWriter, format_memory, get_peak_memory
+
+
+class ExportUnitKind(str, Enum):
+    SVT = "svt"
+    WAR = "war"
+    EVENT = "event"
+
+
+def get_export_file_name(file_name: str, lang: Language) -> str:
+    if lang == Language.en:
+        return file_name + "_lang_en"
+    return file_name
+
+
+@dataclass
+class ExportUnit:
+    """A chunk of entities of one export file that is exported by one worker"""
+
+    region: Region
+    kind: ExportUnitKind
+    file_name: str
+    ids: list[int]
+    # Entity hashes of the last export
+    hashes: dict[int, str] = field(default_factory=dict)
+
+    @property
+    def langs(self) -> list[Language]:
+        # Language.jp first: the other languages are overlaid on the Language.jp model
+        if self.region == Region.JP:
+            return [Language.jp, Language.en]
+        return [Language.jp]
+
+    def get_file_names(self) -> list[str]:
+        return [
+            get_export_file_name(self.file_name + suffix, lang)
+            for lang in self.langs
+            for suffix in UNIT_EXPORTERS[self.kind].files
+        ]
+
+    @property
+    def name(self) -> str:
+        return f"{self.region.value} {self.file_name} {self.ids[0]}-{self.ids[-1]}"
+
+
+@dataclass
+class ExportUnitResult:
+    unit: ExportUnit
+    files: dict[str, list[str]] = field(default_factory=dict)  # file name -> entities
+    hashes: dict[int, str] = field(default_factory=dict)
+    shards: list[ExportShard] = field(default_factory=list)
+    rebuilt: int = 0
+    run_time: float = 0.0
+    peak_memory: Optional[int] = None
+
+
+def chunk_ids(ids: Sequence[int], chunk_size: int) -> list[list[int]]:
+    return [
+        list(ids[i : i + chunk_size]) for i in range(0, len(ids), max(chunk_size, 1))
+    ]
+
+
+def get_export_units(
+    region: Region,
+    kind: ExportUnitKind,
+    file_name: str,
+    ids: Sequence[int],
+    chunk_size: int,
+    manifest: ExportManifest = ExportManifest(),
+) -> list[ExportUnit]:
+    """
+    Split the entities in chunks.
+    The units get the entity hashes of the last export from `manifest`.
+    """
+    last_hashes = manifest.get_hashes(file_name)
+    return [
+        ExportUnit(
+            region,
+            kind,
+            file_name,
+            chunk,
+            {
+                entity_id: last_hashes[entity_id]
+                for entity_id in chunk
+                if entity_id in last_hashes
+            },
+        )
+        for chunk in chunk_ids(ids, chunk_size)
+    ]
+
+
+async def get_nice_svt(
+    conn: AsyncConnection,
+    region: Region,
+    lang: Language,
+    lore: bool,
+    raw_svt: ServantEntity,
+) -> Union[NiceServant, NiceEquip]:  # pragma: no cover
+    if raw_svt.mstSvt.type == SvtType.SERVANT_EQUIP:
+        return await get_nice_equip_model(
+            conn=conn,
+            region=region,
+            item_id=raw_svt.mstSvt.id,
+            lang=lang,
+            lore=True,
+            raw_svt=raw_svt,
+        )
+    else:
+        return await get_nice_servant_model(
+            conn=conn,
+            region=region,
+            item_id=raw_svt.mstSvt.id,
+            lang=lang,
+            lore=lore,
+            raw_svt=raw_svt,
+        )
+
+
+async def get_raw_svt(
+    conn: AsyncConnection, entity_id: int
+) -> ServantEntity:  # pragma: no cover
+    return await get_servant_entity(conn, entity_id, expand=True, lore=True)
+
+
+DEPEND_FUNC_ID_PATTERN = re.compile(r"DependFuncId1:\[?(\d+)")
+
+
+async def get_svt_dependencies(
+    conn: AsyncConnection, raw_svt: ServantEntity
+) -> list[MstFunc]:  # pragma: no cover
+    """The DependFuncId functions of the svals are parsed with their own func type"""
+    depend_func_ids = {
+        int(func_id) for func_id in DEPEND_FUNC_ID_PATTERN.findall(raw_svt.json())
+    }
+    return await fetch.get_all_multiple(conn, MstFunc, depend_func_ids)
+
+
+async def get_war_dependencies(
+    conn: AsyncConnection, raw_war: WarEntity
+) -> dict[str, Any]:  # pragma: no cover
+    """
+    The main scenario banners depend on the LAST_WAR_ID constant and the quests
+    have the consume items. The spots and the war of the quests are in the raw war.
+    """
+    dependencies: dict[str, Any] = {
+        "consumeItems": await fetch.get_all_multiple(
+            conn,
+            MstItem,
+            {
+                item_id
+                for quest in raw_war.mstQuest
+                for consume_item in quest.mstQuestConsumeItem
+                for item_id in consume_item.itemIds
+            },
+        )
+    }
+    if not raw_war.mstEvent and raw_war.mstWar.flag & WarEntityFlag.MAIN_SCENARIO:
+        dependencies["lastWarId"] = await fetch.get_one(
+            conn, MstConstant, "LAST_WAR_ID"
+        )
+    return dependencies
+
+
+async def build_svt(
+    conn: AsyncConnection, region: Region, raw_svt: ServantEntity
+) -> BaseModelORJson:  # pragma: no cover
+    return await get_nice_svt(conn, region, Language.jp, True, raw_svt)
+
+
+async def build_war(
+    conn: AsyncConnection, region: Region, raw_war: WarEntity
+) -> BaseModelORJson:  # pragma: no cover
+    return await get_nice_war(
+        conn, region, raw_war.mstWar.id, Language.jp, raw_war=raw_war
+    )
+
+
+async def build_event(
+    conn: AsyncConnection, region: Region, raw_event: EventEntity
+) -> BaseModelORJson:  # pragma: no cover
+    return await get_nice_event(
+        conn, region, raw_event.mstEvent.id, Language.jp, raw_event=raw_event
+    )
+
+
+@dataclass
+class UnitExporter:
+    get_raw: Callable[[AsyncConnection, int], Awaitable[Any]]
+    # Builds the language neutral nice model
+    build: Callable[[AsyncConnection, Region, Any], Awaitable[BaseModelORJson]]
+    # File name suffix -> fields excluded from the file
+    files: dict[str, Optional[set[str]]]
+    # Suffix of the file whose entities are also written to the sharded export tree
+    shard_suffix: str = ""
+    # Rows read by `build` that aren't in the raw entity, part of the entity hash
+    get_dependencies: Optional[Callable[[AsyncConnection, Any], Awaitable[Any]]] = None
+
+
+UNIT_EXPORTERS = {
+    ExportUnitKind.SVT: UnitExporter(
+        get_raw_svt,
+        build_svt,
+        {"": {"profile"}, "_lore": None},
+        "_lore",
+        get_svt_dependencies,
+    ),
+    ExportUnitKind.WAR: UnitExporter(
+        get_war_entity, build_war, {"": None}, get_dependencies=get_war_dependencies
+    ),
+    ExportUnitKind.EVENT: UnitExporter(get_event_entity, build_event, {"": None}),
+}
+
+
+def serialize_entity(unit: ExportUnit, nice_entity: BaseModelORJson) -> dict[str, str]:
+    """Serialize the entity in every file and language of the unit"""
+    files = UNIT_EXPORTERS[unit.kind].files
+    fragments: dict[str, str] = {}
+    for lang in unit.langs:
+        apply_translation_overlay(nice_entity, lang, unit.region)
+        for suffix, exclude in files.items():
+            fragments[
+                get_export_file_name(unit.file_name + suffix, lang)
+            ] = nice_entity.json(exclude=exclude, exclude_unset=True, exclude_none=True)
+    return fragments
+
+
+async def export_unit_entities(
+    conn: AsyncConnection, unit: ExportUnit
+) -> ExportUnitResult:  # pragma: no cover
+    """
+    Build the entities whose raw entity or dependencies hash is different from
+    the last export and read the others from the fragment cache.
+    Each entity is also written to the sharded export tree as soon as it's ready.
+    """
+    exporter = UNIT_EXPORTERS[unit.kind]
+    cache_path = get_export_cache_path(unit.region)
+    export_path = get_export_path(unit.region)
+    shard_folder = get_shard_folder(unit.file_name)
+    result = ExportUnitResult(unit)
+
+    for entity_id in unit.ids:
+        raw_entity = await exporter.get_raw(conn, entity_id)
+        dependencies = (
+            await exporter.get_dependencies(conn, raw_entity)
+            if exporter.get_dependencies
+            else None
+        )
+        entity_hash = get_entity_hash(raw_entity, dependencies)
+
+        fragments: Optional[dict[str, str]] = None
+        rebuilt = False
+        if unit.hashes.get(entity_id) == entity_hash:
+            fragments = read_cached_fragments(
+                cache_path, unit.get_file_names(), entity_id
+            )
+        if fragments is None:
+            nice_entity = await exporter.build(conn, unit.region, raw_entity)
+            fragments = serialize_entity(unit, nice_entity)
+            write_cached_fragments(cache_path, entity_id, fragments)
+            rebuilt = True
+            result.rebuilt += 1
+
+        for lang in unit.langs:
+            shard_file_name = get_export_file_name(
+                unit.file_name + exporter.shard_suffix, lang
+            )
+            result.shards.append(
+                write_shard(
+                    export_path,
+                    shard_folder,
+                    entity_id,
+                    lang,
+                    fragments[shard_file_name],
+                    overwrite=rebuilt,
+                )
+            )
+
+        result.hashes[entity_id] = entity_hash
+        for file_name, fragment in fragments.items():
+            result.files.setdefault(file_name, []).append(fragment)
+
+    return result
+
+
+async def export_unit(unit: ExportUnit) -> ExportUnitResult:  # pragma: no cover
+    start_time = time.perf_counter()
+    engine = async_engines[unit.region]
+    try:
+        async with engine.connect() as conn:
+            result = await export_unit_entities(conn, unit)
+    finally:
+        # The pooled connections belong to this unit's event loop
+        await engine.dispose()
+    result.run_time = time.perf_counter() - start_time
+    result.peak_memory = get_peak_memory()
+    return result
+
+
+def run_export_unit(unit: ExportUnit) -> ExportUnitResult:  # pragma: no cover
+    return asyncio.run(export_unit(unit))
+
+
+def get_export_pool(workers: Optional[int]) -> ProcessPoolExecutor:  # pragma: no cover
+    # spawn so the workers don't inherit the event loop and the DB connections of the API process
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+async def run_export_units(
+    pool: ProcessPoolExecutor,
+    units: list[ExportUnit],
+    export_path: Path,
+    max_pending: int,
+) -> list[ExportUnitResult]:  # pragma: no cover
+    """
+    Run the units in the pool and write their entities to the export files in order.
+    At most `max_pending` units are submitted ahead of the one being written
+    to bound the memory used by finished units that wait for their turn.
+    """
+    loop = asyncio.get_running_loop()
+    remaining_units = iter(units)
+    pending = deque(
+        loop.run_in_executor(pool, run_export_unit, unit)
+        for unit in islice(remaining_units, max_pending)
+    )
+    results: list[ExportUnitResult] = []
+
+    async with ExportWriter(export_path) as writer:
+        while pending:
+            result: ExportUnitResult = await pending.popleft()
+            if next_unit := next(remaining_units, None):
+                pending.append(loop.run_in_executor(pool, run_export_unit, next_unit))
+
+            for file_name, items in result.files.items():
+                await writer.write_items(file_name, items)
+            result.files = {}
+
+            logger.info(
+                f"Exported {result.unit.name} in {result.run_time:.2f}s "
+                f"({result.rebuilt}/{len(result.unit.ids)} rebuilt, "
+                f"{format_memory(result.peak_memory)} peak memory)."
+            )
+            results.append(result)
+
+    return results
+
+
+def get_updated_manifest(
+    version: str, results: list[ExportUnitResult]
+) -> ExportManifest:
+    manifest = ExportManifest(version=version)
+    for result in results:
+        manifest.hashes.setdefault(result.unit.file_name, {}).update(result.hashes)
+    return manifest
+
+
+def get_shard_manifest(
+    region: Region, repo_version: Optional[RepoInfo], results: list[ExportUnitResult]
+) -> ExportShardManifest:
+    manifest = ExportShardManifest(region=region, repoVersion=repo_version)
+    for result in results:
+        manifest.shards.setdefault(get_shard_folder(result.unit.file_name), []).extend(
+            result.shards
+        )
+    return manifest
@@ -0,0 +1,97 @@
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+from ..config import project_root
+from ..schemas.base import BaseModelORJson
+from ..schemas.common import Language, Region, RepoInfo
+from .writer import atomic_write_bytes
+
+
+SHARD_MANIFEST_FILE_NAME = "manifest.json"
+
+
+class ExportShard(BaseModelORJson):
+    id: int
+    lang: Language
+    path: str
+    size: int
+    hash: str
+
+
+class ExportShardManifest(BaseModelORJson):
+    region: Region
+    repoVersion: Optional[RepoInfo] = None
+    # Shard folder -> shards
+    shards: dict[str, list[ExportShard]] = {}
+
+
+def get_export_path(region: Region) -> Path:
+    return project_root / "export" / region.value
+
+
+def get_shard_folder(file_name: str) -> str:
+    """nice_servant -> servant"""
+    return file_name.removeprefix("nice_")
+
+
+def get_shard_path(folder: str, entity_id: int, lang: Language) -> str:
+    if lang == Language.en:
+        return f"{folder}/{entity_id}_lang_en.json"
+    return f"{folder}/{entity_id}.json"
+
+
+def write_shard(
+    export_path: Path,
+    folder: str,
+    entity_id: int,
+    lang: Language,
+    fragment: str,
+    overwrite: bool,
+) -> ExportShard:
+    """
+    Write the entity to its own file in the export tree.
+    Existing files are kept as they are unless `overwrite` is set.
+    """
+    data = fragment.encode("utf-8")
+    shard_path = get_shard_path(folder, entity_id, lang)
+    full_path = export_path / shard_path
+    if overwrite or not full_path.exists():
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(full_path, data)
+    return ExportShard(
+        id=entity_id,
+        lang=lang,
+        path=shard_path,
+        size=len(data),
+        hash=hashlib.sha1(data).hexdigest(),
+    )
+
+
+def prune_shards(export_path: Path, manifest: ExportShardManifest) -> int:
+    """Remove the shard files of entities that are not in the data anymore"""
+    removed = 0
+    for folder, shards in manifest.shards.items():
+        shard_paths = {shard.path for shard in shards}
+        folder_path = export_path / folder
+        if not folder_path.exists():
+            continue
+        for file_path in folder_path.iterdir():
+            if f"{folder}/{file_path.name}" not in shard_paths:
+                file_path.unlink()
+                removed += 1
+    return removed
+
+
+def read_shard_manifest(export_path: Path) -> Optional[ExportShardManifest]:
+    manifest_path = export_path / SHARD_MANIFEST_FILE_NAME
+    if not manifest_path.exists():
+        return None
+    return ExportShardManifest.parse_raw(manifest_path.read_bytes())
+
+
+def write_shard_manifest(export_path: Path, manifest: ExportShardManifest) -> None:
+    atomic_write_bytes(
+        export_path / SHARD_MANIFEST_FILE_NAME,
+        manifest.json(exclude_none=True).encode("utf-8"),
+    )
@@ -0,0 +1,127 @@
+import os
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Iterable, Optional, Type
+
+import aiofiles
+from aiofiles.threadpool.text import AsyncTextIOWrapper
+
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore
+
+
+# Serialized items are written to disk once the buffer of a file is bigger than this
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def get_temp_path(path: Path) -> Path:
+    return path.with_name(path.name + ".tmp")
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """Write to a temporary file first so the file is never served half written"""
+    temp_path = get_temp_path(path)
+    temp_path.write_bytes(data)
+    os.replace(temp_path, path)
+
+
+class ExportFile:
+    """
+    JSON array file that is written one item at a time.
+    `prefix` and `suffix` can wrap the array in a bigger JSON document.
+    """
+
+    def __init__(self, path: Path, prefix: str = "[", suffix: str = "]") -> None:
+        self.path = path
+        self.prefix = prefix
+        self.suffix = suffix
+        self.temp_path = get_temp_path(path)
+        self.fp: Optional[AsyncTextIOWrapper] = None
+        self.buffer: list[str] = []
+        self.buffer_size = 0
+        self.item_count = 0
+
+    async def open(self) -> None:
+        self.fp = await aiofiles.open(self.temp_path, "w", encoding="utf-8")
+        self.buffer = [self.prefix]
+
+    async def write_item(self, item: str) -> None:
+        if self.item_count > 0:
+            self.buffer.append(",")
+        self.buffer.append(item)
+        self.buffer_size += len(item)
+        self.item_count += 1
+        if self.buffer_size > WRITE_BUFFER_SIZE:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if self.fp is not None:
+            await self.fp.write("".join(self.buffer))
+        self.buffer = []
+        self.buffer_size = 0
+
+    async def close(self) -> None:
+        """Finish the array and move the file in place"""
+        self.buffer.append(self.suffix)
+        await self.flush()
+        if self.fp is not None:
+            await self.fp.close()
+        os.replace(self.temp_path, self.path)
+
+    async def discard(self) -> None:
+        if self.fp is not None:
+            await self.fp.close()
+        self.temp_path.unlink(missing_ok=True)
+
+
+class ExportWriter:
+    """
+    Write JSON array export files item by item so the whole file is never in memory.
+    The files are written to temporary files that replace the export files only
+    when the writer exits without errors.
+    """
+
+    def __init__(self, export_path: Path) -> None:
+        self.export_path = export_path
+        self.files: dict[str, ExportFile] = {}
+
+    async def write_items(self, file_name: str, items: Iterable[str]) -> None:
+        if file_name not in self.files:
+            export_file = ExportFile(self.export_path / f"{file_name}.json")
+            await export_file.open()
+            self.files[file_name] = export_file
+        export_file = self.files[file_name]
+        for item in items:
+            await export_file.write_item(item)
+
+    async def __aenter__(self) -> "ExportWriter":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> Any:
+        for export_file in self.files.values():
+            if exc_type is None:
+                await export_file.close()
+            else:
+                await export_file.discard()
+
+
+def get_peak_memory() -> Optional[int]:
+    """Peak resident set size of this process in bytes"""
+    if resource is None:  # pragma: no cover
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def format_memory(size: Optional[int]) -> str:
+    if size is None:  # pragma: no cover
+        return "N/A"
+    return f"{size / 1024 / 1024:.0f}MB"
@@ -1,3 +1,4 @@
+import asyncio
 import hashlib
 import json
 from math import ceil
@@ -10,21 +11,24 @@ from fastapi import Depends, FastAPI, HTTPException, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
 from fastapi_cache import FastAPICache
 from fastapi_cache.backends.redis import RedisBackend
 from fastapi_cache.coder import PickleCoder
 from fastapi_limiter import FastAPILimiter  # type: ignore
+from pydantic.json import pydantic_encoder
 from redis.asyncio import Redis  # type: ignore
 from sqlalchemy.ext.asyncio import AsyncConnection
 
 from .config import Settings, project_root
 from .core.info import get_all_repo_info
 from .db.engine import async_engines, engines
+from .rayshift.quest import close_rayshift_client, start_rayshift_client
 from .routers import basic, nice, raw, secret
+from .routers.compression import CompressionMiddleware, PrecompressedStaticFiles
 from .routers.deps import get_redis
+from .routers.utils import ResponseFormatMiddleware, response_format
 from .schemas.common import Region, RepoInfo
-from .tasks import load_and_export
+from .tasks import load_and_export, prefetch_quest_phases_forever
 
 
 settings = Settings()
@@ -41,6 +45,10 @@ It's recommended to use the static export files or search with the `/basic` endp
 and fetch nice or raw data as needed.
 A big search with nice or raw data will take a while to respond.
 
+Nice, raw and basic entities can also be returned as MessagePack or CBOR
+by sending `Accept: application/msgpack` or `Accept: application/cbor`.
+Integer keys stay integers in these formats instead of being converted to strings.
+
 There are many export files in the "Export files" section above.
 Make sure you check them out before querying the API.
 Chances are what you need is already there.
@@ -192,6 +200,10 @@ if settings.openapi_url:
 
 
 app.add_middleware(CORSMiddleware, allow_origins=["*"])
+app.add_middleware(
+    CompressionMiddleware, minimum_size=settings.compress_response_min_size
+)
+app.add_middleware(ResponseFormatMiddleware)
 
 
 # @app.middleware("http")
@@ -244,10 +256,15 @@ def custom_key_builder(
         args_dump = orjson.dumps(static_args).decode("utf-8")
         kwargs_dump = orjson.dumps(static_kwargs).decode("utf-8")
     except TypeError:  # orjson can't dump 64+ bit int
-        args_dump = json.dumps(static_args)
-        kwargs_dump = json.dumps(static_kwargs)
-
-    raw_key = f"{func.__module__}:{func.__name__}:{args_dump}:{kwargs_dump}"
+        # pydantic_encoder dumps the dataclass and enum arguments like orjson does
+        args_dump = json.dumps(static_args, default=pydantic_encoder)
+        kwargs_dump = json.dumps(static_kwargs, default=pydantic_encoder)
+
+    # Cache the JSON, msgpack and CBOR responses separately
+    media_type = response_format.get()
+    raw_key = (
+        f"{func.__module__}:{func.__name__}:{media_type}:{args_dump}:{kwargs_dump}"
+    )
     cache_key = hashlib.sha1(raw_key.encode("utf-8")).hexdigest()
 
     return f"{prefix}:{namespace}:{cache_key}"
@@ -267,16 +284,26 @@ async def startup() -> None:
         coder=PickleCoder,  # pyright: reportGeneralTypeIssues=false
     )
     app.state.redis = redis
+    start_rayshift_client()
 
-    region_pathes = {
-        region: region_data.gamedata for region, region_data in settings.data.items()
-    }
+    if settings.load_data_on_startup:
+        region_pathes = {
+            region: region_data.gamedata
+            for region, region_data in settings.data.items()
+        }
+        await load_and_export(redis, region_pathes, async_engines)
 
-    await load_and_export(redis, region_pathes, async_engines)
+    if settings.quest_prefetch_interval > 0:  # pragma: no cover
+        app.state.quest_prefetch = asyncio.create_task(
+            prefetch_quest_phases_forever(redis, async_engines)
+        )
 
 
 @app.on_event("shutdown")
 async def shutdown() -> None:
+    if settings.quest_prefetch_interval > 0:  # pragma: no cover
+        app.state.quest_prefetch.cancel()
+    await close_rayshift_client()
     for engine in engines.values():
         engine.dispose()
     for async_engine in async_engines.values():
@@ -304,7 +331,7 @@ if settings.github_webhook_secret.get_secret_value() != "":  # pragma: no cover
     app.include_router(secret.router)
 
 
-app.mount("/export", StaticFiles(directory="export"), name="export")
+app.mount("/export", PrecompressedStaticFiles(directory="export"), name="export")
 
 
 def custom_openapi() -> dict[str, Any]:
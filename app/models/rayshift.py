@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Index, Integer, Table, text
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import BigInteger, Column, Index, Integer, String, Table, text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 
 from .base import metadata
 
@@ -17,3 +17,44 @@ rayshiftQuest = Table(
         postgresql_using="gin",
     ),
 )
+
+
+# One row per enemy of each rayshift quest run for the quest phase enemy search
+rayshiftQuestEnemy = Table(
+    "rayshiftQuestEnemy",
+    metadata,
+    Column("queryId", Integer, index=True),
+    Column("questId", Integer),
+    Column("phase", Integer),
+    Column("svtId", Integer, index=True),
+    Column("aiId", Integer, index=True),
+    Column("npcSvtClassId", Integer),
+    # npcSvtClassId or the classId of the svt if npcSvtClassId is 0
+    Column("classId", Integer, index=True),
+    Column("individuality", ARRAY(Integer)),
+    Index("ix_rayshiftQuestEnemy_questId_phase", "questId", "phase"),
+    Index(
+        "ix_rayshiftQuestEnemy_individuality_GIN",
+        "individuality",
+        postgresql_using="gin",
+    ),
+)
+
+
+# Drop counts of the rayshift quest runs, updated as new runs are inserted.
+# Rows with stage -1 are the drops of all the enemies of the runs.
+rayshiftQuestDrop = Table(
+    "rayshiftQuestDrop",
+    metadata,
+    Column("questId", Integer, primary_key=True),
+    Column("phase", Integer, primary_key=True),
+    Column("questSelect", Integer, primary_key=True),
+    Column("stage", Integer, primary_key=True),
+    Column("deckType", String, primary_key=True),
+    Column("deckId", Integer, primary_key=True),
+    Column("type", Integer, primary_key=True),
+    Column("objectId", Integer, primary_key=True),
+    Column("originalNum", Integer, primary_key=True),
+    Column("dropCount", BigInteger),
+    Column("sumDropCountSquared", BigInteger),
+)
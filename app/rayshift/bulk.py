@@ -0,0 +1,256 @@
+import asyncio
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Iterator, Optional, Union
+
+import httpx
+import orjson
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from ..config import Settings, logger, project_root
+from ..db.helpers.rayshift import insert_rayshift_quest_db
+from ..export.writer import atomic_write_bytes
+from ..schemas.common import Region
+from ..schemas.rayshift import BaseRayshiftResponse, QuestDetail, QuestRayshiftResponse
+from .quest import NO_API_KEY, QUEST_ENDPOINT, REGION_ENUM
+
+
+settings = Settings()
+
+
+CHECKPOINT_FOLDER = project_root / "rayshift_checkpoint"
+QUERY_IDS_PER_REQUEST = 25
+DEFAULT_RATE_LIMIT_WAIT = 10
+
+
+class RayshiftRateLimited(Exception):
+    def __init__(self, wait: float) -> None:
+        super().__init__(f"Rate limited for {wait} seconds")
+        self.wait = wait
+
+
+class RayshiftRequestFailed(Exception):
+    def __init__(self, status_code: int) -> None:
+        super().__init__(f"Rayshift returned {status_code}")
+        self.status_code = status_code
+
+
+class AdaptiveLimiter:
+    """
+    Limit the number of requests in flight.
+    The limit is halved and all requests pause for the `wait` seconds of a 429
+    response. It grows back by one after as many successful requests as the limit.
+    """
+
+    def __init__(self, max_concurrency: int) -> None:
+        self.max_concurrency = max_concurrency
+        self.concurrency = max_concurrency
+        self.in_flight = 0
+        self.successes = 0
+        self.resume_time = 0.0
+        self.condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.concurrency)
+            self.in_flight += 1
+        wait = self.resume_time - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def release(self, rate_limit_wait: Optional[float] = None) -> None:
+        async with self.condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if rate_limit_wait is None:
+                self.successes += 1
+                if self.successes >= self.concurrency:
+                    self.concurrency = min(self.concurrency + 1, self.max_concurrency)
+                    self.successes = 0
+            elif now >= self.resume_time:
+                # Requests that were in flight during the last pause don't count
+                self.concurrency = max(self.concurrency // 2, 1)
+                self.successes = 0
+                self.resume_time = now + rate_limit_wait
+            self.condition.notify_all()
+
+
+class RayshiftCheckpoint:
+    """Query IDs that were already requested and written to the db"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.done_ids: set[int] = (
+            set(orjson.loads(path.read_bytes())) if path.exists() else set()
+        )
+
+    def add(self, query_ids: list[int]) -> None:
+        self.done_ids.update(query_ids)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(self.path, orjson.dumps(sorted(self.done_ids)))
+
+    def clear(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+def get_checkpoint_path(region: Region) -> Path:
+    return CHECKPOINT_FOLDER / f"{region.value}.json"
+
+
+async def fetch_quest_details(
+    client: AsyncClient, region: Region, query_ids: list[int]
+) -> dict[int, QuestDetail]:
+    params: dict[str, Union[str, int, list[int]]] = {
+        "apiKey": settings.rayshift_api_key.get_secret_value(),
+        "region": REGION_ENUM[region],
+    }
+    if len(query_ids) == 1:
+        params["id"] = query_ids[0]
+    else:
+        params["ids"] = query_ids
+
+    r = await client.get(f"{QUEST_ENDPOINT}/get", params=params)
+    if r.status_code == httpx.codes.TOO_MANY_REQUESTS:
+        wait = BaseRayshiftResponse.parse_raw(r.content).wait
+        raise RayshiftRateLimited(wait if wait is not None else DEFAULT_RATE_LIMIT_WAIT)
+    if r.status_code != httpx.codes.OK:
+        raise RayshiftRequestFailed(r.status_code)
+
+    return QuestRayshiftResponse.parse_raw(r.content).response.questDetails
+
+
+async def bulk_fetch_quest_details(
+    client: AsyncClient,
+    region: Region,
+    query_ids: list[int],
+    write_quest_details: Callable[[dict[int, QuestDetail]], Awaitable[None]],
+    checkpoint: Optional[RayshiftCheckpoint] = None,
+    max_concurrency: int = 8,
+    write_batch_size: int = 250,
+    max_retries: int = 5,
+) -> int:
+    """
+    Fetch the quest details of the query IDs with up to `max_concurrency` requests
+    in flight. A separate writer task writes the quest details in batches of
+    `write_batch_size` and saves the requested query IDs to the checkpoint after each
+    write. Query IDs in the checkpoint are skipped. Failed requests are retried
+    up to `max_retries` times and their query IDs aren't checkpointed if they
+    never get an OK response.
+    Return the number of quest details written.
+    """
+    if checkpoint is not None:
+        query_ids = [
+            query_id for query_id in query_ids if query_id not in checkpoint.done_ids
+        ]
+    request_chunks: Iterator[list[int]] = (
+        query_ids[i : i + QUERY_IDS_PER_REQUEST]
+        for i in range(0, len(query_ids), QUERY_IDS_PER_REQUEST)
+    )
+    limiter = AdaptiveLimiter(max_concurrency)
+    results: asyncio.Queue[
+        Optional[tuple[list[int], dict[int, QuestDetail]]]
+    ] = asyncio.Queue(maxsize=max_concurrency * 2)
+
+    async def fetch(request_ids: list[int]) -> None:
+        for _ in range(max_retries + 1):
+            await limiter.acquire()
+            try:
+                quest_details = await fetch_quest_details(client, region, request_ids)
+            except RayshiftRateLimited as rate_limited:
+                logger.info(f"Rate limited by Rayshift for {rate_limited.wait}s")
+                await limiter.release(rate_limited.wait)
+                continue
+            except (httpx.RequestError, RayshiftRequestFailed) as error:
+                logger.warning(f"Failed to fetch {request_ids}: {error!r}")
+                await limiter.release()
+                continue
+            await limiter.release()
+            await results.put((request_ids, quest_details))
+            return
+        logger.warning(f"Gave up fetching {request_ids}")
+
+    async def fetch_worker() -> None:
+        for request_ids in request_chunks:
+            await fetch(request_ids)
+
+    written = 0
+
+    async def writer() -> None:
+        nonlocal written
+        pending_ids: list[int] = []
+        pending_details: dict[int, QuestDetail] = {}
+
+        async def flush() -> None:
+            nonlocal written
+            if pending_details:
+                await write_quest_details(pending_details)
+                written += len(pending_details)
+                logger.info(f"Loaded {written} {region} quest details")
+            if checkpoint is not None and pending_ids:
+                checkpoint.add(pending_ids)
+            pending_ids.clear()
+            pending_details.clear()
+
+        while (result := await results.get()) is not None:
+            pending_ids.extend(result[0])
+            pending_details.update(result[1])
+            if len(pending_details) >= write_batch_size:
+                await flush()
+        await flush()
+
+    async def fetch_all() -> None:
+        await asyncio.gather(*(fetch_worker() for _ in range(max_concurrency)))
+        await results.put(None)
+
+    fetch_task = asyncio.create_task(fetch_all())
+    writer_task = asyncio.create_task(writer())
+    try:
+        done, _ = await asyncio.wait(
+            [fetch_task, writer_task], return_when=asyncio.FIRST_EXCEPTION
+        )
+        # Raise the exception of the failed task if any
+        for task in done:
+            task.result()
+    finally:
+        fetch_task.cancel()
+        writer_task.cancel()
+
+    return written
+
+
+async def bulk_load_quest_details(
+    engine: AsyncEngine,
+    region: Region,
+    query_ids: list[int],
+    max_concurrency: int = 8,
+    write_batch_size: int = 250,
+) -> int:
+    """
+    Load the quest details of the query IDs into the db.
+    Progress is saved to `rayshift_checkpoint/{region}.json` so an interrupted load
+    resumes where it stopped. The checkpoint is removed once all query IDs are done.
+    """
+    if NO_API_KEY or region not in REGION_ENUM:  # pragma: no cover
+        return 0
+
+    async def write_quest_details(quest_details: dict[int, QuestDetail]) -> None:
+        async with engine.begin() as conn:
+            await insert_rayshift_quest_db(conn, quest_details)
+
+    checkpoint = RayshiftCheckpoint(get_checkpoint_path(region))
+    limits = httpx.Limits(
+        max_connections=max_concurrency, max_keepalive_connections=max_concurrency
+    )
+    async with AsyncClient(follow_redirects=True, timeout=60, limits=limits) as client:
+        written = await bulk_fetch_quest_details(
+            client,
+            region,
+            query_ids,
+            write_quest_details,
+            checkpoint,
+            max_concurrency,
+            write_batch_size,
+        )
+    checkpoint.clear()
+    return written
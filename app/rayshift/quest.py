@@ -1,13 +1,23 @@
+import asyncio
 import time
 from typing import Optional, Union
 
 import httpx
 from fastapi import HTTPException
-from httpx import Client
+from httpx import AsyncClient, Client
+from redis.asyncio import Redis  # type: ignore
 from sqlalchemy.ext.asyncio import AsyncConnection
 
 from ..config import Settings, logger
+from ..db.engine import async_engines
 from ..db.helpers.rayshift import get_rayshift_quest_db, insert_rayshift_quest_db
+from ..redis.helpers.quest import (
+    RAYSHIFT_CALL_LOADING,
+    claim_rayshift_call,
+    get_rayshift_call_state,
+    release_rayshift_call,
+    set_rayshift_call_miss,
+)
 from ..schemas.common import Region
 from ..schemas.rayshift import (
     BaseRayshiftResponse,
@@ -24,60 +34,153 @@ settings = Settings()
 NO_API_KEY = settings.rayshift_api_key.get_secret_value() == ""
 QUEST_ENDPOINT = f"{settings.rayshift_api_url}/avalon-data-export/quests"
 REGION_ENUM = {Region.JP: 1, Region.NA: 2}
+# How long to wait in seconds for another worker's live lookup of the same quest phase
+RAYSHIFT_CALL_WAIT = 10
+RAYSHIFT_CALL_POLL_INTERVAL = 0.5
+
+
+# App-lifetime client so live lookups reuse the keep-alive connections
+rayshift_client: Optional[AsyncClient] = None
+
+# In-flight live lookups of this worker
+quest_response_calls: dict[tuple[Region, int, int], asyncio.Task[bool]] = {}
+
+
+def start_rayshift_client() -> None:
+    global rayshift_client  # pylint: disable=global-statement
+    rayshift_client = AsyncClient(
+        follow_redirects=True, timeout=30, limits=httpx.Limits(max_connections=20)
+    )
+
+
+async def close_rayshift_client() -> None:
+    global rayshift_client  # pylint: disable=global-statement
+    if rayshift_client is not None:
+        await rayshift_client.aclose()
+        rayshift_client = None
 
 
 async def get_quest_response(
-    region: Region, quest_id: int, phase: int
+    client: AsyncClient, region: Region, quest_id: int, phase: int
 ) -> Optional[QuestResponse]:
     if NO_API_KEY or region not in REGION_ENUM:  # pragma: no cover
         return None
 
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        params: dict[str, Union[str, int]] = {
-            "apiKey": settings.rayshift_api_key.get_secret_value(),
-            "region": REGION_ENUM[region],
-            "questId": quest_id,
-            "questPhase": phase,
-        }
-        try:
-            r = await client.get(f"{QUEST_ENDPOINT}/get", params=params)
-        except httpx.RequestError:  # pragma: no cover
-            return None
-        if r.status_code == httpx.codes.OK:
-            return QuestRayshiftResponse.parse_raw(r.content).response
-        elif r.status_code == httpx.codes.TOO_MANY_REQUESTS:  # pragma: no cover
-            rate_limit = BaseRayshiftResponse.parse_raw(r.content)
-            wait_seconds = rate_limit.wait if rate_limit.wait else 60
-            raise HTTPException(
-                status_code=r.status_code,
-                detail=f"Please wait {wait_seconds} seconds until you make the next quest request",
+    params: dict[str, Union[str, int]] = {
+        "apiKey": settings.rayshift_api_key.get_secret_value(),
+        "region": REGION_ENUM[region],
+        "questId": quest_id,
+        "questPhase": phase,
+    }
+    r = await client.get(f"{QUEST_ENDPOINT}/get", params=params)
+    if r.status_code == httpx.codes.OK:
+        return QuestRayshiftResponse.parse_raw(r.content).response
+    elif r.status_code == httpx.codes.TOO_MANY_REQUESTS:  # pragma: no cover
+        rate_limit = BaseRayshiftResponse.parse_raw(r.content)
+        wait_seconds = rate_limit.wait if rate_limit.wait else 60
+        raise HTTPException(
+            status_code=r.status_code,
+            detail=f"Please wait {wait_seconds} seconds until you make the next quest request",
+            headers={"Retry-After": str(wait_seconds)},
+        )
+    elif r.status_code >= 500:  # pragma: no cover
+        r.raise_for_status()
+    return None
+
+
+async def wait_quest_response(
+    redis: Redis, region: Region, quest_id: int, phase: int
+) -> bool:
+    """
+    Wait up to RAYSHIFT_CALL_WAIT seconds for the worker holding the claim.
+    Return True if the claim was released, i.e. the quest phase might be in the db now.
+    """
+    deadline = time.monotonic() + RAYSHIFT_CALL_WAIT
+    while (
+        state := await get_rayshift_call_state(redis, region, quest_id, phase)
+    ) == RAYSHIFT_CALL_LOADING:
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(RAYSHIFT_CALL_POLL_INTERVAL)
+    return state is None
+
+
+async def load_quest_response(
+    redis: Redis, region: Region, quest_id: int, phase: int
+) -> bool:
+    """
+    Load the quest phase from Rayshift into the db.
+    Only one worker calls Rayshift for a quest phase at a time, the other workers
+    wait for it to finish. If Rayshift doesn't have the quest phase, it's not called
+    again for `rayshift_miss_cache_length` seconds. Failed calls aren't cached and
+    rate limited calls are retried after the wait asked by Rayshift.
+    Return True if the quest phase might have been loaded.
+    """
+    if not await claim_rayshift_call(redis, region, quest_id, phase):
+        return await wait_quest_response(redis, region, quest_id, phase)
+
+    try:
+        if rayshift_client is not None:
+            quest_response = await get_quest_response(
+                rayshift_client, region, quest_id, phase
+            )
+        else:  # pragma: no cover
+            async with AsyncClient(follow_redirects=True) as client:
+                quest_response = await get_quest_response(
+                    client, region, quest_id, phase
+                )
+
+        if quest_response and quest_response.questDetails:
+            async with async_engines[region].begin() as conn:
+                await insert_rayshift_quest_db(conn, quest_response.questDetails)
+            await release_rayshift_call(redis, region, quest_id, phase)
+            return True
+    except HTTPException as e:  # pragma: no cover
+        if e.status_code == httpx.codes.TOO_MANY_REQUESTS and e.headers:
+            await set_rayshift_call_miss(
+                redis, region, quest_id, phase, int(e.headers["Retry-After"])
             )
         else:
-            return None
+            await release_rayshift_call(redis, region, quest_id, phase)
+        raise
+    except httpx.HTTPError:  # pragma: no cover
+        await release_rayshift_call(redis, region, quest_id, phase)
+        return False
+    except BaseException:  # pragma: no cover
+        await release_rayshift_call(redis, region, quest_id, phase)
+        raise
+
+    await set_rayshift_call_miss(
+        redis, region, quest_id, phase, settings.rayshift_miss_cache_length
+    )
+    return False
 
 
 async def get_quest_detail(
     conn: AsyncConnection,
+    redis: Redis,
     region: Region,
     quest_id: int,
     phase: int,
     questSelect: int | None = None,
+    live_lookup: bool = True,
 ) -> Optional[QuestDetail]:
+    """Without `live_lookup`, only the quest details already in the db are used"""
     db_quest_detail = await get_rayshift_quest_db(conn, quest_id, phase, questSelect)
-    if db_quest_detail:
+    if db_quest_detail or not live_lookup:
         return db_quest_detail
-    else:
-        quest_response = await get_quest_response(region, quest_id, phase)
-        if quest_response and quest_response.questDetails:
-            await insert_rayshift_quest_db(conn, quest_response.questDetails)
-            quest_detail = next(iter(quest_response.questDetails.values()))
-            if (
-                questSelect is not None and quest_detail.questSelect != questSelect
-            ):  # pragma: no cover
-                return None
-            return quest_detail
 
-        return None
+    # Concurrent requests for the same quest phase share one live lookup
+    call_key = (region, quest_id, phase)
+    if call_key not in quest_response_calls:
+        call = asyncio.create_task(load_quest_response(redis, region, quest_id, phase))
+        call.add_done_callback(lambda _: quest_response_calls.pop(call_key, None))
+        quest_response_calls[call_key] = call
+
+    if await asyncio.shield(quest_response_calls[call_key]):
+        return await get_rayshift_quest_db(conn, quest_id, phase, questSelect)
+
+    return None
 
 
 def get_multiple_quests(
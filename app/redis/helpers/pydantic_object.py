@@ -1,5 +1,5 @@
 from itertools import chain
-from typing import Optional, Type, TypeVar
+from typing import Optional, Sequence, Type, TypeVar
 
 from redis.asyncio import Redis  # type: ignore
 
@@ -49,6 +49,23 @@ async def fetch_id(
     return None
 
 
+async def fetch_ids(
+    redis: Redis, region: Region, schema: Type[RedisPydantic], item_ids: Sequence[int]
+) -> dict[int, RedisPydantic]:
+    """Fetch multiple items with one HMGET. Items not in redis are skipped."""
+    if not item_ids:
+        return {}
+    redis_table = pydantic_obj_redis_table[schema][0]
+    redis_key = f"{settings.redis_prefix}:data:{region.name}:{redis_table}"
+    items_redis = await redis.hmget(redis_key, item_ids)
+
+    return {
+        item_id: schema.parse_raw(item_redis)
+        for item_id, item_redis in zip(item_ids, items_redis)
+        if item_redis
+    }
+
+
 async def fetch_mstSvtLimit(
     redis: Redis,
     region: Region,
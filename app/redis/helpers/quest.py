@@ -4,7 +4,7 @@ from redis.asyncio import Redis  # type: ignore
 
 from ...config import Settings
 from ...schemas.base import BaseModelORJson
-from ...schemas.common import Language, Region
+from ...schemas.common import Region
 from ...schemas.nice import EnemyDrop, NiceStage
 
 
@@ -16,15 +16,24 @@ class RayshiftRedisData(BaseModelORJson):
     stages: list[NiceStage]
 
 
+def get_stages_cache_key(
+    region: Region, quest_id: int, phase: int, questSelect: int | None = None
+) -> str:
+    """
+    The stages are cached in Language.jp for all languages. The translations are
+    overlaid after reading the cache.
+    """
+    return f"{settings.redis_prefix}:cache:stages:{region.value}:{quest_id}:{phase}:{questSelect}"
+
+
 async def get_stages_cache(
     redis: Redis,
     region: Region,
     quest_id: int,
     phase: int,
     questSelect: int | None = None,
-    lang: Language = Language.jp,
 ) -> Optional[RayshiftRedisData]:
-    redis_key = f"{settings.redis_prefix}:cache:stages:{region.value}:{lang.value}:{quest_id}:{phase}:{questSelect}"
+    redis_key = get_stages_cache_key(region, quest_id, phase, questSelect)
     redis_data = await redis.get(redis_key)
 
     if redis_data:
@@ -40,12 +49,89 @@ async def set_stages_cache(
     quest_id: int,
     phase: int,
     questSelect: int | None = None,
-    lang: Language = Language.jp,
     long_ttl: bool = False,
 ) -> None:
-    redis_key = f"{settings.redis_prefix}:cache:stages:{region.value}:{lang.value}:{quest_id}:{phase}:{questSelect}"
+    redis_key = get_stages_cache_key(region, quest_id, phase, questSelect)
     json_str = data.json(exclude_unset=True, exclude_none=True)
     if long_ttl:
         await redis.set(redis_key, json_str)
     else:
         await redis.set(redis_key, json_str, ex=settings.quest_cache_length)
+
+
+RAYSHIFT_CALL_LOADING = b"loading"
+RAYSHIFT_CALL_MISS = b"miss"
+# Longer than the Rayshift client timeout so the claim outlives the call
+RAYSHIFT_CALL_TIMEOUT = 60
+
+
+def get_rayshift_call_key(region: Region, quest_id: int, phase: int) -> str:
+    return f"{settings.redis_prefix}:rayshift_call:{region.value}:{quest_id}:{phase}"
+
+
+async def claim_rayshift_call(
+    redis: Redis, region: Region, quest_id: int, phase: int
+) -> bool:
+    """
+    Return True if this worker can call Rayshift for the quest phase.
+    The claim expires after RAYSHIFT_CALL_TIMEOUT seconds if the worker dies mid-call.
+    """
+    claimed = await redis.set(
+        get_rayshift_call_key(region, quest_id, phase),
+        RAYSHIFT_CALL_LOADING,
+        nx=True,
+        ex=RAYSHIFT_CALL_TIMEOUT,
+    )
+    return bool(claimed)
+
+
+async def get_rayshift_call_state(
+    redis: Redis, region: Region, quest_id: int, phase: int
+) -> Optional[bytes]:
+    """Return RAYSHIFT_CALL_LOADING, RAYSHIFT_CALL_MISS or None if there's no claim"""
+    state: Optional[bytes] = await redis.get(
+        get_rayshift_call_key(region, quest_id, phase)
+    )
+    return state
+
+
+async def set_rayshift_call_miss(
+    redis: Redis, region: Region, quest_id: int, phase: int, expire: int
+) -> None:
+    """Don't call Rayshift for the quest phase again for `expire` seconds"""
+    await redis.set(
+        get_rayshift_call_key(region, quest_id, phase), RAYSHIFT_CALL_MISS, ex=expire
+    )
+
+
+async def release_rayshift_call(
+    redis: Redis, region: Region, quest_id: int, phase: int
+) -> None:
+    await redis.delete(get_rayshift_call_key(region, quest_id, phase))
+
+
+def get_quest_prefetch_key(region: Region) -> str:
+    return f"{settings.redis_prefix}:quest_prefetch:{region.value}"
+
+
+async def claim_quest_prefetch(redis: Redis, region: Region, token: str) -> bool:
+    """
+    Return True if the worker with `token` should prefetch the quest phases of the region.
+    The claim lasts `quest_prefetch_interval` seconds and is renewed during the run.
+    """
+    claimed = await redis.set(
+        get_quest_prefetch_key(region),
+        token,
+        nx=True,
+        ex=settings.quest_prefetch_interval,
+    )
+    return bool(claimed)
+
+
+async def renew_quest_prefetch(redis: Redis, region: Region, token: str) -> bool:
+    """Extend the claim of the worker with `token`. Return False if it lost the claim."""
+    redis_key = get_quest_prefetch_key(region)
+    if await redis.get(redis_key) != token.encode("utf-8"):
+        return False
+    await redis.expire(redis_key, settings.quest_prefetch_interval)
+    return True
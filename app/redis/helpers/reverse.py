@@ -1,10 +1,13 @@
 from enum import Enum
+from typing import Optional, Sequence
 
 import orjson
 from redis.asyncio import Redis  # type: ignore
 
 from ...config import Settings
+from ...data.reverse_index import ReverseIndex, get_reverse_index
 from ...schemas.common import Region
+from .repo_version import get_repo_version
 
 
 settings = Settings()
@@ -21,10 +24,33 @@ class RedisReverse(str, Enum):
     SKILL_TO_CC = "skill_to_cc"
 
 
+def get_reverse_redis_key(region: Region, reverse_type: RedisReverse) -> str:
+    return f"{settings.redis_prefix}:data:{region.name}:{reverse_type.name}"
+
+
+async def get_current_reverse_index(
+    redis: Redis, region: Region
+) -> Optional[ReverseIndex]:
+    """
+    The index file is only used if it was built from the gamedata version in redis.
+    Otherwise the redis reverse data was reloaded without it and it's stale.
+    """
+    reverse_index = get_reverse_index(region)
+    if reverse_index is None:
+        return None
+    repo_version = await get_repo_version(redis, region)
+    version = repo_version.hash if repo_version else None
+    return reverse_index if reverse_index.version == version else None
+
+
 async def get_reverse_ids(
     redis: Redis, region: Region, reverse_type: RedisReverse, item_id: int
 ) -> list[int]:
-    redis_key = f"{settings.redis_prefix}:data:{region.name}:{reverse_type.name}"
+    reverse_index = await get_current_reverse_index(redis, region)
+    if reverse_index is not None:
+        return reverse_index.get(reverse_type.name, item_id)
+
+    redis_key = get_reverse_redis_key(region, reverse_type)
     item_redis = await redis.hget(redis_key, item_id)
 
     if item_redis:
@@ -32,3 +58,41 @@ async def get_reverse_ids(
         return id_list
 
     return []
+
+
+async def get_reverse_ids_many(
+    redis: Redis,
+    region: Region,
+    lookups: Sequence[tuple[RedisReverse, Sequence[int]]],
+) -> list[dict[int, list[int]]]:
+    """
+    Look up the reverse IDs of the items of all lookups in the in-process reverse
+    index or in one redis pipeline if the index file isn't there or is stale.
+    Return item ID -> reverse IDs for each lookup.
+    """
+    reverse_index = await get_current_reverse_index(redis, region)
+    if reverse_index is not None:
+        return [
+            {
+                item_id: reverse_index.get(reverse_type.name, item_id)
+                for item_id in item_ids
+            }
+            for reverse_type, item_ids in lookups
+        ]
+
+    async with redis.pipeline(transaction=False) as pipe:
+        for reverse_type, item_ids in lookups:
+            if item_ids:
+                pipe.hmget(get_reverse_redis_key(region, reverse_type), item_ids)
+        results = iter(await pipe.execute())
+
+    reverse_ids: list[dict[int, list[int]]] = []
+    for _, item_ids in lookups:
+        items_redis = next(results) if item_ids else []
+        reverse_ids.append(
+            {
+                item_id: orjson.loads(item_redis) if item_redis else []
+                for item_id, item_redis in zip(item_ids, items_redis)
+            }
+        )
+    return reverse_ids
@@ -18,6 +18,8 @@ from ..data.reverse import (
     get_skill_to_MC,
     get_td_to_svt,
 )
+from ..data.reverse_index import write_reverse_index
+from ..data.utils import get_repo_info
 from ..schemas.common import Region
 from ..schemas.raw import MstSvtExtra
 from .helpers.pydantic_object import pydantic_obj_redis_table
@@ -106,12 +108,18 @@ async def load_reverse_data(
     redis: Redis, region_path: dict[Region, DirectoryPath], redis_prefix: str
 ) -> None:
     for region, gamedata_path in region_path.items():
+        region_reverse_data: dict[str, dict[int, list[int]]] = {}
         for data in reverse_data_detail:
             reverse_data = data.dataFunc(gamedata_path)
+            region_reverse_data[data.key.name] = reverse_data
             redis_data = {str(k): orjson.dumps(v) for k, v in reverse_data.items()}
             redis_key = f"{redis_prefix}:{region.name}:{data.key.name}"
             await redis.delete(redis_key)
             await redis.hset(redis_key, mapping=redis_data)
+        repo_info = get_repo_info(gamedata_path)
+        write_reverse_index(
+            region, region_reverse_data, repo_info.hash if repo_info else None
+        )
 
 
 async def load_redis_data(
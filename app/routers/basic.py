@@ -62,7 +62,7 @@ async def find_servant(
     redis: Redis = Depends(get_redis),
 ) -> Response:
     async with get_db(search_param.region) as conn:
-        matches = await search.search_servant(conn, search_param, limit=10000)
+        matches = await search.search_servant(conn, redis, search_param, limit=10000)
         return list_response(
             [
                 await basic.get_basic_servant(
@@ -130,7 +130,7 @@ async def find_equip(
     redis: Redis = Depends(get_redis),
 ) -> Response:
     async with get_db(search_param.region) as conn:
-        matches = await search.search_equip(conn, search_param, limit=10000)
+        matches = await search.search_equip(conn, redis, search_param, limit=10000)
         return list_response(
             [
                 await basic.get_basic_equip(
@@ -195,7 +195,7 @@ async def find_svt(
     redis: Redis = Depends(get_redis),
 ) -> Response:
     async with get_db(search_param.region) as conn:
-        matches = await search.search_servant(conn, search_param, limit=10000)
+        matches = await search.search_servant(conn, redis, search_param, limit=10000)
         return list_response(
             [
                 await basic.get_basic_servant(
@@ -526,7 +526,7 @@ async def find_buff(
     response_description="Buff Entity",
     response_model=BasicBuffReverse,
     response_model_exclude_unset=True,
-    responses=get_error_code([404]),
+    responses=get_error_code([403, 404]),
 )
 @cache()  # type: ignore
 async def get_buff(
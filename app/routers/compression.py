@@ -0,0 +1,306 @@
+import os
+import stat
+import zlib
+from dataclasses import dataclass
+from mimetypes import guess_type
+from pathlib import Path
+from typing import Any, Callable, Optional, Protocol
+
+import anyio
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..export.writer import atomic_write_bytes
+
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+# Bodies bigger than this are compressed in the threadpool instead of the event loop
+THREADPOOL_COMPRESS_SIZE = 512 * 1024
+
+
+class StreamCompressor(Protocol):
+    def compress(self, data: bytes) -> bytes:
+        ...
+
+    def sync_flush(self) -> bytes:
+        """Output all the data compressed so far without ending the stream"""
+        ...
+
+    def flush(self) -> bytes:
+        ...
+
+
+class BrotliCompressor:
+    def __init__(self, level: int) -> None:
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.process(data)  # type: ignore
+
+    def sync_flush(self) -> bytes:
+        return self.compressor.flush()  # type: ignore
+
+    def flush(self) -> bytes:
+        return self.compressor.finish()  # type: ignore
+
+
+class GzipCompressor:
+    def __init__(self, level: int) -> None:
+        # wbits = 16 + MAX_WBITS writes the gzip header and trailer
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data)
+
+    def sync_flush(self) -> bytes:
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def flush(self) -> bytes:
+        return self.compressor.flush()
+
+
+class ZstdCompressor:
+    def __init__(self, level: int) -> None:
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data)  # type: ignore
+
+    def sync_flush(self) -> bytes:
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)  # type: ignore
+
+    def flush(self) -> bytes:
+        return self.compressor.flush()  # type: ignore
+
+
+@dataclass
+class Encoding:
+    name: str
+    suffix: str
+    fast_level: int
+    export_level: int
+    get_compressor: Callable[[int], StreamCompressor]
+
+    def compress(self, data: bytes, level: int) -> bytes:
+        compressor = self.get_compressor(level)
+        return compressor.compress(data) + compressor.flush()
+
+
+# Ordered by preference when the client accepts multiple encodings with the same weight
+ENCODINGS: list[Encoding] = []
+if brotli is not None:
+    ENCODINGS.append(Encoding("br", ".br", 4, 11, BrotliCompressor))
+if zstandard is not None:
+    ENCODINGS.append(Encoding("zstd", ".zst", 3, 19, ZstdCompressor))
+ENCODINGS.append(Encoding("gzip", ".gz", 5, 9, GzipCompressor))
+
+COMPRESSED_SUFFIXES = {encoding.suffix for encoding in ENCODINGS}
+
+
+def get_accepted_encodings(accept_encoding: str) -> list[Encoding]:
+    """
+    Parse the Accept-Encoding header and return the supported encodings
+    ordered by client weight and then by server preference
+    """
+    weights: dict[str, float] = {}
+    for coding in accept_encoding.lower().split(","):
+        name, _, params = coding.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip()] = weight
+
+    wildcard = weights.get("*", 0.0)
+    accepted = [
+        (weights.get(encoding.name, wildcard), index, encoding)
+        for index, encoding in enumerate(ENCODINGS)
+    ]
+    return [
+        encoding
+        for weight, _, encoding in sorted(accepted, key=lambda x: (-x[0], x[1]))
+        if weight > 0
+    ]
+
+
+def write_precompressed_files(file_path: Path) -> None:
+    """
+    Write the .br, .zst and .gz siblings of the given file at high compression levels.
+    Siblings that are newer than the source file are not rewritten.
+    """
+    source_mtime = file_path.stat().st_mtime
+    data: Optional[bytes] = None
+    for encoding in ENCODINGS:
+        compressed_path = file_path.with_name(file_path.name + encoding.suffix)
+        if compressed_path.exists() and compressed_path.stat().st_mtime >= source_mtime:
+            continue
+        if data is None:
+            data = file_path.read_bytes()
+        atomic_write_bytes(
+            compressed_path, encoding.compress(data, encoding.export_level)
+        )
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves the precompressed sibling of the requested file
+    if the client accepts its encoding
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] in ("GET", "HEAD") and not path.endswith(
+            tuple(COMPRESSED_SUFFIXES)
+        ):
+            request_headers = Headers(scope=scope)
+            accepted = get_accepted_encodings(
+                request_headers.get("Accept-Encoding", "")
+            )
+            source_stat: Optional[os.stat_result] = None
+            if accepted:
+                _, source_stat = await anyio.to_thread.run_sync(self.lookup_path, path)
+            for encoding in accepted:
+                full_path, stat_result = await anyio.to_thread.run_sync(
+                    self.lookup_path, path + encoding.suffix
+                )
+                # The exports replace the source file before they update the siblings.
+                # Siblings older than the source are stale.
+                if (
+                    stat_result
+                    and stat.S_ISREG(stat_result.st_mode)
+                    and (
+                        source_stat is None
+                        or stat_result.st_mtime >= source_stat.st_mtime
+                    )
+                ):
+                    response = FileResponse(
+                        full_path,
+                        stat_result=stat_result,
+                        method=scope["method"],
+                        media_type=guess_type(os.path.basename(path))[0],
+                        headers={
+                            "Content-Encoding": encoding.name,
+                            "Vary": "Accept-Encoding",
+                        },
+                    )
+                    if self.is_not_modified(response.headers, request_headers):
+                        return NotModifiedResponse(response.headers)
+                    return response
+
+        return await super().get_response(path, scope)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses bigger than minimum_size with the best encoding accepted by the client.
+    Uses the fast compression levels and moves big bodies off the event loop.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            accepted = get_accepted_encodings(
+                Headers(scope=scope).get("Accept-Encoding", "")
+            )
+            if accepted:
+                responder = CompressionResponder(
+                    self.app, accepted[0], self.minimum_size
+                )
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class CompressionResponder:
+    def __init__(self, app: ASGIApp, encoding: Encoding, minimum_size: int) -> None:
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Send = unattached_send
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+        self.compressor: Optional[StreamCompressor] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    async def send_with_compression(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # Don't send the initial message until we've determined how to
+            # modify the outgoing headers correctly.
+            self.initial_message = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = "content-encoding" in headers
+        elif message_type == "http.response.body" and self.passthrough:
+            if not self.started:
+                self.started = True
+                await self.send(self.initial_message)
+            await self.send(message)
+        elif message_type == "http.response.body" and not self.started:
+            self.started = True
+            body: bytes = message.get("body", b"")
+            more_body: bool = message.get("more_body", False)
+            if len(body) < self.minimum_size and not more_body:
+                await self.send(self.initial_message)
+                await self.send(message)
+            elif not more_body:
+                if len(body) > THREADPOOL_COMPRESS_SIZE:
+                    body = await run_in_threadpool(
+                        self.encoding.compress, body, self.encoding.fast_level
+                    )
+                else:
+                    body = self.encoding.compress(body, self.encoding.fast_level)
+                headers = MutableHeaders(raw=self.initial_message["headers"])
+                headers["Content-Encoding"] = self.encoding.name
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+                message["body"] = body
+                await self.send(self.initial_message)
+                await self.send(message)
+            else:
+                # Streaming response: compress and flush every chunk as it comes in
+                # so the client gets each chunk without waiting for the next ones
+                headers = MutableHeaders(raw=self.initial_message["headers"])
+                headers["Content-Encoding"] = self.encoding.name
+                headers.add_vary_header("Accept-Encoding")
+                del headers["Content-Length"]
+                self.compressor = self.encoding.get_compressor(self.encoding.fast_level)
+                message["body"] = (
+                    self.compressor.compress(body) + self.compressor.sync_flush()
+                )
+                await self.send(self.initial_message)
+                await self.send(message)
+        elif message_type == "http.response.body" and self.compressor is not None:
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            message["body"] = self.compressor.compress(body) + (
+                self.compressor.sync_flush() if more_body else self.compressor.flush()
+            )
+            await self.send(message)
+        else:
+            await self.send(message)
+
+
+async def unattached_send(message: Message) -> Any:  # pragma: no cover
+    raise RuntimeError("send awaitable not set")
@@ -1,12 +1,13 @@
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator, Optional
+from typing import AsyncGenerator, Awaitable, Callable, Optional, Type
 
-from fastapi import HTTPException, Request
+from fastapi import HTTPException, Query, Request
+from pydantic import BaseModel
 from redis.asyncio import Redis  # type: ignore
 from sqlalchemy.ext.asyncio import AsyncConnection
 
 from ..db.engine import async_engines
-from ..schemas.common import Language, Region
+from ..schemas.common import FieldProjection, Language, Region
 
 
 async def language_parameter(lang: Optional[Language] = None) -> Language:
@@ -17,6 +18,35 @@ async def language_parameter(lang: Optional[Language] = None) -> Language:
         return Language.jp
 
 
+def get_projection_parameter(
+    model: Type[BaseModel],
+) -> Callable[[list[str], list[str]], Awaitable[FieldProjection]]:
+    """Dependency for the fields and exclude parameters of the given nice model"""
+    model_fields = set(model.__fields__)
+
+    def split_fields(input_fields: list[str]) -> tuple[str, ...]:
+        fields = {
+            field.strip()
+            for input_field in input_fields
+            for field in input_field.split(",")
+            if field.strip()
+        }
+        unknown_fields = fields - model_fields
+        if unknown_fields:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(sorted(unknown_fields))}",
+            )
+        return tuple(sorted(fields))
+
+    async def projection_parameter(
+        fields: list[str] = Query([]), exclude: list[str] = Query([])
+    ) -> FieldProjection:
+        return FieldProjection(split_fields(fields), split_fields(exclude))
+
+    return projection_parameter
+
+
 @asynccontextmanager
 async def get_db(region: Region) -> AsyncGenerator[AsyncConnection, None]:
     if region not in async_engines:  # pragma: no cover
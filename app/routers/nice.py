@@ -1,3 +1,5 @@
+from typing import AsyncIterator, Union
+
 from fastapi import APIRouter, Depends, Response
 from fastapi_cache.decorator import cache
 from fastapi_limiter.depends import RateLimiter  # type: ignore
@@ -7,10 +9,21 @@ from ..config import Settings
 from ..core import search
 from ..core.nice import ai, bgm, cc, item, mc, mm, nice, quest, script, war
 from ..core.nice.event.event import get_nice_event
+from ..core.nice.normalized import (
+    get_normalized_quest_phase,
+    get_normalized_servant,
+    get_normalized_servant_list,
+)
 from ..core.nice.script import get_nice_script_search_result
 from ..db.helpers.cc import get_cc_id
 from ..db.helpers.svt import get_ce_id, get_svt_id
-from ..schemas.common import Language, Region, ReverseData, ReverseDepth
+from ..schemas.common import (
+    FieldProjection,
+    Language,
+    Region,
+    ReverseData,
+    ReverseDepth,
+)
 from ..schemas.enums import AiType
 from ..schemas.nice import (
     NiceAiCollection,
@@ -23,6 +36,8 @@ from ..schemas.nice import (
     NiceItem,
     NiceMasterMission,
     NiceMysticCode,
+    NiceNormalizedServantListResponse,
+    NiceNormalizedServantResponse,
     NiceQuest,
     NiceQuestPhase,
     NiceScript,
@@ -43,8 +58,21 @@ from ..schemas.search import (
     SvtSearchQueryParams,
     TdSearchParams,
 )
-from .deps import get_db, get_db_transaction, get_redis, language_parameter
-from .utils import get_error_code, item_response, list_response
+from .deps import (
+    get_db,
+    get_db_transaction,
+    get_projection_parameter,
+    get_redis,
+    language_parameter,
+)
+from .utils import (
+    ListStreamingResponse,
+    cache_stream,
+    dict_response,
+    get_error_code,
+    item_response,
+    list_response,
+)
 
 
 settings = Settings()
@@ -60,32 +88,59 @@ svt_lang_lore_description = """
 - **lore**: Add profile info to the response
 """
 
+projection_description = """
+- **fields**: only return these top level fields. Comma separated or repeated. Sections not asked for are not built.
+- **exclude**: don't return these top level fields. Comma separated or repeated.
+"""
+
+normalized_description = """
+- **normalized**: functions and buffs are returned once in the top level `functions` and `buffs` tables.
+Skills and NPs reference them with the table keys.
+"""
+
 
 @router.get(
     "/{region}/servant/search",
     summary="Find and get servant data",
-    description=ServantSearchQueryParams.DESCRIPTION + svt_lang_lore_description,
+    description=ServantSearchQueryParams.DESCRIPTION
+    + svt_lang_lore_description
+    + projection_description
+    + normalized_description,
     response_description="Servant Entity",
-    response_model=list[NiceServant],
+    response_model=Union[list[NiceServant], NiceNormalizedServantListResponse],
     response_model_exclude_unset=True,
     responses=get_error_code([400, 403, 500]),
 )
-@cache()  # type: ignore
+@cache_stream()
 async def find_servant(
     search_param: ServantSearchQueryParams = Depends(ServantSearchQueryParams),
     lang: Language = Depends(language_parameter),
     lore: bool = False,
+    projection: FieldProjection = Depends(get_projection_parameter(NiceServant)),
+    normalized: bool = False,
+    redis: Redis = Depends(get_redis),
 ) -> Response:
     async with get_db(search_param.region) as conn:
-        matches = await search.search_servant(conn, search_param)
-        return list_response(
-            [
-                await nice.get_nice_servant_model(
-                    conn, search_param.region, mstSvt.id, lang, lore, mstSvt
+        matches = await search.search_servant(conn, redis, search_param)
+
+    async def get_servants() -> AsyncIterator[NiceServant]:
+        async with get_db(search_param.region) as conn:
+            for mstSvt in matches:
+                yield await nice.get_nice_servant_model(
+                    conn,
+                    search_param.region,
+                    mstSvt.id,
+                    lang,
+                    lore,
+                    mstSvt,
+                    projection=projection,
                 )
-                for mstSvt in matches
-            ]
-        )
+
+    if normalized:
+        servants = [servant async for servant in get_servants()]
+        return dict_response(get_normalized_servant_list(servants))
+
+    return ListStreamingResponse(get_servants(), len(matches))
 
 
 get_servant_description = """Get servant info from ID
@@ -101,7 +156,9 @@ Preprocessed data:
 - [JP servant](/export/JP/nice_servant.json), [JP Servant with lore](/export/JP/nice_servant_lore.json)
 """
 
-get_servant_description += svt_lang_lore_description
+get_servant_description += (
+    svt_lang_lore_description + projection_description + normalized_description
+)
 
 if settings.documentation_all_nice:
     get_servant_description += pre_processed_data_links
@@ -112,7 +169,7 @@ if settings.documentation_all_nice:
     summary="Get servant data",
     description=get_servant_description,
     response_description="Servant Entity",
-    response_model=NiceServant,
+    response_model=Union[NiceServant, NiceNormalizedServantResponse],
     response_model_exclude_unset=True,
     responses=get_error_code([404, 500]),
 )
@@ -122,12 +179,17 @@ async def get_servant(
     servant_id: int,
     lang: Language = Depends(language_parameter),
     lore: bool = False,
+    projection: FieldProjection = Depends(get_projection_parameter(NiceServant)),
+    normalized: bool = False,
 ) -> Response:
     async with get_db(region) as conn:
         servant_id = await get_svt_id(conn, servant_id)
-        return item_response(
-            await nice.get_nice_servant_model(conn, region, servant_id, lang, lore)
+        servant = await nice.get_nice_servant_model(
+            conn, region, servant_id, lang, lore, projection=projection
         )
+        if normalized:
+            return dict_response(get_normalized_servant(servant))
+        return item_response(servant)
 
 
 equip_lore_description = """
@@ -138,28 +200,39 @@ equip_lore_description = """
 @router.get(
     "/{region}/equip/search",
     summary="Find and get CE data",
-    description=EquipSearchQueryParams.DESCRIPTION + equip_lore_description,
+    description=EquipSearchQueryParams.DESCRIPTION
+    + equip_lore_description
+    + projection_description,
     response_description="Equip Entity",
     response_model=list[NiceEquip],
     response_model_exclude_unset=True,
     responses=get_error_code([400, 403, 500]),
 )
-@cache()  # type: ignore
+@cache_stream()
 async def find_equip(
     search_param: EquipSearchQueryParams = Depends(EquipSearchQueryParams),
     lang: Language = Depends(language_parameter),
     lore: bool = False,
+    projection: FieldProjection = Depends(get_projection_parameter(NiceEquip)),
+    redis: Redis = Depends(get_redis),
 ) -> Response:
     async with get_db(search_param.region) as conn:
-        matches = await search.search_equip(conn, search_param)
-        return list_response(
-            [
-                await nice.get_nice_equip_model(
-                    conn, search_param.region, mstSvt.id, lang, lore, mstSvt
+        matches = await search.search_equip(conn, redis, search_param)
+
+    async def get_equips() -> AsyncIterator[NiceEquip]:
+        async with get_db(search_param.region) as conn:
+            for mstSvt in matches:
+                yield await nice.get_nice_equip_model(
+                    conn,
+                    search_param.region,
+                    mstSvt.id,
+                    lang,
+                    lore,
+                    mstSvt,
+                    projection=projection,
                 )
-                for mstSvt in matches
-            ]
-        )
+
+    return ListStreamingResponse(get_equips(), len(matches))
 
 
 get_equip_description = """Get CE info from ID
@@ -175,7 +248,7 @@ Preprocessed data:
 - [JP CE](/export/JP/nice_equip.json), [JP CE with lore](/export/JP/nice_equip_lore.json)
 """
 
-get_equip_description += equip_lore_description
+get_equip_description += equip_lore_description + projection_description
 
 if settings.documentation_all_nice:
     get_equip_description += pre_processed_equip_links
@@ -196,46 +269,66 @@ async def get_equip(
     equip_id: int,
     lang: Language = Depends(language_parameter),
     lore: bool = False,
+    projection: FieldProjection = Depends(get_projection_parameter(NiceEquip)),
 ) -> Response:
     async with get_db(region) as conn:
         equip_id = await get_ce_id(conn, equip_id)
         return item_response(
-            await nice.get_nice_equip_model(conn, region, equip_id, lang, lore)
+            await nice.get_nice_equip_model(
+                conn, region, equip_id, lang, lore, projection=projection
+            )
         )
 
 
 @router.get(
     "/{region}/svt/search",
     summary="Find and get servant data",
-    description=SvtSearchQueryParams.DESCRIPTION + svt_lang_lore_description,
+    description=SvtSearchQueryParams.DESCRIPTION
+    + svt_lang_lore_description
+    + projection_description
+    + normalized_description,
     response_description="Nice Servant Entities",
-    response_model=list[NiceServant],
+    response_model=Union[list[NiceServant], NiceNormalizedServantListResponse],
     response_model_exclude_unset=True,
     responses=get_error_code([400, 403, 500]),
 )
-@cache()  # type: ignore
+@cache_stream()
 async def find_svt(
     search_param: SvtSearchQueryParams = Depends(SvtSearchQueryParams),
     lang: Language = Depends(language_parameter),
     lore: bool = False,
+    projection: FieldProjection = Depends(get_projection_parameter(NiceServant)),
+    normalized: bool = False,
+    redis: Redis = Depends(get_redis),
 ) -> Response:
     async with get_db(search_param.region) as conn:
-        matches = await search.search_servant(conn, search_param)
-        return list_response(
-            [
-                await nice.get_nice_servant_model(
-                    conn, search_param.region, mstSvt.id, lang, lore, mstSvt
+        matches = await search.search_servant(conn, redis, search_param)
+
+    async def get_svts() -> AsyncIterator[NiceServant]:
+        async with get_db(search_param.region) as conn:
+            for mstSvt in matches:
+                yield await nice.get_nice_servant_model(
+                    conn,
+                    search_param.region,
+                    mstSvt.id,
+                    lang,
+                    lore,
+                    mstSvt,
+                    projection=projection,
                 )
-                for mstSvt in matches
-            ]
-        )
+
+    if normalized:
+        servants = [servant async for servant in get_svts()]
+        return dict_response(get_normalized_servant_list(servants))
+
+    return ListStreamingResponse(get_svts(), len(matches))
 
 
 @router.get(
     "/{region}/svt/{svt_id}",
     summary="Get svt data",
     response_description="Servant Entity",
-    response_model=NiceServant,
+    response_model=Union[NiceServant, NiceNormalizedServantResponse],
     response_model_exclude_unset=True,
     responses=get_error_code([404, 500]),
 )
@@ -245,17 +338,27 @@ async def get_svt(
     svt_id: int,
     lang: Language = Depends(language_parameter),
     lore: bool = False,
+    projection: FieldProjection = Depends(get_projection_parameter(NiceServant)),
+    normalized: bool = False,
 ) -> Response:
     """
     Get svt info from ID
 
     Only use actual IDs for lookup. Does not convert from collectionNo.
     The endpoint is not limited to servants or equips ids.
+
+    - **fields**: only return these top level fields. Comma separated or repeated.
+    - **exclude**: don't return these top level fields. Comma separated or repeated.
+    - **normalized**: functions and buffs are returned once in the top level
+    `functions` and `buffs` tables. Skills and NPs reference them with the table keys.
     """
     async with get_db(region) as conn:
-        return item_response(
-            await nice.get_nice_servant_model(conn, region, svt_id, lang, lore)
+        svt = await nice.get_nice_servant_model(
+            conn, region, svt_id, lang, lore, projection=projection
         )
+        if normalized:
+            return dict_response(get_normalized_servant(svt))
+        return item_response(svt)
 
 
 get_mc_description = "Get nice Mystic Code info from ID"
@@ -339,7 +442,7 @@ and return the reverse skill objects.
     response_model_exclude_unset=True,
     responses=get_error_code([400, 403]),
 )
-@cache()  # type: ignore
+@cache_stream()
 async def find_skill(
     search_param: SkillSearchParams = Depends(SkillSearchParams),
     lang: Language = Depends(language_parameter),
@@ -349,9 +452,25 @@ async def find_skill(
 ) -> Response:
     async with get_db(search_param.region) as conn:
         matches = await search.search_skill(conn, search_param)
-        return list_response(
-            [
-                await nice.get_nice_skill_with_reverse(
+        # One reverse lookup for all the skills, before the response starts
+        reverse_entities = (
+            await nice.get_reverse_entities(
+                conn,
+                redis,
+                search_param.region,
+                lang,
+                ReverseDepth.servant,
+                reverseData,
+                skill_ids=[mstSkill.id for mstSkill in matches],
+            )
+            if reverse
+            else None
+        )
+
+    async def get_skills() -> AsyncIterator[NiceSkillReverse]:
+        async with get_db(search_param.region) as conn:
+            for mstSkill in matches:
+                yield await nice.get_nice_skill_with_reverse(
                     conn,
                     redis,
                     search_param.region,
@@ -359,10 +478,10 @@ async def find_skill(
                     lang,
                     reverse,
                     reverseData=reverseData,
+                    reverse_entities=reverse_entities,
                 )
-                for mstSkill in matches
-            ]
-        )
+
+    return ListStreamingResponse(get_skills(), len(matches))
 
 
 @router.get(
@@ -372,7 +491,7 @@ async def find_skill(
     response_description="Nice Skill entity",
     response_model=NiceSkillReverse,
     response_model_exclude_unset=True,
-    responses=get_error_code([404, 500]),
+    responses=get_error_code([403, 404, 500]),
 )
 @cache()  # type: ignore
 async def get_skill(
@@ -408,7 +527,7 @@ and return the reversed servant objects.
     response_model_exclude_unset=True,
     responses=get_error_code([400, 403]),
 )
-@cache()  # type: ignore
+@cache_stream()
 async def find_td(
     search_param: TdSearchParams = Depends(TdSearchParams),
     lang: Language = Depends(language_parameter),
@@ -418,9 +537,24 @@ async def find_td(
 ) -> Response:
     async with get_db(search_param.region) as conn:
         matches = await search.search_td(conn, search_param)
-        return list_response(
-            [
-                await nice.get_nice_td_with_reverse(
+        reverse_entities = (
+            await nice.get_reverse_entities(
+                conn,
+                redis,
+                search_param.region,
+                lang,
+                ReverseDepth.servant,
+                reverseData,
+                td_ids=[td.id for td in matches],
+            )
+            if reverse
+            else None
+        )
+
+    async def get_tds() -> AsyncIterator[NiceTdReverse]:
+        async with get_db(search_param.region) as conn:
+            for td in matches:
+                yield await nice.get_nice_td_with_reverse(
                     conn,
                     redis,
                     search_param.region,
@@ -428,10 +562,10 @@ async def find_td(
                     lang,
                     reverse,
                     reverseData=reverseData,
+                    reverse_entities=reverse_entities,
                 )
-                for td in matches
-            ]
-        )
+
+    return ListStreamingResponse(get_tds(), len(matches))
 
 
 @router.get(
@@ -441,7 +575,7 @@ async def find_td(
     response_description="Nice NP entity",
     response_model=NiceTdReverse,
     response_model_exclude_unset=True,
-    responses=get_error_code([404, 500]),
+    responses=get_error_code([403, 404, 500]),
 )
 @cache()  # type: ignore
 async def get_td(
@@ -478,7 +612,7 @@ and return the reversed skill objects.
     response_model_exclude_unset=True,
     responses=get_error_code([400, 403, 500]),
 )
-@cache()  # type: ignore
+@cache_stream()
 async def find_function(
     search_param: FuncSearchQueryParams = Depends(FuncSearchQueryParams),
     lang: Language = Depends(language_parameter),
@@ -489,9 +623,24 @@ async def find_function(
 ) -> Response:
     async with get_db(search_param.region) as conn:
         matches = await search.search_func(conn, search_param)
-        return list_response(
-            [
-                await nice.get_nice_func_with_reverse(
+        reverse_entities = (
+            await nice.get_reverse_entities(
+                conn,
+                redis,
+                search_param.region,
+                lang,
+                reverseDepth,
+                reverseData,
+                func_ids=[mstFunc.id for mstFunc in matches],
+            )
+            if reverse
+            else None
+        )
+
+    async def get_functions() -> AsyncIterator[NiceBaseFunctionReverse]:
+        async with get_db(search_param.region) as conn:
+            for mstFunc in matches:
+                yield await nice.get_nice_func_with_reverse(
                     conn,
                     redis,
                     search_param.region,
@@ -501,10 +650,10 @@ async def find_function(
                     reverseDepth,
                     reverseData,
                     mstFunc,
+                    reverse_entities,
                 )
-                for mstFunc in matches
-            ]
-        )
+
+    return ListStreamingResponse(get_functions(), len(matches))
 
 
 @router.get(
@@ -515,7 +664,7 @@ async def find_function(
     response_description="Function entity",
     response_model=NiceBaseFunctionReverse,
     response_model_exclude_unset=True,
-    responses=get_error_code([404, 500]),
+    responses=get_error_code([403, 404, 500]),
 )
 @cache()  # type: ignore
 async def get_function(
@@ -553,7 +702,7 @@ and return the reversed function objects.
     response_model_exclude_unset=True,
     responses=get_error_code([400, 403, 500]),
 )
-@cache()  # type: ignore
+@cache_stream()
 async def find_buff(
     search_param: BuffSearchQueryParams = Depends(BuffSearchQueryParams),
     lang: Language = Depends(language_parameter),
@@ -564,9 +713,24 @@ async def find_buff(
 ) -> Response:
     async with get_db(search_param.region) as conn:
         matches = await search.search_buff(conn, search_param)
-        return list_response(
-            [
-                await nice.get_nice_buff_with_reverse(
+        reverse_entities = (
+            await nice.get_reverse_entities(
+                conn,
+                redis,
+                search_param.region,
+                lang,
+                reverseDepth,
+                reverseData,
+                buff_ids=[mstBuff.id for mstBuff in matches],
+            )
+            if reverse
+            else None
+        )
+
+    async def get_buffs() -> AsyncIterator[NiceBuffReverse]:
+        async with get_db(search_param.region) as conn:
+            for mstBuff in matches:
+                yield await nice.get_nice_buff_with_reverse(
                     conn,
                     redis,
                     search_param.region,
@@ -576,10 +740,10 @@ async def find_buff(
                     reverseDepth,
                     reverseData,
                     mstBuff,
+                    reverse_entities,
                 )
-                for mstBuff in matches
-            ]
-        )
+
+    return ListStreamingResponse(get_buffs(), len(matches))
 
 
 @router.get(
@@ -589,7 +753,7 @@ async def find_buff(
     response_description="Buff Entity",
     response_model=NiceBuffReverse,
     response_model_exclude_unset=True,
-    responses=get_error_code([404, 500]),
+    responses=get_error_code([403, 404, 500]),
 )
 @cache()  # type: ignore
 async def get_buff(
@@ -701,12 +865,18 @@ async def get_event(
     region: Region,
     event_id: int,
     lang: Language = Depends(language_parameter),
+    projection: FieldProjection = Depends(get_projection_parameter(NiceEvent)),
 ) -> Response:
     """
     Get the nice event data from the given event ID
+
+    - **fields**: only return these top level fields. Comma separated or repeated.
+    - **exclude**: don't return these top level fields. Comma separated or repeated.
     """
     async with get_db(region) as conn:
-        return item_response(await get_nice_event(conn, region, event_id, lang))
+        return item_response(
+            await get_nice_event(conn, region, event_id, lang, projection)
+        )
 
 
 @router.get(
@@ -722,17 +892,25 @@ async def get_war(
     region: Region,
     war_id: int,
     lang: Language = Depends(language_parameter),
+    projection: FieldProjection = Depends(get_projection_parameter(NiceWar)),
 ) -> Response:
     """
     Get the nice war data from the given war ID
+
+    - **fields**: only return these top level fields. Comma separated or repeated.
+    - **exclude**: don't return these top level fields. Comma separated or repeated.
     """
     async with get_db(region) as conn:
-        return item_response(await war.get_nice_war(conn, region, war_id, lang))
+        return item_response(
+            await war.get_nice_war(conn, region, war_id, lang, projection)
+        )
 
 
-get_quest_phase_description = (
-    "Get the nice quest phase data from the given quest ID and phase number"
-)
+get_quest_phase_description = """Get the nice quest phase data from the given quest ID and phase number
+
+- **normalized**: functions and buffs are returned once in the top level `functions` and `buffs` tables.
+The skills and NPs of the enemies and support servants reference them with the table keys.
+"""
 
 
 @router.get(
@@ -750,11 +928,15 @@ async def get_quest_phase(
     phase: int,
     redis: Redis = Depends(get_redis),
     lang: Language = Depends(language_parameter),
+    normalized: bool = False,
 ) -> Response:
     async with get_db_transaction(region) as conn:
-        return item_response(
-            await quest.get_nice_quest_phase(conn, redis, region, quest_id, phase, lang)
+        quest_phase = await quest.get_nice_quest_phase(
+            conn, redis, region, quest_id, phase, lang
         )
+    if normalized:
+        return dict_response(get_normalized_quest_phase(quest_phase))
+    return item_response(quest_phase)
 
 
 @router.get(
@@ -1,3 +1,5 @@
+from typing import AsyncIterator
+
 from fastapi import APIRouter, Depends, Query, Response
 from fastapi_cache.decorator import cache
 from fastapi_limiter.depends import RateLimiter  # type: ignore
@@ -41,7 +43,13 @@ from ..schemas.search import (
     TdSearchParams,
 )
 from .deps import get_db, get_redis
-from .utils import get_error_code, item_response, list_response
+from .utils import (
+    ListStreamingResponse,
+    cache_stream,
+    get_error_code,
+    item_response,
+    list_response,
+)
 
 
 settings = Settings()
@@ -69,20 +77,24 @@ Expand all other skills and functions as well.
     response_model_exclude_unset=True,
     responses=get_error_code([400, 403]),
 )
-@cache()  # type: ignore
+@cache_stream()
 async def find_servant(
     search_param: ServantSearchQueryParams = Depends(ServantSearchQueryParams),
     expand: bool = False,
     lore: bool = False,
+    redis: Redis = Depends(get_redis),
 ) -> Response:
     async with get_db(search_param.region) as conn:
-        matches = await search.search_servant(conn, search_param)
-        return list_response(
-            [
-                await raw.get_servant_entity(conn, mstSvt.id, expand, lore, mstSvt)
-                for mstSvt in matches
-            ]
-        )
+        matches = await search.search_servant(conn, redis, search_param)
+
+    async def get_servants() -> AsyncIterator[ServantEntity]:
+        async with get_db(search_param.region) as conn:
+            for mstSvt in matches:
+                yield await raw.get_servant_entity(
+                    conn, mstSvt.id, expand, lore, mstSvt
+                )
+
+    return ListStreamingResponse(get_servants(), len(matches))
 
 
 get_servant_description = """
@@ -124,20 +136,24 @@ async def get_servant(
     response_model_exclude_unset=True,
     responses=get_error_code([400, 403]),
 )
-@cache()  # type: ignore
+@cache_stream()
 async def find_equip(
     search_param: EquipSearchQueryParams = Depends(EquipSearchQueryParams),
     expand: bool = False,
     lore: bool = False,
+    redis: Redis = Depends(get_redis),
 ) -> Response:
     async with get_db(search_param.region) as conn:
-        matches = await search.search_equip(conn, search_param)
-        return list_response(
-            [
-                await raw.get_servant_entity(conn, mstSvt.id, expand, lore, mstSvt)
-                for mstSvt in matches
-            ]
-        )
+        matches = await search.search_equip(conn, redis, search_param)
+
+    async def get_equips() -> AsyncIterator[ServantEntity]:
+        async with get_db(search_param.region) as conn:
+            for mstSvt in matches:
+                yield await raw.get_servant_entity(
+                    conn, mstSvt.id, expand, lore, mstSvt
+                )
+
+    return ListStreamingResponse(get_equips(), len(matches))
 
 
 get_ce_description = """
@@ -179,20 +195,24 @@ async def get_equip(
     response_model_exclude_unset=True,
     responses=get_error_code([400, 403]),
 )
-@cache()  # type: ignore
+@cache_stream()
 async def find_svt(
     search_param: SvtSearchQueryParams = Depends(SvtSearchQueryParams),
     expand: bool = False,
     lore: bool = False,
+    redis: Redis = Depends(get_redis),
 ) -> Response:
     async with get_db(search_param.region) as conn:
-        matches = await search.search_servant(conn, search_param)
-        return list_response(
-            [
-                await raw.get_servant_entity(conn, mstSvt.id, expand, lore, mstSvt)
-                for mstSvt in matches
-            ]
-        )
+        matches = await search.search_servant(conn, redis, search_param)
+
+    async def get_svts() -> AsyncIterator[ServantEntity]:
+        async with get_db(search_param.region) as conn:
+            for mstSvt in matches:
+                yield await raw.get_servant_entity(
+                    conn, mstSvt.id, expand, lore, mstSvt
+                )
+
+    return ListStreamingResponse(get_svts(), len(matches))
 
 
 get_svt_description = """
@@ -301,7 +321,7 @@ from the function IDs in mstSkillLv.funcId.
     response_model_exclude_unset=True,
     responses=get_error_code([400, 403]),
 )
-@cache()  # type: ignore
+@cache_stream()
 async def find_skill(
     search_param: SkillSearchParams = Depends(SkillSearchParams),
     reverse: bool = False,
@@ -310,9 +330,11 @@ async def find_skill(
 ) -> Response:
     async with get_db(search_param.region) as conn:
         matches = await search.search_skill(conn, search_param)
-        return list_response(
-            [
-                await raw.get_skill_entity(
+
+    async def get_skills() -> AsyncIterator[SkillEntity]:
+        async with get_db(search_param.region) as conn:
+            for mstSkill in matches:
+                yield await raw.get_skill_entity(
                     conn,
                     redis,
                     search_param.region,
@@ -320,9 +342,8 @@ async def find_skill(
                     reverse,
                     expand=expand,
                 )
-                for mstSkill in matches
-            ]
-        )
+
+    return ListStreamingResponse(get_skills(), len(matches))
 
 
 @router.get(
@@ -332,7 +353,7 @@ async def find_skill(
     response_description="Skill entity",
     response_model=SkillEntity,
     response_model_exclude_unset=True,
-    responses=get_error_code([404]),
+    responses=get_error_code([403, 404]),
 )
 @cache()  # type: ignore
 async def get_skill(
@@ -366,7 +387,7 @@ from the function IDs in mstTreasureDeviceLv.funcId.
     response_model_exclude_unset=True,
     responses=get_error_code([400, 403]),
 )
-@cache()  # type: ignore
+@cache_stream()
 async def find_td(
     search_param: TdSearchParams = Depends(TdSearchParams),
     reverse: bool = False,
@@ -374,12 +395,13 @@ async def find_td(
 ) -> Response:
     async with get_db(search_param.region) as conn:
         matches = await search.search_td(conn, search_param)
-        return list_response(
-            [
-                await raw.get_td_entity(conn, td.id, reverse, expand=expand)
-                for td in matches
-            ]
-        )
+
+    async def get_tds() -> AsyncIterator[TdEntity]:
+        async with get_db(search_param.region) as conn:
+            for td in matches:
+                yield await raw.get_td_entity(conn, td.id, reverse, expand=expand)
+
+    return ListStreamingResponse(get_tds(), len(matches))
 
 
 @router.get(
@@ -420,7 +442,7 @@ and return the reversed skill objects.
     response_model_exclude_unset=True,
     responses=get_error_code([400, 403]),
 )
-@cache()  # type: ignore
+@cache_stream()
 async def find_function(
     search_param: FuncSearchQueryParams = Depends(FuncSearchQueryParams),
     reverse: bool = False,
@@ -430,9 +452,11 @@ async def find_function(
 ) -> Response:
     async with get_db(search_param.region) as conn:
         matches = await search.search_func(conn, search_param)
-        return list_response(
-            [
-                await raw.get_func_entity(
+
+    async def get_functions() -> AsyncIterator[FunctionEntity]:
+        async with get_db(search_param.region) as conn:
+            for mstFunc in matches:
+                yield await raw.get_func_entity(
                     conn,
                     redis,
                     search_param.region,
@@ -442,9 +466,8 @@ async def find_function(
                     expand,
                     mstFunc,
                 )
-                for mstFunc in matches
-            ]
-        )
+
+    return ListStreamingResponse(get_functions(), len(matches))
 
 
 @router.get(
@@ -455,7 +478,7 @@ async def find_function(
     response_description="Function entity",
     response_model=FunctionEntity,
     response_model_exclude_unset=True,
-    responses=get_error_code([404]),
+    responses=get_error_code([403, 404]),
 )
 @cache()  # type: ignore
 async def get_function(
@@ -489,7 +512,7 @@ and return the reversed function objects.
     response_model_exclude_unset=True,
     responses=get_error_code([400, 403]),
 )
-@cache()  # type: ignore
+@cache_stream()
 async def find_buff(
     search_param: BuffSearchQueryParams = Depends(BuffSearchQueryParams),
     reverse: bool = False,
@@ -498,9 +521,11 @@ async def find_buff(
 ) -> Response:
     async with get_db(search_param.region) as conn:
         matches = await search.search_buff(conn, search_param)
-        return list_response(
-            [
-                await raw.get_buff_entity(
+
+    async def get_buffs() -> AsyncIterator[BuffEntity]:
+        async with get_db(search_param.region) as conn:
+            for mstBuff in matches:
+                yield await raw.get_buff_entity(
                     conn,
                     redis,
                     search_param.region,
@@ -509,9 +534,8 @@ async def find_buff(
                     reverseDepth,
                     mstBuff,
                 )
-                for mstBuff in matches
-            ]
-        )
+
+    return ListStreamingResponse(get_buffs(), len(matches))
 
 
 @router.get(
@@ -521,7 +545,7 @@ async def find_buff(
     response_description="Buff entity",
     response_model=BuffEntity,
     response_model_exclude_unset=True,
-    responses=get_error_code([404]),
+    responses=get_error_code([403, 404]),
 )
 @cache()  # type: ignore
 async def get_buff(
@@ -1,13 +1,114 @@
-from typing import Any, Iterable, Mapping, Type, Union
+from contextvars import ContextVar
+from functools import wraps
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Mapping,
+    Optional,
+    Type,
+    Union,
+)
 
+import cbor2
+import msgpack
 import orjson
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
+from fastapi_cache import FastAPICache
 from pydantic import BaseModel
+from pydantic.json import pydantic_encoder
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
 
+from ..config import Settings
 from ..schemas.base import BaseModelORJson
 
 
+settings = Settings()
+
+
 JSON_MIME = "application/json"
+MSGPACK_MIME = "application/msgpack"
+CBOR_MIME = "application/cbor"
+ACCEPT_MIMES = {
+    JSON_MIME: JSON_MIME,
+    MSGPACK_MIME: MSGPACK_MIME,
+    "application/x-msgpack": MSGPACK_MIME,
+    CBOR_MIME: CBOR_MIME,
+}
+
+
+# Headers of the responses whose format depends on the Accept header
+FORMAT_HEADERS = {"Vary": "Accept"}
+
+# Media type of the model responses of the current request, set by ResponseFormatMiddleware
+response_format: ContextVar[str] = ContextVar("response_format", default=JSON_MIME)
+
+
+def get_response_format(accept: str) -> str:
+    """
+    Parse the Accept header and return the supported media type with the highest weight.
+    JSON is preferred on ties and returned if nothing else is accepted.
+    """
+    best_format, best_weight = JSON_MIME, 0.0
+    for media_range in accept.lower().split(","):
+        media_type, _, params = media_range.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        accepted_format = ACCEPT_MIMES.get(media_type.strip())
+        if accepted_format and (
+            weight > best_weight
+            or (weight == best_weight and accepted_format == JSON_MIME)
+        ):
+            best_format, best_weight = accepted_format, weight
+    return best_format
+
+
+class ResponseFormatMiddleware:
+    """Set response_format from the Accept header for the duration of the request"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = response_format.set(
+            get_response_format(Headers(scope=scope).get("Accept", ""))
+        )
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            response_format.reset(token)
+
+
+def cbor_default(encoder: cbor2.CBOREncoder, value: Any) -> None:
+    encoder.encode(pydantic_encoder(value))
+
+
+def dump_binary(data: Any, media_type: str) -> bytes:
+    """
+    Serialize the model dict in the given binary format.
+    Unlike JSON, integer keys are kept as integers.
+    """
+    if media_type == MSGPACK_MIME:
+        packed: bytes = msgpack.packb(data, default=pydantic_encoder)
+        return packed
+    return cbor2.dumps(data, default=cbor_default)
+
+
+def model_dict(item: BaseModelORJson) -> dict[str, Any]:
+    return item.dict(exclude_unset=True, exclude_none=True)
 
 
 class DetailMessage(BaseModel):
@@ -37,9 +138,38 @@ def item_response(item: BaseModelORJson) -> Response:
     Convert input model object to a Starlette Response object.
     Use this method to skip the second validation done by fastapi's json_encodable
     if the input model and the specificed response_model are the same.
+    Uses msgpack or CBOR instead of JSON if the client asked for it.
+    """
+    media_type = response_format.get()
+    if media_type != JSON_MIME:
+        return Response(
+            dump_binary(model_dict(item), media_type),
+            media_type=media_type,
+            headers=FORMAT_HEADERS,
+        )
+    return Response(
+        item.json(exclude_unset=True, exclude_none=True),
+        media_type=JSON_MIME,
+        headers=FORMAT_HEADERS,
+    )
+
+
+def dict_response(data: dict[str, Any]) -> Response:
+    """
+    Convert the dict of validated model objects to a Starlette Response object
+    without creating the models again.
     """
+    media_type = response_format.get()
+    if media_type != JSON_MIME:
+        return Response(
+            dump_binary(data, media_type),
+            media_type=media_type,
+            headers=FORMAT_HEADERS,
+        )
     return Response(
-        item.json(exclude_unset=True, exclude_none=True), media_type=JSON_MIME
+        orjson.dumps(data, default=pydantic_encoder, option=orjson.OPT_NON_STR_KEYS),
+        media_type=JSON_MIME,
+        headers=FORMAT_HEADERS,
     )
 
 
@@ -71,8 +201,142 @@ def list_response(items: Iterable[BaseModelORJson]) -> Response:
     Convert list of model objects to a Starlette Response object.
     Use this method to skip the second validation done by fastapi's json_encodable
     if the input model and the specificed response_model are the same.
+    Uses msgpack or CBOR instead of JSON if the client asked for it.
+    """
+    media_type = response_format.get()
+    if media_type != JSON_MIME:
+        return Response(
+            dump_binary([model_dict(item) for item in items], media_type),
+            media_type=media_type,
+            headers=FORMAT_HEADERS,
+        )
+    return Response(list_string(items), media_type=JSON_MIME, headers=FORMAT_HEADERS)
+
+
+class ListStreamingResponse(StreamingResponse):
     """
-    return Response(list_string(items), media_type=JSON_MIME)
+    Stream an array of model objects, serializing one object at a time
+    as the async iterator produces them.
+    msgpack arrays need their length upfront. Without `length`, all items are
+    built before anything is sent for msgpack responses.
+    If `on_complete` is set, it is awaited with the full body after the last chunk.
+    Bodies bigger than `max_cached_size` aren't kept and `on_complete` isn't called.
+    """
+
+    def __init__(
+        self, items: AsyncIterable[BaseModelORJson], length: Optional[int] = None
+    ) -> None:
+        self.on_complete: Optional[Callable[[bytes], Awaitable[None]]] = None
+        self.max_cached_size = settings.cache_stream_max_size
+        self.length = length
+        media_type = response_format.get()
+        super().__init__(
+            self.iter_body(items, media_type),
+            media_type=media_type,
+            headers=FORMAT_HEADERS,
+        )
+
+    async def iter_chunks(
+        self, items: AsyncIterable[BaseModelORJson], media_type: str
+    ) -> AsyncIterator[bytes]:
+        if media_type == MSGPACK_MIME:
+            if self.length is None:
+                item_dicts = [model_dict(item) async for item in items]
+                yield dump_binary(item_dicts, media_type)
+                return
+            yield msgpack.Packer().pack_array_header(self.length)
+            async for item in items:
+                yield dump_binary(model_dict(item), media_type)
+        elif media_type == CBOR_MIME:
+            # Indefinite length array
+            yield b"\x9f"
+            async for item in items:
+                yield dump_binary(model_dict(item), media_type)
+            yield b"\xff"
+        else:
+            separator = b"["
+            async for item in items:
+                yield separator + item.json(
+                    exclude_unset=True, exclude_none=True
+                ).encode("utf-8")
+                separator = b","
+            yield b"]" if separator == b"," else b"[]"
+
+    async def iter_body(
+        self, items: AsyncIterable[BaseModelORJson], media_type: str
+    ) -> AsyncIterator[bytes]:
+        chunks: list[bytes] = []
+        cached_size = 0
+        try:
+            async for chunk in self.iter_chunks(items, media_type):
+                if self.on_complete is not None:
+                    cached_size += len(chunk)
+                    if cached_size > self.max_cached_size:
+                        self.on_complete = None
+                        chunks.clear()
+                    else:
+                        chunks.append(chunk)
+                yield chunk
+        except Exception:
+            # Re-raising makes the server drop the connection instead of ending the
+            # body normally, so the client can't mistake the partial list for a full one.
+            # The partial body is never cached.
+            self.on_complete = None
+            chunks.clear()
+            raise
+
+        if self.on_complete is not None:
+            await self.on_complete(b"".join(chunks))
+
+
+def cache_stream(
+    expire: Optional[int] = None,
+) -> Callable[[Callable[..., Awaitable[Response]]], Callable[..., Awaitable[Response]]]:
+    """
+    fastapi_cache's cache decorator for endpoints returning a ListStreamingResponse.
+    On cache miss the response is streamed to the client and
+    cached as a plain Response once the last chunk has been sent.
+    Responses bigger than CACHE_STREAM_MAX_SIZE or interrupted by an error aren't cached.
+    """
+
+    def wrapper(
+        func: Callable[..., Awaitable[Response]]
+    ) -> Callable[..., Awaitable[Response]]:
+        @wraps(func)
+        async def inner(*args: Any, **kwargs: Any) -> Response:
+            if not FastAPICache.get_enable():
+                return await func(*args, **kwargs)
+
+            coder = FastAPICache.get_coder()
+            backend = FastAPICache.get_backend()
+            cache_expire = expire or FastAPICache.get_expire()
+            cache_key = FastAPICache.get_key_builder()(
+                func, "", args=args, kwargs=kwargs
+            )
+
+            cached_response = await backend.get(cache_key)
+            if cached_response is not None:
+                response: Response = coder.decode(cached_response)
+                return response
+
+            response = await func(*args, **kwargs)
+            if isinstance(response, ListStreamingResponse):
+
+                async def set_cache(body: bytes) -> None:
+                    cached = Response(
+                        body, media_type=response.media_type, headers=FORMAT_HEADERS
+                    )
+                    await backend.set(cache_key, coder.encode(cached), cache_expire)
+
+                response.on_complete = set_cache
+            else:
+                await backend.set(cache_key, coder.encode(response), cache_expire)
+
+            return response
+
+        return inner
+
+    return wrapper
 
 
 def pretty_print_response(data: Any) -> Response:
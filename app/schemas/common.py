@@ -1,7 +1,10 @@
+from dataclasses import dataclass
 from enum import Enum
-from typing import Optional, Union
+from typing import Any, Optional, Type, TypeVar, Union
 
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, HttpUrl, ValidationError
+from pydantic.error_wrappers import ErrorList, ErrorWrapper
+from pydantic.errors import MissingError
 
 from .base import BaseModelORJson
 from .enums import SvtClass, Trait
@@ -60,6 +63,61 @@ class ReverseDepth(str, Enum):
         return str(self.value) >= other
 
 
+TProjectedModel = TypeVar("TProjectedModel", bound=BaseModel)
+
+
+def validate_projected_fields(
+    model: Type[TProjectedModel], data: dict[str, Any], fields: set[str]
+) -> TProjectedModel:
+    """
+    Validate `fields` with the validators of the full model and construct it
+    without the other fields, which are left unset for `exclude_unset`.
+    """
+    values: dict[str, Any] = {}
+    errors: list[ErrorList] = []
+    for name in fields:
+        field = model.__fields__[name]
+        if field.alias not in data:
+            if field.required:
+                errors.append(ErrorWrapper(MissingError(), loc=field.alias))
+            continue
+        value, error = field.validate(
+            data[field.alias], values, loc=field.alias, cls=model
+        )
+        if error:
+            errors.append(error)
+        else:
+            values[name] = value
+    if errors:
+        raise ValidationError(errors, model)
+    return model.construct(_fields_set=set(values), **values)
+
+
+@dataclass(frozen=True)
+class FieldProjection:
+    """Top level fields of a nice entity to be built. Empty fields means all fields."""
+
+    fields: tuple[str, ...] = ()
+    exclude: tuple[str, ...] = ()
+
+    def __bool__(self) -> bool:
+        return bool(self.fields or self.exclude)
+
+    def __contains__(self, field: str) -> bool:
+        if self.fields and field not in self.fields:
+            return False
+        return field not in self.exclude
+
+    def parse_obj(
+        self, model: Type[TProjectedModel], data: dict[str, Any]
+    ) -> TProjectedModel:
+        if not self:
+            return model.parse_obj(data)
+        return validate_projected_fields(
+            model, data, {field for field in model.__fields__ if field in self}
+        )
+
+
 class NiceTrait(BaseModel):
     """Nice trait"""
 
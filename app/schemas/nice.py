@@ -1150,6 +1150,65 @@ class NiceServant(BaseModelORJson):
     )
 
 
+class NiceNormalizedFunction(NiceFunction):
+    buffs: list[str] = Field(  # type: ignore
+        ...,
+        title="Buff keys",
+        description="Keys of the function's buffs in the `buffs` table.",
+    )
+
+
+class NiceNormalizedSkill(NiceSkill):
+    functions: list[str] = Field(  # type: ignore
+        ...,
+        title="Function keys",
+        description="Keys of the skill's functions in the `functions` table.",
+    )
+
+
+class NiceNormalizedTd(NiceTd):
+    functions: list[str] = Field(  # type: ignore
+        ...,
+        title="Function keys",
+        description="Keys of the NP's functions in the `functions` table.",
+    )
+
+
+class NiceNormalizedServantAppendPassiveSkill(NiceServantAppendPassiveSkill):
+    skill: NiceNormalizedSkill
+
+
+class NiceNormalizedServant(NiceServant):
+    skills: list[NiceNormalizedSkill]  # type: ignore
+    classPassive: list[NiceNormalizedSkill]  # type: ignore
+    extraPassive: list[NiceNormalizedSkill]  # type: ignore
+    appendPassive: list[NiceNormalizedServantAppendPassiveSkill]  # type: ignore
+    noblePhantasms: list[NiceNormalizedTd]  # type: ignore
+
+
+class NiceNormalizedTables(BaseModelORJson):
+    functions: dict[str, NiceNormalizedFunction] = Field(
+        ...,
+        title="Functions table",
+        description="Mapping <Function key, Function>. "
+        "The key is the function ID and a hash of the function values.",
+    )
+    buffs: dict[str, NiceBuff] = Field(
+        ...,
+        title="Buffs table",
+        description="Mapping <Buff key, Buff>. "
+        "The key is the buff ID and a hash of the buff values.",
+    )
+
+
+class NiceNormalizedServantResponse(NiceNormalizedTables):
+    servant: NiceNormalizedServant
+
+
+class NiceNormalizedServantListResponse(NiceNormalizedTables):
+    servants: list[NiceNormalizedServant]
+
+
 class NiceEquip(BaseModelORJson):
     id: int = Field(
         ...,
@@ -1924,6 +1983,49 @@ class NiceQuestPhase(NiceQuest):
     stages: list[NiceStage]
 
 
+class NiceNormalizedEnemySkill(EnemySkill):
+    skill1: Optional[NiceNormalizedSkill] = None  # type: ignore
+    skill2: Optional[NiceNormalizedSkill] = None  # type: ignore
+    skill3: Optional[NiceNormalizedSkill] = None  # type: ignore
+
+
+class NiceNormalizedEnemyPassive(EnemyPassive):
+    classPassive: list[NiceNormalizedSkill]  # type: ignore
+    addPassive: list[NiceNormalizedSkill]  # type: ignore
+
+
+class NiceNormalizedEnemyTd(EnemyTd):
+    noblePhantasm: Optional[NiceNormalizedTd] = None  # type: ignore
+
+
+class NiceNormalizedQuestEnemy(QuestEnemy):
+    skills: NiceNormalizedEnemySkill  # type: ignore
+    classPassive: NiceNormalizedEnemyPassive  # type: ignore
+    noblePhantasm: NiceNormalizedEnemyTd  # type: ignore
+
+
+class NiceNormalizedStage(NiceStage):
+    enemies: list[NiceNormalizedQuestEnemy] = []  # type: ignore
+
+
+class NiceNormalizedSupportServantTd(SupportServantTd):
+    noblePhantasm: Optional[NiceNormalizedTd] = None  # type: ignore
+
+
+class NiceNormalizedSupportServant(SupportServant):
+    skills: NiceNormalizedEnemySkill  # type: ignore
+    noblePhantasm: NiceNormalizedSupportServantTd  # type: ignore
+
+
+class NiceNormalizedQuestPhase(NiceQuestPhase):
+    supportServants: list[NiceNormalizedSupportServant]  # type: ignore
+    stages: list[NiceNormalizedStage]  # type: ignore
+
+
+class NiceNormalizedQuestPhaseResponse(NiceNormalizedTables):
+    questPhase: NiceNormalizedQuestPhase
+
+
 class NiceScript(BaseModelORJson):
     scriptId: str
     scriptSizeBytes: int
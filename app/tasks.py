@@ -1,9 +1,12 @@
+import asyncio
 import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
+from os import cpu_count
 from pathlib import Path
-from typing import Any, Iterable, Union
+from typing import Any, Iterable, Optional
 
-import aiofiles
 import httpx
 import orjson
 from fastapi.concurrency import run_in_threadpool
@@ -12,7 +15,7 @@ from pydantic import DirectoryPath
 from redis.asyncio import Redis  # type: ignore
 from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
 
-from .config import Settings, logger, project_root
+from .config import Settings, logger
 from .core.basic import (
     get_all_basic_ccs,
     get_all_basic_equips,
@@ -23,28 +26,55 @@ from .core.basic import (
 )
 from .core.nice.bgm import get_all_nice_bgms
 from .core.nice.cc import get_all_nice_ccs
-from .core.nice.event.event import get_nice_event
 from .core.nice.item import get_all_nice_items
 from .core.nice.mc import get_all_nice_mcs
 from .core.nice.mm import get_all_nice_mms
-from .core.nice.nice import get_nice_equip_model, get_nice_servant_model
-from .core.nice.war import get_nice_war
-from .core.raw import get_all_bgm_entities, get_servant_entity
+from .core.nice.quest import get_nice_quest_phase
+from .core.raw import get_all_bgm_entities
 from .core.utils import get_translation, sort_by_collection_no
 from .data.extra import get_extra_svt_data
+from .data.utils import get_repo_info
 from .db.engine import engines
 from .db.helpers import fetch
+from .db.helpers.quest import get_latest_quest_with_enemies, get_open_quest_phases
 from .db.helpers.svt import get_all_equips
 from .db.load import load_pydantic_to_db, update_db
+from .export.delta import write_delta
+from .export.manifest import (
+    ExportManifest,
+    get_export_cache_path,
+    get_export_code_version,
+    read_manifest,
+    write_manifest,
+)
+from .export.parallel import (
+    ExportUnitKind,
+    get_export_pool,
+    get_export_units,
+    get_shard_manifest,
+    get_updated_manifest,
+    run_export_units,
+)
+from .export.shard import (
+    get_export_path,
+    prune_shards,
+    read_shard_manifest,
+    write_shard_manifest,
+)
+from .export.writer import (
+    ExportWriter,
+    atomic_write_bytes,
+    format_memory,
+    get_peak_memory,
+)
 from .models.raw import mstSvtExtra
-from .redis.helpers.repo_version import set_repo_version
+from .redis.helpers.quest import claim_quest_prefetch, renew_quest_prefetch
+from .redis.helpers.repo_version import get_repo_version, set_repo_version
 from .redis.load import load_redis_data, load_svt_extra_redis
-from .routers.utils import list_string
+from .routers.compression import write_precompressed_files
 from .schemas.base import BaseModelORJson
-from .schemas.common import Language, Region, RepoInfo
+from .schemas.common import Language, Region
 from .schemas.enums import ALL_ENUMS, TRAIT_NAME
-from .schemas.gameenums import SvtType
-from .schemas.nice import NiceEquip, NiceServant
 from .schemas.raw import (
     AssetStorageLine,
     BgmEntity,
@@ -57,7 +87,6 @@ from .schemas.raw import (
     MstMasterMission,
     MstSvt,
     MstWar,
-    ServantEntity,
 )
 
 
@@ -67,17 +96,20 @@ settings = Settings()
 async def dump_normal(
     export_path: Path, file_name: str, data: Any
 ) -> None:  # pragma: no cover
-    async with aiofiles.open(export_path / f"{file_name}.json", "wb") as fp:
-        await fp.write(orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS))
+    atomic_write_bytes(
+        export_path / f"{file_name}.json",
+        orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS),
+    )
 
 
 async def dump_orjson(
     export_path: Path, file_name: str, data: Iterable[BaseModelORJson]
 ) -> None:  # pragma: no cover
-    async with aiofiles.open(
-        export_path / f"{file_name}.json", "w", encoding="utf-8"
-    ) as fp:
-        await fp.write(list_string(data))
+    async with ExportWriter(export_path) as writer:
+        await writer.write_items(
+            file_name,
+            (item.json(exclude_unset=True, exclude_none=True) for item in data),
+        )
 
 
 @dataclass
@@ -99,83 +131,6 @@ class ExportUtil:
         await dump_orjson(self.export_path, self.append_file_name(file_name), data)
 
 
-async def get_nice_svt(
-    conn: AsyncConnection,
-    region: Region,
-    lang: Language,
-    lore: bool,
-    raw_svt: ServantEntity,
-) -> Union[NiceServant, NiceEquip]:  # pragma: no cover
-    if raw_svt.mstSvt.type == SvtType.SERVANT_EQUIP:
-        return await get_nice_equip_model(
-            conn=conn,
-            region=region,
-            item_id=raw_svt.mstSvt.id,
-            lang=lang,
-            lore=True,
-            raw_svt=raw_svt,
-        )
-    else:
-        return await get_nice_servant_model(
-            conn=conn,
-            region=region,
-            item_id=raw_svt.mstSvt.id,
-            lang=lang,
-            lore=lore,
-            raw_svt=raw_svt,
-        )
-
-
-async def dump_svt(
-    util: ExportUtil, file_name: str, svts: list[MstSvt]
-) -> None:  # pragma: no cover
-    conn = util.conn
-    region = util.region
-    export_path = util.export_path
-
-    with_lore: list[str] = []
-    without_lore: list[str] = []
-    with_lore_en: list[str] = []
-    without_lore_en: list[str] = []
-
-    for svt in svts:
-        raw_svt = await get_servant_entity(
-            conn, svt.id, expand=True, lore=True, mstSvt=svt
-        )
-
-        nice_svt = await get_nice_svt(conn, region, Language.jp, True, raw_svt)
-        with_lore.append(nice_svt.json(exclude_unset=True, exclude_none=True))
-        without_lore.append(
-            nice_svt.json(exclude={"profile"}, exclude_unset=True, exclude_none=True)
-        )
-
-        if region == Region.JP:
-            nice_svt_en = await get_nice_svt(conn, region, Language.en, True, raw_svt)
-            with_lore_en.append(nice_svt_en.json(exclude_unset=True, exclude_none=True))
-            without_lore_en.append(
-                nice_svt_en.json(
-                    exclude={"profile"}, exclude_unset=True, exclude_none=True
-                )
-            )
-
-    out_name = export_path / f"{file_name}.json"
-    out_lore_name = export_path / f"{file_name}_lore.json"
-
-    async with aiofiles.open(out_lore_name, "w", encoding="utf-8") as fp:
-        await fp.write("[" + ",".join(with_lore) + "]")
-    async with aiofiles.open(out_name, "w", encoding="utf-8") as fp:
-        await fp.write("[" + ",".join(without_lore) + "]")
-
-    if region == Region.JP:
-        out_name_en = export_path / f"{file_name}_lang_en.json"
-        out_lore_name_en = export_path / f"{file_name}_lore_lang_en.json"
-
-        async with aiofiles.open(out_lore_name_en, "w", encoding="utf-8") as fp:
-            await fp.write("[" + ",".join(with_lore_en) + "]")
-        async with aiofiles.open(out_name_en, "w", encoding="utf-8") as fp:
-            await fp.write("[" + ",".join(without_lore_en) + "]")
-
-
 async def dump_nice_items(
     util: ExportUtil, items: list[MstItem]
 ) -> None:  # pragma: no cover
@@ -211,25 +166,6 @@ async def dump_nice_mms(
     await util.dump_orjson("nice_master_mission", all_mm_data)
 
 
-async def dump_nice_wars(
-    util: ExportUtil, wars: list[MstWar]
-) -> None:  # pragma: no cover
-    all_war_data = [
-        await get_nice_war(util.conn, util.region, war.id, util.lang) for war in wars
-    ]
-    await util.dump_orjson("nice_war", all_war_data)
-
-
-async def dump_nice_events(
-    util: ExportUtil, events: list[MstEvent]
-) -> None:  # pragma: no cover
-    all_event_data = [
-        await get_nice_event(util.conn, util.region, event.id, util.lang)
-        for event in events
-    ]
-    await util.dump_orjson("nice_event", all_event_data)
-
-
 async def dump_illustrators(
     util: ExportUtil, illustrators: list[MstIllustrator]
 ) -> None:  # pragma: no cover
@@ -304,107 +240,203 @@ async def dump_basic_wars(
     await util.dump_orjson("basic_war", all_basic_war_data)
 
 
+async def precompress_exports(export_path: Path) -> None:  # pragma: no cover
+    start_time = time.perf_counter()
+    export_files = [
+        file_path for file_path in export_path.iterdir() if file_path.suffix == ".json"
+    ]
+    await asyncio.gather(
+        *(
+            run_in_threadpool(write_precompressed_files, file_path)
+            for file_path in export_files
+        )
+    )
+    run_time = time.perf_counter() - start_time
+    logger.info(f"Compressed {export_path.name} export files in {run_time:.2f}s.")
+
+
 async def generate_exports(
     redis: Redis,
     region_path: dict[Region, DirectoryPath],
     async_engines: dict[Region, AsyncEngine],
+    workers: Optional[int] = settings.export_workers,
+    chunk_size: int = settings.export_chunk_size,
 ) -> None:  # pragma: no cover
-    if settings.export_all_nice:
+    with get_export_pool(workers) as pool:
         for region in region_path:
-            start_time = time.perf_counter()
-            export_path = project_root / "export" / region.value
-
-            async with async_engines[region].connect() as conn:
-                logger.info(f"Exporting {region} data …")
-
-                util = ExportUtil(conn, redis, region, export_path)
+            await generate_region_exports(
+                redis,
+                region,
+                async_engines[region],
+                pool,
+                chunk_size,
+                (workers or cpu_count() or 1) * 2,
+            )
 
-                all_svts = await fetch.get_everything(conn, MstSvt)
-                all_servants = [
-                    svt for svt in all_svts if svt.collectionNo != 0 and svt.isServant()
-                ]
-                await dump_basic_servants(util, "basic_servant", all_servants)
 
-                all_equips = await get_all_equips(conn)
-                await dump_basic_equips(util, all_equips)
+async def generate_region_exports(
+    redis: Redis,
+    region: Region,
+    engine: AsyncEngine,
+    pool: ProcessPoolExecutor,
+    chunk_size: int,
+    max_pending: int,
+) -> None:  # pragma: no cover
+    start_time = time.perf_counter()
+    export_path = get_export_path(region)
+
+    async with engine.connect() as conn:
+        logger.info(f"Exporting {region} data …")
+
+        util = ExportUtil(conn, redis, region, export_path)
+
+        all_svts = await fetch.get_everything(conn, MstSvt)
+        all_servants = [
+            svt for svt in all_svts if svt.collectionNo != 0 and svt.isServant()
+        ]
+        all_equips = await get_all_equips(conn)
+        mstWars = await fetch.get_everything(conn, MstWar)
+        mstEvents = await fetch.get_everything(conn, MstEvent)
+
+        # The nice servants, equips, wars and events are built in the process pool
+        # while the cheaper exports below are dumped in this process
+        cache_path = get_export_cache_path(region)
+        export_version = get_export_code_version()
+        manifest = read_manifest(cache_path)
+        if manifest.version != export_version:
+            manifest = ExportManifest(version=export_version)
+        units = [
+            *get_export_units(
+                region,
+                ExportUnitKind.SVT,
+                "nice_servant",
+                [svt.id for svt in all_servants],
+                chunk_size,
+                manifest,
+            ),
+            *get_export_units(
+                region,
+                ExportUnitKind.SVT,
+                "nice_equip",
+                [svt.id for svt in all_equips],
+                chunk_size,
+                manifest,
+            ),
+            *get_export_units(
+                region,
+                ExportUnitKind.WAR,
+                "nice_war",
+                [war.id for war in mstWars],
+                chunk_size,
+                manifest,
+            ),
+            *get_export_units(
+                region,
+                ExportUnitKind.EVENT,
+                "nice_event",
+                [event.id for event in mstEvents],
+                chunk_size,
+                manifest,
+            ),
+        ]
+        units_task = asyncio.create_task(
+            run_export_units(pool, units, export_path, max_pending)
+        )
 
-                mstCcs = await fetch.get_everything(conn, MstCommandCode)
-                await dump_basic_ccs(util, mstCcs)
+        await dump_basic_servants(util, "basic_servant", all_servants)
+        await dump_basic_equips(util, all_equips)
 
-                mstWars = await fetch.get_everything(conn, MstWar)
-                await dump_basic_wars(util, mstWars)
+        mstCcs = await fetch.get_everything(conn, MstCommandCode)
+        await dump_basic_ccs(util, mstCcs)
 
-                mstEvents = await fetch.get_everything(conn, MstEvent)
-                await dump_basic_events(util, mstEvents)
+        await dump_basic_wars(util, mstWars)
+        await dump_basic_events(util, mstEvents)
 
-                mstEquips = await fetch.get_everything(conn, MstEquip)
-                await dump_basic_mcs(util, mstEquips)
+        mstEquips = await fetch.get_everything(conn, MstEquip)
+        await dump_basic_mcs(util, mstEquips)
 
-                await dump_normal(export_path, "nice_trait", TRAIT_NAME)
-                await dump_normal(export_path, "nice_enums", ALL_ENUMS)
+        await dump_normal(export_path, "nice_trait", TRAIT_NAME)
+        await dump_normal(export_path, "nice_enums", ALL_ENUMS)
 
-                mstIllustrators = await fetch.get_everything(conn, MstIllustrator)
-                await dump_illustrators(util, mstIllustrators)
+        mstIllustrators = await fetch.get_everything(conn, MstIllustrator)
+        await dump_illustrators(util, mstIllustrators)
 
-                mstCvs = await fetch.get_everything(conn, MstCv)
-                await dump_cvs(util, mstCvs)
+        mstCvs = await fetch.get_everything(conn, MstCv)
+        await dump_cvs(util, mstCvs)
 
-                bgms = await get_all_bgm_entities(conn)
-                mstItems = await fetch.get_everything(conn, MstItem)
-                mstMasterMissions = await fetch.get_everything(conn, MstMasterMission)
+        bgms = await get_all_bgm_entities(conn)
+        mstItems = await fetch.get_everything(conn, MstItem)
+        mstMasterMissions = await fetch.get_everything(conn, MstMasterMission)
 
-                asset_storage = await fetch.get_everything(conn, AssetStorageLine)
-                await util.dump_orjson("asset_storage", asset_storage)
+        asset_storage = await fetch.get_everything(conn, AssetStorageLine)
+        await util.dump_orjson("asset_storage", asset_storage)
 
-                await dump_basic_servants(util, "basic_svt", all_svts)
+        await dump_basic_servants(util, "basic_svt", all_svts)
 
-                await dump_nice_items(util, mstItems)
-                await dump_nice_mcs(util, mstEquips)
-                await dump_nice_ccs(util, mstCcs)
-                await dump_nice_mms(util, mstMasterMissions)
-                await dump_nice_bgms(util, bgms)
-                await dump_nice_wars(util, mstWars)
-                await dump_nice_events(util, mstEvents)
+        await dump_nice_items(util, mstItems)
+        await dump_nice_mcs(util, mstEquips)
+        await dump_nice_ccs(util, mstCcs)
+        await dump_nice_mms(util, mstMasterMissions)
+        await dump_nice_bgms(util, bgms)
 
-                if region == Region.JP:
-                    util_en = ExportUtil(conn, redis, region, export_path, Language.en)
+        if region == Region.JP:
+            util_en = ExportUtil(conn, redis, region, export_path, Language.en)
 
-                    await dump_basic_servants(util_en, "basic_servant", all_servants)
-                    await dump_basic_equips(util_en, all_equips)
-                    await dump_basic_ccs(util_en, mstCcs)
-                    await dump_basic_wars(util_en, mstWars)
-                    await dump_basic_events(util_en, mstEvents)
-                    await dump_basic_mcs(util_en, mstEquips)
+            await dump_basic_servants(util_en, "basic_servant", all_servants)
+            await dump_basic_equips(util_en, all_equips)
+            await dump_basic_ccs(util_en, mstCcs)
+            await dump_basic_wars(util_en, mstWars)
+            await dump_basic_events(util_en, mstEvents)
+            await dump_basic_mcs(util_en, mstEquips)
 
-                    await dump_illustrators(util_en, mstIllustrators)
-                    await dump_cvs(util_en, mstCvs)
+            await dump_illustrators(util_en, mstIllustrators)
+            await dump_cvs(util_en, mstCvs)
 
-                    await dump_basic_servants(util_en, "basic_svt", all_svts)
-                    await dump_nice_items(util_en, mstItems)
-                    await dump_nice_mcs(util_en, mstEquips)
-                    await dump_nice_ccs(util_en, mstCcs)
-                    await dump_nice_bgms(util_en, bgms)
-                    await dump_nice_wars(util_en, mstWars)
-                    await dump_nice_events(util_en, mstEvents)
+            await dump_basic_servants(util_en, "basic_svt", all_svts)
+            await dump_nice_items(util_en, mstItems)
+            await dump_nice_mcs(util_en, mstEquips)
+            await dump_nice_ccs(util_en, mstCcs)
+            await dump_nice_bgms(util_en, bgms)
 
-                await dump_svt(util, "nice_servant", all_servants)
-                await dump_svt(util, "nice_equip", all_equips)
+    unit_results = await units_task
+    write_manifest(cache_path, get_updated_manifest(export_version, unit_results))
 
-            run_time = time.perf_counter() - start_time
-            logger.info(f"Exported {region} data in {run_time:.2f}s.")
+    shard_manifest = get_shard_manifest(
+        region, await get_repo_version(redis, region), unit_results
+    )
+    last_shard_manifest = read_shard_manifest(export_path)
+    write_shard_manifest(export_path, shard_manifest)
+    delta_path = await write_delta(export_path, last_shard_manifest, shard_manifest)
+    if delta_path:
+        logger.info(f"Wrote {region} export delta {delta_path.name}.")
+    removed_shards = prune_shards(export_path, shard_manifest)
+    if removed_shards:
+        logger.info(f"Removed {removed_shards} {region} export shards.")
+
+    await precompress_exports(export_path)
+
+    run_time = time.perf_counter() - start_time
+    unit_time = sum(result.run_time for result in unit_results)
+    rebuilt = sum(result.rebuilt for result in unit_results)
+    worker_peak_memory = max(
+        (result.peak_memory or 0 for result in unit_results), default=None
+    )
+    entity_count = sum(len(result.unit.ids) for result in unit_results)
+    logger.info(
+        f"Exported {region} data in {run_time:.2f}s "
+        f"({len(unit_results)} units, {unit_time:.2f}s of worker time, "
+        f"{rebuilt}/{entity_count} entities rebuilt, "
+        f"{format_memory(get_peak_memory())} peak memory, "
+        f"{format_memory(worker_peak_memory)} worker peak memory)."
+    )
 
 
 async def update_master_repo_info(
     redis: Redis, region_path: dict[Region, DirectoryPath]
 ) -> None:
     for region, gamedata in region_path.items():
-        if (gamedata / ".git").exists():
-            repo = Repo(gamedata)
-            latest_commit = repo.commit()
-            repo_info = RepoInfo(
-                hash=latest_commit.hexsha[:6],
-                timestamp=latest_commit.committed_date,  # pyright: reportGeneralTypeIssues=false
-            )
+        repo_info = get_repo_info(gamedata)
+        if repo_info is not None:
             await set_repo_version(redis, region, repo_info)
 
 
@@ -434,10 +466,8 @@ async def load_svt_extra(
     logger.info(f"Loaded extra svt data in {extra_loading_time:.2f}s.")
 
 
-async def load_and_export(
-    redis: Redis,
-    region_path: dict[Region, DirectoryPath],
-    async_engines: dict[Region, AsyncEngine],
+async def load_data(
+    redis: Redis, region_path: dict[Region, DirectoryPath]
 ) -> None:  # pragma: no cover
     if settings.write_postgres_data:
         update_db(region_path)
@@ -448,7 +478,16 @@ async def load_and_export(
     await update_master_repo_info(redis, region_path)
     if settings.clear_redis_cache:
         await clear_bloom_redis_cache(redis)
-    await generate_exports(redis, region_path, async_engines)
+
+
+async def load_and_export(
+    redis: Redis,
+    region_path: dict[Region, DirectoryPath],
+    async_engines: dict[Region, AsyncEngine],
+) -> None:  # pragma: no cover
+    await load_data(redis, region_path)
+    if settings.export_all_nice:
+        await generate_exports(redis, region_path, async_engines)
 
 
 def update_data_repo(
@@ -482,3 +521,80 @@ async def pull_and_update(
     await run_in_threadpool(lambda: update_data_repo(region_path))
     await load_and_export(redis, region_path, async_engines)
     await report_webhooks(region_path)
+
+
+async def prefetch_quest_phases(
+    redis: Redis, region: Region, engine: AsyncEngine, claim_token: Optional[str] = None
+) -> int:  # pragma: no cover
+    """
+    Build the stages cache of the open quest phases and the quest phases with the
+    latest Rayshift data so the first requests after an event starts are cached.
+    The stages cache is shared by all languages so each phase is built once.
+    Only the Rayshift data already in the db is used, there are no live lookups.
+    After each phase, sleep long enough that building takes at most
+    `quest_prefetch_cpu_budget` of the time.
+    If `claim_token` is given, the prefetch claim is renewed before each phase and
+    the run stops if the claim was lost.
+    Return the number of quest phases prefetched.
+    """
+    async with engine.connect() as conn:
+        quest_phases = await get_open_quest_phases(
+            conn, int(time.time()), settings.quest_prefetch_limit
+        )
+        latest_phases = await get_latest_quest_with_enemies(
+            conn, settings.quest_prefetch_limit
+        )
+    quest_phases = list(
+        dict.fromkeys(
+            [
+                *quest_phases,
+                *((phase.questId, phase.phase) for phase in latest_phases),
+            ]
+        )
+    )
+
+    prefetched = 0
+    for quest_id, phase in quest_phases:
+        if claim_token and not await renew_quest_prefetch(redis, region, claim_token):
+            logger.warning(f"Lost the {region} quest prefetch claim, stopping.")
+            break
+        start_time = time.perf_counter()
+        try:
+            async with engine.connect() as conn:
+                await get_nice_quest_phase(
+                    conn, redis, region, quest_id, phase, rayshift_live_lookup=False
+                )
+            prefetched += 1
+        except Exception:  # pylint: disable=broad-except
+            logger.exception(f"Failed to prefetch {region} quest {quest_id}/{phase}")
+        build_time = time.perf_counter() - start_time
+        budget = settings.quest_prefetch_cpu_budget
+        await asyncio.sleep(build_time * (1 - budget) / budget)
+
+    return prefetched
+
+
+async def prefetch_quest_phases_forever(
+    redis: Redis, async_engines: dict[Region, AsyncEngine]
+) -> None:  # pragma: no cover
+    """
+    Prefetch the quest phases every `quest_prefetch_interval` seconds.
+    Only one worker prefetches a region in each interval.
+    """
+    claim_token = uuid.uuid4().hex
+    while True:
+        for region in settings.data:
+            try:
+                if await claim_quest_prefetch(redis, region, claim_token):
+                    start_time = time.perf_counter()
+                    prefetched = await prefetch_quest_phases(
+                        redis, region, async_engines[region], claim_token
+                    )
+                    prefetch_time = time.perf_counter() - start_time
+                    logger.info(
+                        f"Prefetched {prefetched} {region} quest phases "
+                        f"in {prefetch_time:.2f}s."
+                    )
+            except Exception:  # pylint: disable=broad-except
+                logger.exception(f"Failed to prefetch {region} quest phases")
+        await asyncio.sleep(settings.quest_prefetch_interval)
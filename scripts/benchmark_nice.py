@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import time
+
+from app.core.nice.nice import get_nice_servant_model
+from app.db.engine import async_engines
+from app.schemas.common import FieldProjection, Language, Region
+
+
+async def time_servant_builds(
+    region: Region, svt_ids: list[int], projection: FieldProjection, repeat: int
+) -> float:
+    async with async_engines[region].connect() as conn:
+        start_time = time.perf_counter()
+        for _ in range(repeat):
+            for svt_id in svt_ids:
+                nice_svt = await get_nice_servant_model(
+                    conn, region, svt_id, Language.jp, projection=projection
+                )
+                nice_svt.json(exclude_unset=True, exclude_none=True)
+        return (time.perf_counter() - start_time) / (repeat * len(svt_ids))
+
+
+async def main(
+    region: Region, svt_ids: list[int], fields: list[str], repeat: int
+) -> None:
+    projection = FieldProjection(tuple(sorted(fields)))
+    full_time = await time_servant_builds(region, svt_ids, FieldProjection(), repeat)
+    projected_time = await time_servant_builds(region, svt_ids, projection, repeat)
+    print(f"Full servant: {full_time * 1000:.2f}ms per servant")
+    print(
+        f"Servant with {', '.join(projection.fields)}: "
+        f"{projected_time * 1000:.2f}ms per servant "
+        f"({full_time / projected_time:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time building nice servants with and without field projection."
+    )
+    parser.add_argument("--region", "-r", type=Region, default=Region.JP)
+    parser.add_argument(
+        "--svt-id",
+        "-s",
+        help="svt_id to build. Defaults to Mash, Altria and Dantes.",
+        type=int,
+        action="append",
+        required=False,
+    )
+    parser.add_argument(
+        "--field",
+        "-f",
+        help="nice servant field to keep in the projected build",
+        action="append",
+        required=False,
+    )
+    parser.add_argument("--repeat", "-n", type=int, default=5)
+
+    args = parser.parse_args()
+
+    asyncio.run(
+        main(
+            args.region,
+            args.svt_id or [800100, 100100, 1100200],
+            args.field or ["id", "name", "className", "rarity"],
+            args.repeat,
+        )
+    )
@@ -0,0 +1,121 @@
+import argparse
+import asyncio
+import time
+
+import orjson
+from pydantic.json import pydantic_encoder
+
+from app.core.nice.nice import get_nice_servant_model
+from app.core.nice.normalized import get_normalized_servant_list
+from app.core.nice.war import get_nice_war
+from app.db.engine import async_engines
+from app.routers.utils import (
+    CBOR_MIME,
+    MSGPACK_MIME,
+    dump_binary,
+    list_string,
+    model_dict,
+)
+from app.schemas.base import BaseModelORJson
+from app.schemas.common import Language, Region
+from app.schemas.nice import NiceServant
+
+
+def time_encode(name: str, item: BaseModelORJson, repeat: int) -> None:
+    json_size = len(item.json(exclude_unset=True, exclude_none=True).encode("utf-8"))
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        item.json(exclude_unset=True, exclude_none=True)
+    json_time = (time.perf_counter() - start_time) / repeat
+    print(f"{name} JSON: {json_size:,} bytes, {json_time * 1000:.2f}ms")
+
+    for media_type in (MSGPACK_MIME, CBOR_MIME):
+        size = len(dump_binary(model_dict(item), media_type))
+        start_time = time.perf_counter()
+        for _ in range(repeat):
+            dump_binary(model_dict(item), media_type)
+        encode_time = (time.perf_counter() - start_time) / repeat
+        print(
+            f"{name} {media_type}: {size:,} bytes ({size / json_size:.0%}), "
+            f"{encode_time * 1000:.2f}ms ({encode_time / json_time:.2f}x)"
+        )
+
+
+def time_normalized(servants: list[NiceServant], repeat: int) -> None:
+    json_size = len(list_string(servants).encode("utf-8"))
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        list_string(servants)
+    json_time = (time.perf_counter() - start_time) / repeat
+    print(
+        f"{len(servants)} NiceServants JSON: {json_size:,} bytes, {json_time * 1000:.2f}ms"
+    )
+
+    def dump_normalized() -> bytes:
+        return orjson.dumps(
+            get_normalized_servant_list(servants),
+            default=pydantic_encoder,
+            option=orjson.OPT_NON_STR_KEYS,
+        )
+
+    size = len(dump_normalized())
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        dump_normalized()
+    normalized_time = (time.perf_counter() - start_time) / repeat
+    print(
+        f"{len(servants)} NiceServants normalized JSON: {size:,} bytes ({size / json_size:.0%}), "
+        f"{normalized_time * 1000:.2f}ms ({normalized_time / json_time:.2f}x)"
+    )
+
+
+async def main(
+    region: Region, svt_ids: list[int], war_ids: list[int], repeat: int
+) -> None:
+    async with async_engines[region].connect() as conn:
+        servants: list[NiceServant] = []
+        for svt_id in svt_ids:
+            nice_svt = await get_nice_servant_model(
+                conn, region, svt_id, Language.jp, lore=True
+            )
+            time_encode(f"NiceServant {svt_id}", nice_svt, repeat)
+            servants.append(nice_svt)
+        time_normalized(servants, repeat)
+        for war_id in war_ids:
+            nice_war = await get_nice_war(conn, region, war_id, Language.jp)
+            time_encode(f"NiceWar {war_id}", nice_war, repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare JSON, msgpack, CBOR and normalized JSON sizes and encode times."
+    )
+    parser.add_argument("--region", "-r", type=Region, default=Region.JP)
+    parser.add_argument(
+        "--svt-id",
+        "-s",
+        help="svt_id of the NiceServant to encode. Defaults to Mash and Altria.",
+        type=int,
+        action="append",
+        required=False,
+    )
+    parser.add_argument(
+        "--war-id",
+        "-w",
+        help="war_id of the NiceWar to encode. Defaults to Fuyuki and Camelot.",
+        type=int,
+        action="append",
+        required=False,
+    )
+    parser.add_argument("--repeat", "-n", type=int, default=20)
+
+    args = parser.parse_args()
+
+    asyncio.run(
+        main(
+            args.region,
+            args.svt_id or [800100, 100100],
+            args.war_id or [100, 306],
+            args.repeat,
+        )
+    )
@@ -0,0 +1,116 @@
+import argparse
+import time
+from dataclasses import dataclass, field
+
+from app.core.nice.svt.voice import get_nice_voice
+from app.schemas.common import Language, Region
+from app.schemas.gameenums import SvtVoiceType, VoiceCondType
+from app.schemas.raw import (
+    GlobalNewMstSubtitle,
+    MstSvtGroup,
+    MstSvtVoice,
+    MstVoice,
+    MstVoicePlayCond,
+    ScriptJson,
+    ScriptJsonCond,
+    ScriptJsonInfo,
+)
+
+
+@dataclass
+class VoiceFixture:
+    mstSvtVoice: list[MstSvtVoice] = field(default_factory=list)
+    mstVoice: list[MstVoice] = field(default_factory=list)
+    mstVoicePlayCond: list[MstVoicePlayCond] = field(default_factory=list)
+    mstSvtGroup: list[MstSvtGroup] = field(default_factory=list)
+    mstSubtitle: list[GlobalNewMstSubtitle] = field(default_factory=list)
+
+
+def get_voice_fixture(svt_count: int, lines_per_svt: int) -> VoiceFixture:
+    """
+    An event with `svt_count` voiced servants. Every voice line has a subtitle,
+    a play condition and a svt group condition.
+    """
+    fixture = VoiceFixture()
+    for svt_index in range(svt_count):
+        svt_id = 100100 + svt_index * 100
+        fixture.mstSvtGroup.append(MstSvtGroup(id=svt_index, svtId=svt_id))
+        scripts: list[ScriptJson] = []
+        for line in range(lines_per_svt):
+            voice_id = f"EV{line:03}0"
+            info_id = f"0_{voice_id}"
+            scripts.append(
+                ScriptJson(
+                    summonScript=None,
+                    overwriteName=None,
+                    overwritePriority=None,
+                    infos=[ScriptJsonInfo(id=info_id, face=0, delay=0, text="")],
+                    conds=[
+                        ScriptJsonCond(
+                            condType=VoiceCondType.SVT_GROUP, value=svt_index
+                        )
+                    ],
+                )
+            )
+            fixture.mstSubtitle.append(
+                GlobalNewMstSubtitle(id=f"{svt_id}_{info_id}", serif="serif")
+            )
+            fixture.mstVoicePlayCond.append(
+                MstVoicePlayCond(
+                    svtId=svt_id,
+                    voicePrefix=0,
+                    voiceId=voice_id,
+                    idx=0,
+                    condGroup=1,
+                    condType=1,
+                    targetId=0,
+                    condValues=[0],
+                )
+            )
+        fixture.mstSvtVoice.append(
+            MstSvtVoice(
+                scriptJson=scripts,
+                scriptJsonAdditory=None,
+                id=svt_id,
+                voicePrefix=0,
+                type=SvtVoiceType.EVENT_REWARD,
+            )
+        )
+    return fixture
+
+
+def main(svt_counts: list[int], lines_per_svt: int, repeat: int) -> None:
+    for svt_count in svt_counts:
+        fixture = get_voice_fixture(svt_count, lines_per_svt)
+        start_time = time.perf_counter()
+        for _ in range(repeat):
+            get_nice_voice(Region.JP, fixture, {}, Language.jp)
+        build_time = (time.perf_counter() - start_time) / repeat
+        line_count = svt_count * lines_per_svt
+        print(
+            f"{svt_count} svts, {line_count:,} voice lines: {build_time * 1000:.2f}ms, "
+            f"{build_time / line_count * 1_000_000:.2f}µs per voice line"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time building the voice groups of synthetic events "
+        "with more and more voiced servants."
+    )
+    parser.add_argument(
+        "--svt-count",
+        "-s",
+        help="Number of voiced servants in the event. Defaults to 25, 50, 100 and 200.",
+        type=int,
+        action="append",
+        required=False,
+    )
+    parser.add_argument(
+        "--lines", "-l", help="Voice lines per svt", type=int, default=20
+    )
+    parser.add_argument("--repeat", "-n", type=int, default=5)
+
+    args = parser.parse_args()
+
+    main(args.svt_count or [25, 50, 100, 200], args.lines, args.repeat)
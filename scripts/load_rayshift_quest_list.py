@@ -1,19 +1,37 @@
 import argparse
+import asyncio
 import time
 
 import httpx
 
+from app.db.engine import async_engines
 from app.db.load import (
     get_all_missing_query_ids,
     get_missing_query_ids,
-    load_rayshift_quest_details,
     load_rayshift_quest_list,
 )
-from app.rayshift.quest import get_all_quest_lists, get_multiple_quests
+from app.rayshift.bulk import bulk_load_quest_details
+from app.rayshift.quest import get_all_quest_lists
 from app.schemas.common import Region
 
 
-def main(quest_ids: list[int], load_all: bool = False, no_load: bool = False) -> None:
+async def load_quest_details(
+    region: Region, query_ids: list[int], concurrency: int
+) -> int:
+    try:
+        return await bulk_load_quest_details(
+            async_engines[region], region, query_ids, concurrency
+        )
+    finally:
+        await async_engines[region].dispose()
+
+
+def main(
+    quest_ids: list[int],
+    load_all: bool = False,
+    no_load: bool = False,
+    concurrency: int = 8,
+) -> None:
     client = httpx.Client(follow_redirects=True, timeout=60)
     for region in [Region.NA, Region.JP]:
         print(f"Loading {region} rayshift data cache …")
@@ -42,14 +60,8 @@ def main(quest_ids: list[int], load_all: bool = False, no_load: bool = False) ->
         print(f"Loading {len(query_ids)} query IDs")
 
         if query_ids:
-            QUERY_IDS_PER_REQUEST = 25
-            for i in range(0, len(query_ids), QUERY_IDS_PER_REQUEST):
-                request_query_ids = query_ids[i : i + QUERY_IDS_PER_REQUEST]
-                quest_details = get_multiple_quests(client, region, request_query_ids)
-                load_rayshift_quest_details(region, quest_details)
-                print(
-                    f"Loaded {min(i + QUERY_IDS_PER_REQUEST, len(query_ids))} query IDs"
-                )
+            loaded = asyncio.run(load_quest_details(region, query_ids, concurrency))
+            print(f"Loaded {loaded} query IDs")
 
         rayshift_load_time = time.perf_counter() - start_loading_time
         print(f"Loaded {region} rayshift in {rayshift_load_time:.2f}s.")
@@ -77,6 +89,15 @@ if __name__ == "__main__":
         required=False,
     )
 
+    parser.add_argument(
+        "--concurrency",
+        "-c",
+        help="Maximum number of Rayshift requests in flight. "
+        "Interrupted loads resume from the last checkpoint.",
+        type=int,
+        default=8,
+    )
+
     args = parser.parse_args()
 
-    main(args.quest_id, args.all, args.no_load)
+    main(args.quest_id, args.all, args.no_load, args.concurrency)
@@ -44,6 +44,14 @@ class TestMain:
         response = await client.get("/export/NA/NiceClassAttackRate.json")
         assert response.status_code == 200
 
+    async def test_export_compressed(self, client: AsyncClient) -> None:
+        response = await client.get(
+            "/export/JP/NiceClassRelation.json", headers={"Accept-Encoding": "gzip"}
+        )
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "saber" in response.json()
+
     async def test_info(self, client: AsyncClient) -> None:
         response = (await client.get("/info")).json()
         assert len(response["NA"]["hash"]) == 6
@@ -1,18 +1,103 @@
+import gzip
+import os
+import zlib
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import AsyncIterator
+
+import cbor2
+import httpx
+import msgpack
 import orjson
 import pytest
 from fastapi import HTTPException
+from pydantic import ValidationError
+from redis.asyncio import Redis  # type: ignore
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncConnection
+from starlette.types import Message, Receive, Scope, Send
 
+from app.config import Settings
+from app.core.name_index import NameIndex
 from app.core.nice.func import parse_dataVals
+from app.core.nice.normalized import (
+    get_normalized_quest_phase,
+    get_normalized_servant_list,
+)
+from app.core.reverse import ReverseTree, get_unique_ids
+from app.core.search import match_name
+from app.core.svt_filter import SvtFilterData, SvtFilterIndex, get_trait_variants
 from app.core.utils import get_voice_name, sort_by_collection_no
 from app.data.custom_mappings import Translation
+from app.data.reverse_index import (
+    ReverseMap,
+    get_reverse_index_path,
+    read_reverse_index,
+    serialize_reverse_index,
+)
 from app.data.script import get_script_path, get_script_text_only, remove_brackets
-from app.routers.utils import list_string_exclude
+from app.db.helpers.quest import get_open_quest_phases
+from app.db.helpers.rayshift import get_rayshift_drops
+from app.export.delta import ExportChangeType, get_shard_changes, write_delta
+from app.export.manifest import (
+    ExportManifest,
+    get_entity_hash,
+    read_cached_fragments,
+    read_manifest,
+    write_cached_fragments,
+    write_manifest,
+)
+from app.export.parallel import (
+    ExportUnitKind,
+    ExportUnitResult,
+    get_export_units,
+    get_shard_manifest,
+    get_updated_manifest,
+    serialize_entity,
+)
+from app.export.shard import (
+    ExportShardManifest,
+    prune_shards,
+    write_shard,
+    write_shard_manifest,
+)
+from app.export.writer import ExportWriter
+from app.main import custom_key_builder
+from app.models.raw import mstQuest
+from app.models.rayshift import rayshiftQuest
+from app.rayshift.bulk import RayshiftCheckpoint, bulk_fetch_quest_details
+from app.rayshift.quest import load_quest_response, wait_quest_response
+from app.redis.helpers.quest import (
+    claim_rayshift_call,
+    release_rayshift_call,
+    set_rayshift_call_miss,
+)
+from app.routers.compression import (
+    CompressionMiddleware,
+    PrecompressedStaticFiles,
+    get_accepted_encodings,
+    write_precompressed_files,
+)
+from app.routers.utils import (
+    CBOR_MIME,
+    MSGPACK_MIME,
+    ListStreamingResponse,
+    get_response_format,
+    item_response,
+    list_string_exclude,
+    response_format,
+)
 from app.schemas.basic import BasicServant
-from app.schemas.common import Language, Region, ReverseDepth
+from app.schemas.common import FieldProjection, Language, Region, RepoInfo, ReverseDepth
 from app.schemas.gameenums import FuncType
-from app.schemas.nice import NiceServant
+from app.schemas.nice import (
+    NiceNormalizedQuestPhaseResponse,
+    NiceNormalizedServantListResponse,
+    NiceQuestPhase,
+    NiceServant,
+)
 from app.schemas.raw import ScriptJsonInfo, get_subtitle_svtId
+from app.schemas.rayshift import QuestDetail
 
 from .utils import get_response_data, get_text_data
 
@@ -58,6 +143,78 @@ async def test_parse_dataVals_class_drop_up_rate(na_db_conn: AsyncConnection) ->
     }
 
 
+@pytest.mark.asyncio
+async def test_get_open_quest_phases(na_db_conn: AsyncConnection) -> None:
+    now = 1640000000
+    quest_phases = await get_open_quest_phases(na_db_conn, now, 50)
+    assert 0 < len(quest_phases) <= 50
+
+    stmt = select(mstQuest.c.id, mstQuest.c.openedAt, mstQuest.c.closedAt).where(
+        mstQuest.c.id.in_({quest_id for quest_id, _ in quest_phases})
+    )
+    quests = {row.id: row for row in (await na_db_conn.execute(stmt)).fetchall()}
+    opened_at = [quests[quest_id].openedAt for quest_id, _ in quest_phases]
+    assert opened_at == sorted(opened_at, reverse=True)
+    assert all(
+        quests[quest_id].openedAt <= now < quests[quest_id].closedAt
+        for quest_id, _ in quest_phases
+    )
+
+    assert await get_open_quest_phases(na_db_conn, 0) == []
+
+
+@pytest.mark.asyncio
+async def test_rayshift_drops(na_db_conn: AsyncConnection) -> None:
+    quest_id, phase = 94034503, 1
+    stmt = select(rayshiftQuest.c.questDetail).where(
+        rayshiftQuest.c.questId == quest_id,
+        rayshiftQuest.c.phase == phase,
+        rayshiftQuest.c.questDetail.isnot(None),
+    )
+    quest_details = [
+        QuestDetail.parse_obj(row.questDetail)
+        for row in (await na_db_conn.execute(stmt)).fetchall()
+    ]
+    assert quest_details
+
+    # Count the drops of each run the way the old query over questDetail did
+    run_counts: dict[tuple[int, str, int, int, int, int], list[int]] = defaultdict(list)
+    for quest_detail in quest_details:
+        drop_counts: Counter[tuple[int, str, int, int, int, int]] = Counter()
+        for deck_type, decks in (
+            ("enemy", quest_detail.enemyDeck),
+            ("shift", quest_detail.shiftDeck),
+        ):
+            for stage, deck in enumerate(decks, 1):
+                for svt in deck.svts:
+                    for drop in svt.dropInfos or []:
+                        drop_key = (drop.type, drop.objectId, drop.originalNum)
+                        drop_counts[(stage, deck_type, svt.id, *drop_key)] += 1
+                        drop_counts[(-1, "enemy", -1, *drop_key)] += 1
+        for drop_key, count in drop_counts.items():
+            run_counts[drop_key].append(count)
+    expected = sorted(
+        (*drop_key, len(quest_details), sum(counts), sum(c * c for c in counts))
+        for drop_key, counts in run_counts.items()
+    )
+
+    drops = await get_rayshift_drops(na_db_conn, quest_id, phase)
+    assert expected == sorted(
+        (
+            drop.stage,
+            drop.deckType.value,
+            drop.deckId,
+            drop.type,
+            drop.objectId,
+            drop.originalNum,
+            drop.runs,
+            drop.dropCount,
+            drop.sumDropCountSquared,
+        )
+        for drop in drops
+    )
+
+
 cases_datavals_fail_dict = {
     "test_dataVals_fail_str_dataVals_no_value": "[HideMiss]",
     "test_dataVals_fail_str_dataVals_str_value": "[HideMiss:123/abc]",
@@ -166,3 +323,696 @@ def test_TW_odd_voice_id() -> None:
         id="御主任務 2021年4月 2", face=13, delay=0.3, text="0_A1430", form=0
     )
     assert script_json.get_voice_id() == "御主任務 2021年4月 2"
+
+
+def test_accepted_encodings() -> None:
+    assert [
+        encoding.name for encoding in get_accepted_encodings("gzip, deflate, br")
+    ] == ["br", "gzip"]
+    assert [
+        encoding.name for encoding in get_accepted_encodings("gzip;q=1.0, br;q=0.5")
+    ] == ["gzip", "br"]
+    assert get_accepted_encodings("identity") == []
+    assert get_accepted_encodings("*;q=0") == []
+
+
+def test_write_precompressed_files(tmp_path: Path) -> None:
+    export_file = tmp_path / "nice_servant.json"
+    export_file.write_bytes(b'[{"id":100100}]' * 100)
+
+    write_precompressed_files(export_file)
+
+    gzip_file = tmp_path / "nice_servant.json.gz"
+    assert gzip.decompress(gzip_file.read_bytes()) == export_file.read_bytes()
+
+
+@pytest.mark.asyncio
+async def test_precompressed_static_files(tmp_path: Path) -> None:
+    export_file = tmp_path / "nice_servant.json"
+    export_file.write_bytes(b'[{"id":100100}]' * 100)
+    write_precompressed_files(export_file)
+
+    static_app = PrecompressedStaticFiles(directory=tmp_path)
+    async with httpx.AsyncClient(app=static_app, base_url="http://test") as client:
+        headers = {"Accept-Encoding": "gzip"}
+        response = await client.get("/nice_servant.json", headers=headers)
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.content == export_file.read_bytes()
+
+        # The source file was replaced after the sibling was written
+        gzip_file = tmp_path / "nice_servant.json.gz"
+        source_mtime = export_file.stat().st_mtime
+        os.utime(gzip_file, (source_mtime - 10, source_mtime - 10))
+        response = await client.get("/nice_servant.json", headers=headers)
+        assert "Content-Encoding" not in response.headers
+        assert response.content == export_file.read_bytes()
+
+
+def test_cache_key_projection() -> None:
+    def get_item(item_id: int, projection: FieldProjection) -> None:
+        pass  # pragma: no cover
+
+    big_id = 2**64
+    key = custom_key_builder(
+        get_item,
+        "",
+        args=(),
+        kwargs={"item_id": big_id, "projection": FieldProjection()},
+    )
+    projected_key = custom_key_builder(
+        get_item,
+        "",
+        args=(),
+        kwargs={"item_id": big_id, "projection": FieldProjection(fields=("id",))},
+    )
+    assert key != projected_key
+
+
+def test_field_projection() -> None:
+    projection = FieldProjection(
+        fields=("id", "skills", "profile"), exclude=("profile",)
+    )
+    assert "skills" in projection
+    assert "profile" not in projection
+    assert "noblePhantasms" not in projection
+    assert "noblePhantasms" in FieldProjection()
+    assert not FieldProjection()
+
+    test_data = get_response_data("test_data_nice", "NA_Dantes_lore_costume")
+    projected = projection.parse_obj(NiceServant, test_data)
+    assert orjson.loads(projected.json(exclude_unset=True)).keys() == {"id", "skills"}
+    assert projected == projection.parse_obj(NiceServant, test_data | {"profile": 1})
+
+    with pytest.raises(ValidationError):
+        projection.parse_obj(NiceServant, test_data | {"skills": 1})
+
+
+@pytest.mark.asyncio
+async def test_list_streaming_response() -> None:
+    test_data = NiceServant.parse_obj(
+        get_response_data("test_data_nice", "NA_Dantes_lore_costume")
+    )
+
+    async def get_servants() -> AsyncIterator[NiceServant]:
+        for _ in range(3):
+            yield test_data
+
+    cached_bodies: list[bytes] = []
+
+    async def on_complete(body: bytes) -> None:
+        cached_bodies.append(body)
+
+    response = ListStreamingResponse(get_servants())
+    response.on_complete = on_complete
+    body = b"".join([chunk async for chunk in response.body_iterator])  # type: ignore
+
+    assert [servant["id"] for servant in orjson.loads(body)] == [test_data.id] * 3
+    assert cached_bodies == [body]
+
+
+@pytest.mark.asyncio
+async def test_list_streaming_response_not_cached() -> None:
+    test_data = NiceServant.parse_obj(
+        get_response_data("test_data_nice", "NA_Dantes_lore_costume")
+    )
+
+    async def get_servants() -> AsyncIterator[NiceServant]:
+        for _ in range(3):
+            yield test_data
+
+    async def get_servants_error() -> AsyncIterator[NiceServant]:
+        yield test_data
+        raise RuntimeError("db error")
+
+    cached_bodies: list[bytes] = []
+
+    async def on_complete(body: bytes) -> None:
+        cached_bodies.append(body)
+
+    response = ListStreamingResponse(get_servants())
+    response.on_complete = on_complete
+    response.max_cached_size = 100
+    body = b"".join([chunk async for chunk in response.body_iterator])  # type: ignore
+    assert len(orjson.loads(body)) == 3
+
+    response = ListStreamingResponse(get_servants_error())
+    response.on_complete = on_complete
+    with pytest.raises(RuntimeError):
+        async for _ in response.body_iterator:  # type: ignore
+            pass
+
+    assert cached_bodies == []
+
+
+@pytest.mark.asyncio
+async def test_list_streaming_response_empty() -> None:
+    async def get_servants() -> AsyncIterator[NiceServant]:
+        return
+        yield  # pylint: disable=unreachable
+
+    response = ListStreamingResponse(get_servants())
+    body = b"".join([chunk async for chunk in response.body_iterator])  # type: ignore
+    assert orjson.loads(body) == []
+
+
+def test_response_format() -> None:
+    assert get_response_format("") == "application/json"
+    assert get_response_format("*/*") == "application/json"
+    assert get_response_format("application/x-msgpack") == MSGPACK_MIME
+    assert get_response_format("application/json, application/cbor") == (
+        "application/json"
+    )
+    assert get_response_format("application/cbor, application/json;q=0.5") == (
+        CBOR_MIME
+    )
+
+
+@pytest.mark.asyncio
+async def test_binary_responses() -> None:
+    test_data = NiceServant.parse_obj(
+        get_response_data("test_data_nice", "NA_Dantes_lore_costume")
+    )
+
+    async def get_servants() -> AsyncIterator[NiceServant]:
+        for _ in range(2):
+            yield test_data
+
+    token = response_format.set(MSGPACK_MIME)
+    try:
+        response = item_response(test_data)
+        assert response.media_type == MSGPACK_MIME
+        servant = msgpack.unpackb(response.body, strict_map_key=False)
+        assert servant["collectionNo"] == test_data.collectionNo
+
+        stream = ListStreamingResponse(get_servants(), 2)
+        body = b"".join([chunk async for chunk in stream.body_iterator])  # type: ignore
+        assert msgpack.unpackb(body, strict_map_key=False) == [servant, servant]
+    finally:
+        response_format.reset(token)
+
+    token = response_format.set(CBOR_MIME)
+    try:
+        stream = ListStreamingResponse(get_servants())
+        body = b"".join([chunk async for chunk in stream.body_iterator])  # type: ignore
+        assert [svt["id"] for svt in cbor2.loads(body)] == [test_data.id] * 2
+    finally:
+        response_format.reset(token)
+
+
+@pytest.mark.asyncio
+async def test_response_vary_header() -> None:
+    test_data = NiceServant.parse_obj(
+        get_response_data("test_data_nice", "NA_Dantes_lore_costume")
+    )
+
+    async def servant_app(scope: Scope, receive: Receive, send: Send) -> None:
+        await item_response(test_data)(scope, receive, send)
+
+    assert item_response(test_data).headers["Vary"] == "Accept"
+
+    compressed_app = CompressionMiddleware(servant_app)
+    async with httpx.AsyncClient(app=compressed_app, base_url="http://test") as client:
+        response = await client.get("/", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["Vary"] == "Accept, Accept-Encoding"
+
+
+@pytest.mark.asyncio
+async def test_compression_stream_flush() -> None:
+    chunks = [b"[" + b"1" * 2048, b"," + b"2" * 2048, b"]"]
+
+    async def stream_app(scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        for i, chunk in enumerate(chunks):
+            more_body = i < len(chunks) - 1
+            await send(
+                {"type": "http.response.body", "body": chunk, "more_body": more_body}
+            )
+
+    messages: list[Message] = []
+
+    async def receive() -> Message:  # pragma: no cover
+        return {"type": "http.request"}
+
+    async def send(message: Message) -> None:
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(b"accept-encoding", b"gzip")],
+    }
+    await CompressionMiddleware(stream_app)(scope, receive, send)
+
+    # Every compressed chunk can be decompressed as soon as it's received
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    bodies = [message["body"] for message in messages[1:]]
+    assert [decompressor.decompress(body) for body in bodies] == chunks
+    assert decompressor.eof
+
+
+def test_normalized_servants() -> None:
+    test_data = NiceServant.parse_obj(
+        get_response_data("test_data_nice", "NA_Dantes_lore_costume")
+    )
+    normalized = get_normalized_servant_list([test_data, test_data])
+    NiceNormalizedServantListResponse.parse_obj(normalized)
+
+    first_skill = normalized["servants"][0]["skills"][0]
+    assert (
+        first_skill["functions"] == normalized["servants"][1]["skills"][0]["functions"]
+    )
+    first_function = normalized["functions"][first_skill["functions"][0]]
+    assert first_function["funcId"] == test_data.skills[0].functions[0].funcId
+    for buff_key in first_function["buffs"]:
+        assert buff_key in normalized["buffs"]
+
+    # The second servant's functions are all in the table already
+    function_count = sum(
+        len(skill.functions)
+        for skill in test_data.skills
+        + test_data.classPassive
+        + test_data.extraPassive
+        + test_data.noblePhantasms
+        + [append_passive.skill for append_passive in test_data.appendPassive]
+    )
+    assert len(normalized["functions"]) <= function_count
+
+
+def test_normalized_quest_phase() -> None:
+    for file_name in ("NA_CCC_Detour_3", "JP_support_servant"):
+        test_data = NiceQuestPhase.parse_obj(
+            get_response_data("test_data_nice", file_name)
+        )
+        normalized = get_normalized_quest_phase(test_data)
+        NiceNormalizedQuestPhaseResponse.parse_obj(normalized)
+
+        skills = [
+            skill
+            for enemy in normalized["questPhase"]["stages"][0]["enemies"]
+            + normalized["questPhase"]["supportServants"]
+            for skill in enemy["skills"].values()
+            if isinstance(skill, dict)
+        ]
+        assert skills
+        for skill in skills:
+            for function_key in skill["functions"]:
+                assert function_key in normalized["functions"]
+
+
+def test_export_units() -> None:
+    svt_ids = [100100, 100200, 100300, 100400, 100500]
+    units = get_export_units(Region.JP, ExportUnitKind.SVT, "nice_servant", svt_ids, 2)
+    assert [unit.ids for unit in units] == [
+        [100100, 100200],
+        [100300, 100400],
+        [100500],
+    ]
+    assert units[-1].name == "JP nice_servant 100500-100500"
+    assert units[0].get_file_names() == [
+        "nice_servant",
+        "nice_servant_lore",
+        "nice_servant_lang_en",
+        "nice_servant_lore_lang_en",
+    ]
+
+    na_units = get_export_units(Region.NA, ExportUnitKind.WAR, "nice_war", [100], 2)
+    assert na_units[0].get_file_names() == ["nice_war"]
+
+
+def test_serialize_export_entity() -> None:
+    ishtar = NiceServant.parse_obj(
+        get_response_data("test_data_nice", "JP_Space_Ishtar")
+    )
+    unit = get_export_units(
+        Region.JP, ExportUnitKind.SVT, "nice_servant", [ishtar.id], 1
+    )
+    fragments = serialize_entity(unit[0], ishtar)
+    assert list(fragments) == unit[0].get_file_names()
+
+    jp_ishtar = orjson.loads(fragments["nice_servant_lore"])
+    en_ishtar = orjson.loads(fragments["nice_servant_lore_lang_en"])
+    assert jp_ishtar["name"] == en_ishtar["originalName"] == "スペース・イシュタル"
+    assert en_ishtar["name"] == "Space Ishtar"
+    assert en_ishtar["skills"][0]["name"] == "Devil's Sugar A"
+    assert en_ishtar["skills"][0]["originalName"] == jp_ishtar["skills"][0]["name"]
+
+
+def test_export_manifest(tmp_path: Path) -> None:
+    assert read_manifest(tmp_path) == ExportManifest()
+
+    manifest = ExportManifest(
+        version="v1", hashes={"nice_war": {100: "a", 200: "b"}, "nice_event": {}}
+    )
+    write_manifest(tmp_path, manifest)
+    assert read_manifest(tmp_path) == manifest
+
+    units = get_export_units(
+        Region.NA, ExportUnitKind.WAR, "nice_war", [100, 200, 300], 2, manifest
+    )
+    assert [unit.hashes for unit in units] == [{100: "a", 200: "b"}, {}]
+
+    results = [
+        ExportUnitResult(units[0], hashes={100: "a", 200: "c"}, rebuilt=1),
+        ExportUnitResult(units[1], hashes={300: "d"}, rebuilt=1),
+    ]
+    assert get_updated_manifest("v1", results) == ExportManifest(
+        version="v1", hashes={"nice_war": {100: "a", 200: "c", 300: "d"}}
+    )
+
+    # Entities keep their hash unless the entity or its dependencies change
+    entity = ExportManifest(version="v1")
+    entity_hash = get_entity_hash(entity, {"lastWarId": 300})
+    assert get_entity_hash(entity, {"lastWarId": 300}) == entity_hash
+    assert get_entity_hash(entity, {"lastWarId": 301}) != entity_hash
+    assert get_entity_hash(entity) != entity_hash
+    assert get_entity_hash(ExportManifest(version="v2")) != get_entity_hash(entity)
+
+    file_names = ["nice_servant", "nice_servant_lore"]
+    assert read_cached_fragments(tmp_path, file_names, 100100) is None
+    fragments = {"nice_servant": '{"id":100100}', "nice_servant_lore": '{"id":1}'}
+    write_cached_fragments(tmp_path, 100100, fragments)
+    assert read_cached_fragments(tmp_path, file_names, 100100) == fragments
+
+
+def test_export_shards(tmp_path: Path) -> None:
+    shard = write_shard(tmp_path, "war", 100, Language.jp, '{"id":100}', False)
+    assert shard.path == "war/100.json"
+    assert shard.size == 10
+    assert (tmp_path / "war" / "100.json").read_text() == '{"id":100}'
+
+    # Unchanged entities don't rewrite their shard
+    write_shard(tmp_path, "war", 100, Language.jp, '{"id":1}', False)
+    assert (tmp_path / "war" / "100.json").read_text() == '{"id":100}'
+    en_shard = write_shard(tmp_path, "war", 100, Language.en, '{"id":1}', True)
+    assert en_shard.path == "war/100_lang_en.json"
+    write_shard(tmp_path, "war", 200, Language.jp, '{"id":200}', True)
+
+    unit = get_export_units(Region.NA, ExportUnitKind.WAR, "nice_war", [100], 1)[0]
+    repo_version = RepoInfo(hash="abcdef", timestamp=1646200000)
+    manifest = get_shard_manifest(
+        Region.NA, repo_version, [ExportUnitResult(unit, shards=[shard, en_shard])]
+    )
+    assert manifest.shards == {"war": [shard, en_shard]}
+
+    assert prune_shards(tmp_path, manifest) == 1
+    assert not (tmp_path / "war" / "200.json").exists()
+
+    write_shard_manifest(tmp_path, manifest)
+    assert (
+        ExportShardManifest.parse_file(tmp_path / "manifest.json").repoVersion
+        == repo_version
+    )
+
+
+async def test_export_writer(tmp_path: Path) -> None:
+    async with ExportWriter(tmp_path) as writer:
+        await writer.write_items("nice_war", ['{"id":100}', '{"id":200}'])
+        await writer.write_items("nice_war", ['{"id":300}'])
+        await writer.write_items("nice_event", [])
+        assert not (tmp_path / "nice_war.json").exists()
+    assert orjson.loads((tmp_path / "nice_war.json").read_bytes()) == [
+        {"id": 100},
+        {"id": 200},
+        {"id": 300},
+    ]
+    assert orjson.loads((tmp_path / "nice_event.json").read_bytes()) == []
+
+    # The existing file is kept if the export fails
+    with pytest.raises(ValueError):
+        async with ExportWriter(tmp_path) as writer:
+            await writer.write_items("nice_war", ['{"id":400}'])
+            raise ValueError
+    assert len(orjson.loads((tmp_path / "nice_war.json").read_bytes())) == 3
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "nice_event.json",
+        "nice_war.json",
+    ]
+
+
+async def test_export_delta(tmp_path: Path) -> None:
+    old_war = write_shard(tmp_path, "war", 100, Language.jp, '{"id":100}', True)
+    removed_war = write_shard(tmp_path, "war", 200, Language.jp, '{"id":200}', True)
+    old_manifest = ExportShardManifest(
+        region=Region.NA,
+        repoVersion=RepoInfo(hash="aaaaaa", timestamp=1646200000),
+        shards={"war": [old_war, removed_war]},
+    )
+
+    new_war = write_shard(tmp_path, "war", 100, Language.jp, '{"id":100,"a":1}', True)
+    added_event = write_shard(tmp_path, "event", 80, Language.jp, '{"id":80}', True)
+    new_manifest = ExportShardManifest(
+        region=Region.NA,
+        repoVersion=RepoInfo(hash="bbbbbb", timestamp=1646300000),
+        shards={"war": [new_war], "event": [added_event]},
+    )
+
+    assert get_shard_changes(old_manifest, new_manifest) == [
+        ("event", added_event, ExportChangeType.ADDED),
+        ("war", new_war, ExportChangeType.CHANGED),
+        ("war", removed_war, ExportChangeType.REMOVED),
+    ]
+    assert get_shard_changes(new_manifest, new_manifest) == []
+
+    delta_path = await write_delta(tmp_path, old_manifest, new_manifest)
+    assert delta_path == tmp_path / "delta" / "aaaaaa_bbbbbb.json"
+    delta = orjson.loads(delta_path.read_bytes())
+    assert delta["oldVersion"]["hash"] == "aaaaaa"
+    assert delta["newVersion"]["hash"] == "bbbbbb"
+    assert delta["changes"] == [
+        {
+            "type": "event",
+            "id": 80,
+            "lang": "jp",
+            "change": "added",
+            "data": {"id": 80},
+        },
+        {
+            "type": "war",
+            "id": 100,
+            "lang": "jp",
+            "change": "changed",
+            "data": {"id": 100, "a": 1},
+        },
+        {"type": "war", "id": 200, "lang": "jp", "change": "removed"},
+    ]
+
+    assert await write_delta(tmp_path, None, new_manifest) is None
+    assert await write_delta(tmp_path, new_manifest, new_manifest) is None
+
+
+def test_name_index() -> None:
+    names = [
+        (1, "Altria Pendragon"),
+        (1, "アルトリア・ペンドラゴン"),
+        (2, "Altria Pendragon (Alter)"),
+        (3, "Okita Souji"),
+        (4, "Okita Souji (Alter)"),
+        (5, "Scáthach"),
+        (6, "Mysterious Heroine X"),
+        (7, "BB"),
+        (8, "Gilgamesh"),
+        (9, ""),
+    ]
+    name_index = NameIndex(names)
+    for search_name in (
+        "artoria",
+        "altria alter",
+        "okita souji alter",
+        "scathach",
+        "heroine x",
+        "x",
+        "bb",
+        "gilgamesch",
+        "アルトリア",
+        "zzzz",
+        "",
+    ):
+        assert name_index.search(search_name) == {
+            entity_id for entity_id, name in names if match_name(search_name, name)
+        }
+
+
+def test_svt_filter_index() -> None:
+    svt_filter_index = SvtFilterIndex(
+        [
+            SvtFilterData(
+                id=100100,
+                type=1,
+                flag=0,
+                classId=1,
+                genderType=2,
+                attri=1,
+                collectionNo=2,
+                illustrator="武内崇",
+                rarities={5},
+                trait_variants=get_trait_variants([1, 2], [[3], [4]], []),
+            ),
+            SvtFilterData(
+                id=200100,
+                type=2,
+                flag=0,
+                classId=2,
+                genderType=1,
+                attri=2,
+                collectionNo=5,
+                rarities={3, 4},
+                trait_variants=get_trait_variants([1], [], [[5]]),
+            ),
+        ]
+    )
+
+    assert svt_filter_index.search() == {100100, 200100}
+    assert svt_filter_index.search(class_ints=[1, 2], rarity_ints=[4]) == {200100}
+    assert svt_filter_index.search(excludeCollectionNo=[2]) == {200100}
+    assert svt_filter_index.search(illustrator="武内崇") == {100100}
+    assert svt_filter_index.search(cv="unknown") == set()
+    assert svt_filter_index.search(trait_ints=[1]) == {100100, 200100}
+    assert svt_filter_index.search(trait_ints=[2, 3]) == {100100}
+    # The traits have to be in the same limit add row
+    assert svt_filter_index.search(trait_ints=[3, 4]) == set()
+    assert svt_filter_index.search(trait_ints=[2], not_trait_ints=[3]) == {100100}
+    assert svt_filter_index.search(not_trait_ints=[5]) == {100100}
+
+
+def test_reverse_tree_fan_out() -> None:
+    assert get_unique_ids([[3, 1], [1, 2], [], [3, 4]]) == [3, 1, 2, 4]
+
+    tree = ReverseTree(func_ids=[1, 2], skill_ids=[10], svt_ids=[100, 101])
+    assert tree.entity_count == 5
+    tree.check_fan_out(5)
+    with pytest.raises(HTTPException) as exc_info:
+        tree.check_fan_out(4)
+    assert exc_info.value.status_code == 403
+    assert "basic reverseData" in exc_info.value.detail
+
+    basic_limit = Settings().reverse_basic_fan_out_limit
+    basic_tree = ReverseTree(svt_ids=list(range(basic_limit + 1)))
+    with pytest.raises(HTTPException) as exc_info:
+        basic_tree.check_fan_out(basic_limit)
+    assert "basic reverseData" not in exc_info.value.detail
+
+
+def test_reverse_index() -> None:
+    reverse_data = {
+        "BUFF_TO_FUNC": {100: [10, 11], 101: [11]},
+        "FUNC_TO_SKILL": {10: [1000], 11: [1000, 1001]},
+        "FUNC_TO_TD": {11: [2000]},
+        "ACTIVE_SKILL_TO_SVT": {1000: [500, 501]},
+        "PASSIVE_SKILL_TO_SVT": {1001: [502]},
+        "TD_TO_SVT": {2000: [501, 503]},
+        "SKILL_TO_MC": {},
+    }
+    assert ReverseMap.from_dict(reverse_data["FUNC_TO_SKILL"]).get(11) == [1000, 1001]
+
+    reverse_index = read_reverse_index(
+        memoryview(serialize_reverse_index(reverse_data, "abcdef"))
+    )
+    assert reverse_index.version == "abcdef"
+    for reverse_name, data in reverse_data.items():
+        for item_id, reverse_ids in data.items():
+            assert reverse_index.get(reverse_name, item_id) == reverse_ids
+    assert reverse_index.get("BUFF_TO_FUNC", 99) == []
+    assert reverse_index.get("BUFF_TO_FUNC", 102) == []
+    assert reverse_index.get("SKILL_TO_MC", 1000) == []
+    assert reverse_index.get("SKILL_TO_CC", 1000) == []
+
+    index_path = get_reverse_index_path(Region.NA)
+    assert index_path.parent.name == Settings().redis_prefix
+
+
+async def test_bulk_fetch_quest_details(tmp_path: Path) -> None:
+    rate_limited = False
+    server_error = False
+
+    def get_quest_detail(query_id: int) -> dict[str, object]:
+        return {
+            "battleId": query_id,
+            "addedTime": "2022-01-01T00:00:00",
+            "region": 1,
+            "questId": 94000000,
+            "questPhase": 1,
+            "questSelect": 0,
+            "eventId": 0,
+            "battleType": 0,
+            "enemyDeck": [],
+            "transformDeck": {"svts": [], "followerType": 0, "stageId": 0},
+            "callDeck": [],
+            "shiftDeck": [],
+            "raidInfo": [],
+            "startRaidInfo": [],
+            "superBossInfo": [],
+            "userSvt": [],
+        }
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal rate_limited, server_error
+        if not rate_limited:
+            rate_limited = True
+            return httpx.Response(429, json={"status": 429, "message": "", "wait": 0})
+        if "id" in request.url.params:
+            query_ids = [int(request.url.params["id"])]
+        else:
+            query_ids = [int(i) for i in request.url.params.get_list("ids")]
+        # The first request of 3 fails once and the requests of 60 always fail
+        if 60 in query_ids or (3 in query_ids and not server_error):
+            server_error = True
+            return httpx.Response(500)
+        return httpx.Response(
+            200,
+            json={
+                "status": 200,
+                "message": "",
+                "response": {
+                    "questDetails": {
+                        str(query_id): get_quest_detail(query_id)
+                        for query_id in query_ids
+                    }
+                },
+            },
+        )
+
+    batches: list[list[int]] = []
+
+    async def write_quest_details(quest_details: dict[int, QuestDetail]) -> None:
+        batches.append(sorted(quest_details))
+
+    checkpoint = RayshiftCheckpoint(tmp_path / "checkpoint.json")
+    checkpoint.add([1, 2])
+    query_ids = list(range(1, 61))
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        written = await bulk_fetch_quest_details(
+            client,
+            Region.NA,
+            query_ids,
+            write_quest_details,
+            checkpoint,
+            max_concurrency=2,
+            write_batch_size=25,
+        )
+
+    assert rate_limited and server_error
+    assert written == 50
+    assert sorted(i for batch in batches for i in batch) == list(range(3, 53))
+    assert RayshiftCheckpoint(tmp_path / "checkpoint.json").done_ids == set(
+        range(1, 53)
+    )
+
+
+@pytest.mark.asyncio
+async def test_rayshift_call_claim(redis: Redis) -> None:
+    region, quest_id, phase = Region.NA, 94000000, 99
+    await release_rayshift_call(redis, region, quest_id, phase)
+
+    assert await claim_rayshift_call(redis, region, quest_id, phase)
+    assert not await claim_rayshift_call(redis, region, quest_id, phase)
+
+    await release_rayshift_call(redis, region, quest_id, phase)
+    assert await wait_quest_response(redis, region, quest_id, phase)
+
+    await set_rayshift_call_miss(redis, region, quest_id, phase, 60)
+    assert not await wait_quest_response(redis, region, quest_id, phase)
+    assert not await load_quest_response(redis, region, quest_id, phase)
+
+    await release_rayshift_call(redis, region, quest_id, phase)
@@ -1,18 +1,32 @@
 # pylint: disable=R0201,R0904
+from typing import Any, Type
+
+import msgpack
 import orjson
 import pytest
 from httpx import AsyncClient
 from pydantic import HttpUrl
 from pydantic.tools import parse_obj_as
+from sqlalchemy import event as sqlalchemy_event
 from sqlalchemy.ext.asyncio.engine import AsyncConnection
 
 from app.core.nice.enemy import get_enemy_script
+from app.core.nice.overlay import apply_translation_overlay
 from app.core.nice.svt.voice import get_nice_voice_line
+from app.core.nice.war import get_nice_war
 from app.data.shop import get_shop_cost_item_id
 from app.data.utils import load_master_data
 from app.db.helpers import event
+from app.schemas.base import BaseModelORJson
 from app.schemas.common import Language, Region
-from app.schemas.nice import ExtraAssetsUrl
+from app.schemas.nice import (
+    ExtraAssetsUrl,
+    NiceEquip,
+    NiceEvent,
+    NiceQuestPhase,
+    NiceServant,
+    NiceWar,
+)
 from app.schemas.raw import MstSvtVoice, MstVoice
 
 from .utils import clear_drop_data, get_response_data, test_gamedata
@@ -326,6 +340,17 @@ class TestServantSpecial:
         assert response.status_code == 200
         assert f_with_skill["reverse"]["nice"]["skill"]
 
+    async def test_buff_search_reverse(self, client: AsyncClient) -> None:
+        response = await client.get(
+            "/nice/NA/buff/search?buffGroup=800&reverse=true&reverseDepth=skillNp"
+        )
+        assert response.status_code == 200
+        for buff in response.json():
+            single_buff = await client.get(
+                f"/nice/NA/buff/{buff['id']}?reverse=true&reverseDepth=skillNp"
+            )
+            assert buff == single_buff.json()
+
     async def test_function_reverse_servant(self, client: AsyncClient) -> None:
         response = await client.get(
             "/nice/NA/function/3411?reverse=True&reverseDepth=servant"
@@ -531,6 +556,80 @@ class TestServantSpecial:
         assert war_interlude.status_code == 200
         assert "chaldea_category_" in war_interlude.json()["banner"]
 
+    async def test_field_projection(self, client: AsyncClient) -> None:
+        servant = await client.get("/nice/NA/servant/96?fields=id,skills&fields=name")
+        assert servant.status_code == 200
+        assert servant.json().keys() == {"id", "name", "skills"}
+
+        equip = await client.get(
+            "/nice/NA/equip/search?name=Kaleidoscope&exclude=skills"
+        )
+        assert equip.status_code == 200
+        assert all("skills" not in ce and "id" in ce for ce in equip.json())
+
+        war_no_spots = await client.get("/nice/NA/war/9050?exclude=spots,maps")
+        assert war_no_spots.status_code == 200
+        assert "spots" not in war_no_spots.json()
+        assert "spotRoads" in war_no_spots.json()
+
+        event_shop = await client.get("/nice/NA/event/80090?fields=shop")
+        assert event_shop.json().keys() == {"shop"}
+
+        bad_field = await client.get("/nice/NA/servant/96?fields=notAField")
+        assert bad_field.status_code == 400
+
+    async def test_msgpack_response(self, client: AsyncClient) -> None:
+        headers = {"Accept": "application/msgpack"}
+        servant = await client.get("/nice/NA/servant/96", headers=headers)
+        assert servant.headers["content-type"] == "application/msgpack"
+        assert msgpack.unpackb(servant.content, strict_map_key=False)["id"] == 1100200
+
+        search = await client.get(
+            "/nice/NA/equip/search?name=Kaleidoscope", headers=headers
+        )
+        assert search.headers["content-type"] == "application/msgpack"
+        assert msgpack.unpackb(search.content, strict_map_key=False)[0]["id"] == 9400340
+
+    async def test_normalized_servant(self, client: AsyncClient) -> None:
+        response = await client.get("/nice/NA/servant/96?normalized=true")
+        assert response.status_code == 200
+        normalized = response.json()
+        assert normalized["servant"]["id"] == 1100200
+        for function_key in normalized["servant"]["noblePhantasms"][0]["functions"]:
+            assert function_key in normalized["functions"]
+
+        search = await client.get("/nice/NA/svt/search?name=Dantes&normalized=true")
+        assert search.status_code == 200
+        assert search.json()["servants"][0]["id"] == 1100200
+
+    @pytest.mark.parametrize(
+        "endpoint,params,model",
+        [
+            ("JP/servant/267", {"lore": "true"}, NiceServant),
+            ("JP/servant/1", {"lore": "true"}, NiceServant),
+            ("JP/equip/1296", {"lore": "true"}, NiceEquip),
+            ("JP/war/306", {}, NiceWar),
+            ("JP/event/80289", {}, NiceEvent),
+            # Quest enemies with the BasicServant names and costume short names
+            ("JP/quest/94060012/1", {}, NiceQuestPhase),
+        ],
+    )
+    async def test_translation_overlay(
+        self,
+        client: AsyncClient,
+        endpoint: str,
+        params: dict[str, str],
+        model: Type[BaseModelORJson],
+    ) -> None:
+        jp_response = await client.get(f"/nice/{endpoint}", params=params)
+        en_response = await client.get(
+            f"/nice/{endpoint}", params=params | {"lang": "en"}
+        )
+        overlaid = apply_translation_overlay(
+            model.parse_raw(jp_response.content), Language.en, Region.JP
+        )
+        assert orjson.loads(overlaid.json(exclude_unset=True)) == en_response.json()
+
     async def test_skill_ai_id(self, client: AsyncClient) -> None:
         nice_skill = await client.get("/nice/NA/skill/962219")
         assert nice_skill.json()["aiIds"]["field"] == [94031791]
@@ -695,6 +794,32 @@ async def test_shop_itemIds_0(na_db_conn: AsyncConnection) -> None:
     )
 
 
+@pytest.mark.asyncio
+async def test_war_statement_count(na_db_conn: AsyncConnection) -> None:
+    statement_count = 0
+
+    def count_statement(*_: Any) -> None:
+        nonlocal statement_count
+        statement_count += 1
+
+    sqlalchemy_event.listen(
+        na_db_conn.sync_engine, "before_cursor_execute", count_statement
+    )
+    try:
+        statement_counts: list[int] = []
+        for war_id in (100, 101, 102):
+            statement_count = 0
+            nice_war = await get_nice_war(na_db_conn, Region.NA, war_id, Language.jp)
+            assert nice_war.spots
+            statement_counts.append(statement_count)
+    finally:
+        sqlalchemy_event.remove(
+            na_db_conn.sync_engine, "before_cursor_execute", count_statement
+        )
+
+    assert len(set(statement_counts)) == 1
+
+
 def test_nice_voice_summon_script() -> None:
     raw_voice = load_master_data(test_gamedata, MstVoice)
     mstVoices = {voice.id: voice for voice in raw_voice}
@@ -708,9 +833,9 @@ def test_nice_voice_summon_script() -> None:
         raw_svt_voice.type,
         {},
         {},
-        [],
+        {},
         mstVoices,
-        [],
+        {},
         Language.jp,
     )
 
@@ -1,5 +1,7 @@
 # pylint: disable=R0201
+import pytest
 from _pytest.monkeypatch import MonkeyPatch
+from pydantic import ValidationError
 
 from app.config import Settings
 
@@ -14,3 +16,11 @@ class TestSettings:
         monkeypatch.setenv("ASSET_URL", "https://example.com/assets")
         settings = Settings()
         assert settings.asset_url == "https://example.com/assets"
+
+    @pytest.mark.parametrize("budget", ["0", "-0.5", "1.5"])
+    def test_quest_prefetch_cpu_budget(
+        self, monkeypatch: MonkeyPatch, budget: str
+    ) -> None:
+        monkeypatch.setenv("QUEST_PREFETCH_CPU_BUDGET", budget)
+        with pytest.raises(ValidationError):
+            Settings()